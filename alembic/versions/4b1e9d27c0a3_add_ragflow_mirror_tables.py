@@ -0,0 +1,94 @@
+"""add ragflow mirror tables
+
+Revision ID: 4b1e9d27c0a3
+Revises: cfac8e7fdbe4
+Create Date: 2026-10-19 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1e9d27c0a3'
+down_revision: Union[str, Sequence[str], None] = 'cfac8e7fdbe4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ragflow_datasets',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('permission', sa.String(), nullable=True),
+    sa.Column('document_count', sa.Integer(), nullable=True),
+    sa.Column('chunk_count', sa.Integer(), nullable=True),
+    sa.Column('token_num', sa.BigInteger(), nullable=True),
+    sa.Column('create_time', sa.BigInteger(), nullable=True),
+    sa.Column('create_date', sa.String(), nullable=True),
+    sa.Column('update_time', sa.BigInteger(), nullable=True),
+    sa.Column('update_date', sa.String(), nullable=True),
+    sa.Column('avatar', sa.Text(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('language', sa.String(), nullable=True),
+    sa.Column('embedding_model', sa.String(), nullable=True),
+    sa.Column('chunk_method', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ragflow_datasets_name'), 'ragflow_datasets', ['name'], unique=False)
+    op.create_index(op.f('ix_ragflow_datasets_create_time'), 'ragflow_datasets', ['create_time'], unique=False)
+    op.create_index(op.f('ix_ragflow_datasets_update_time'), 'ragflow_datasets', ['update_time'], unique=False)
+    op.create_table('ragflow_documents',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('dataset_id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('type', sa.String(), nullable=True),
+    sa.Column('location', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('run', sa.String(), nullable=True),
+    sa.Column('suffix', sa.String(), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('created_by', sa.String(), nullable=True),
+    sa.Column('create_time', sa.BigInteger(), nullable=True),
+    sa.Column('create_date', sa.String(), nullable=True),
+    sa.Column('update_time', sa.BigInteger(), nullable=True),
+    sa.Column('update_date', sa.String(), nullable=True),
+    sa.Column('chunk_method', sa.String(), nullable=True),
+    sa.Column('chunk_count', sa.Integer(), nullable=True),
+    sa.Column('token_count', sa.BigInteger(), nullable=True),
+    sa.Column('thumbnail', sa.Text(), nullable=True),
+    sa.Column('pipeline_id', sa.String(), nullable=True),
+    sa.Column('progress', sa.Float(), nullable=True),
+    sa.Column('progress_msg', sa.Text(), nullable=True),
+    sa.Column('enabled', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_document_dataset_update', 'ragflow_documents', ['dataset_id', 'update_time'], unique=False)
+    op.create_index('idx_document_dataset_suffix', 'ragflow_documents', ['dataset_id', 'suffix'], unique=False)
+    op.create_table('ragflow_sync_state',
+    sa.Column('scope', sa.String(), nullable=False),
+    sa.Column('watermark', sa.BigInteger(), nullable=False),
+    sa.Column('synced_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('full_synced_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('scope')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ragflow_sync_state')
+    op.drop_index('idx_document_dataset_suffix', table_name='ragflow_documents')
+    op.drop_index('idx_document_dataset_update', table_name='ragflow_documents')
+    op.drop_table('ragflow_documents')
+    op.drop_index(op.f('ix_ragflow_datasets_update_time'), table_name='ragflow_datasets')
+    op.drop_index(op.f('ix_ragflow_datasets_create_time'), table_name='ragflow_datasets')
+    op.drop_index(op.f('ix_ragflow_datasets_name'), table_name='ragflow_datasets')
+    op.drop_table('ragflow_datasets')
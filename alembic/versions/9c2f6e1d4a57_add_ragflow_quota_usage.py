@@ -0,0 +1,47 @@
+"""add ragflow quota usage
+
+Revision ID: 9c2f6e1d4a57
+Revises: e5a0c3b8d914
+Create Date: 2026-10-19 18:21:07.530214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c2f6e1d4a57'
+down_revision: Union[str, Sequence[str], None] = 'e5a0c3b8d914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ragflow_document_user', sa.Column('size', sa.BigInteger(), server_default='0', nullable=False))
+    # 已有记录按镜像中的文档大小回填
+    op.execute(
+        "UPDATE ragflow_document_user AS u SET size = d.size "
+        "FROM ragflow_documents AS d WHERE d.id = u.document_id AND d.size IS NOT NULL"
+    )
+    op.create_table('ragflow_quota_usage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subject', sa.String(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('bytes', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('documents', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('parses', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_quota_usage_subject_day', 'ragflow_quota_usage', ['subject', 'day'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_quota_usage_subject_day', table_name='ragflow_quota_usage')
+    op.drop_table('ragflow_quota_usage')
+    op.drop_column('ragflow_document_user', 'size')
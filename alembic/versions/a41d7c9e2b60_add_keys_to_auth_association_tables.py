@@ -0,0 +1,59 @@
+"""add primary keys and reverse indexes to auth association tables
+
+Revision ID: a41d7c9e2b60
+Revises: 9c2f6e1d4a57
+Create Date: 2026-10-19 19:02:44.871530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41d7c9e2b60'
+down_revision: Union[str, Sequence[str], None] = '9c2f6e1d4a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (表, 主键列, 反向索引名)
+TABLES = [
+    ('auth_user_roles', ('user_id', 'role_id'), 'idx_user_roles_role'),
+    ('auth_role_permissions', ('role_id', 'permission_id'), 'idx_role_permissions_permission'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, (left, right), _ in TABLES:
+        # 主键不允许空值与重复行：删除不完整的关联，重复行只保留一条
+        op.execute(f"DELETE FROM {table} WHERE {left} IS NULL OR {right} IS NULL")
+        op.execute(
+            f"DELETE FROM {table} AS a USING {table} AS b "
+            f"WHERE a.ctid > b.ctid AND a.{left} = b.{left} AND a.{right} = b.{right}"
+        )
+        op.alter_column(table, left, existing_type=sa.Integer(), nullable=False)
+        op.alter_column(table, right, existing_type=sa.Integer(), nullable=False)
+
+    # CONCURRENTLY 不能在事务中执行；中断后留下的无效索引在重跑时先删除
+    context = op.get_context()
+    with context.autocommit_block():
+        for table, (left, right), reverse_index in TABLES:
+            pkey = f"{table}_pkey"
+            # 重跑时已建好的主键保留（离线生成 SQL 时无法检查）
+            if context.as_sql or not sa.inspect(op.get_bind()).get_pk_constraint(table).get("constrained_columns"):
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {pkey}")
+                op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY {pkey} ON {table} ({left}, {right})")
+                op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {pkey} PRIMARY KEY USING INDEX {pkey}")
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {reverse_index}")
+            op.execute(f"CREATE INDEX CONCURRENTLY {reverse_index} ON {table} ({right}, {left})")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, (left, right), reverse_index in reversed(TABLES):
+        op.drop_index(reverse_index, table_name=table)
+        op.drop_constraint(f"{table}_pkey", table, type_='primary')
+        op.alter_column(table, right, existing_type=sa.Integer(), nullable=True)
+        op.alter_column(table, left, existing_type=sa.Integer(), nullable=True)
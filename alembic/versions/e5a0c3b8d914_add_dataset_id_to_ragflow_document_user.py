@@ -0,0 +1,30 @@
+"""add dataset_id to ragflow_document_user
+
+Revision ID: e5a0c3b8d914
+Revises: 4b1e9d27c0a3
+Create Date: 2026-10-19 14:03:52.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a0c3b8d914'
+down_revision: Union[str, Sequence[str], None] = '4b1e9d27c0a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ragflow_document_user', sa.Column('dataset_id', sa.String(), nullable=True))
+    op.create_index('idx_user_dataset_document', 'ragflow_document_user', ['user_id', 'dataset_id', 'document_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_user_dataset_document', table_name='ragflow_document_user')
+    op.drop_column('ragflow_document_user', 'dataset_id')
@@ -0,0 +1,18 @@
+"""
+Microbenchmarks (pytest-benchmark). Run from the project root:
+
+    pytest benchmarks --benchmark-json=reports/micro.json
+    pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:15%
+
+They need no database, Redis or RAGFlow; the required settings get placeholder values.
+"""
+import os
+
+for key, value in {
+    "SECRET_KEY": "benchmark-secret-key",
+    "DB_PASSWORD": "benchmark",
+    "REDIS_PASSWORD": "benchmark",
+    "RAGFLOW_API_KEY": "benchmark",
+    "RAGFLOW_ORIGIN_URL": "http://127.0.0.1:9380",
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,166 @@
+"""
+Import-time profile and budgets of the gateway's entry points.
+
+Each entry point is imported in a fresh interpreter under `python -X importtime`; the
+fastest of `--runs` runs is kept (the first run also compiles bytecode). The report lists
+the total, the slowest modules by self time and the time per top-level package.
+
+Usage (from the project root):
+    python benchmarks/importtime.py                      # all entry points, check budgets
+    python benchmarks/importtime.py app.tasks.worker --top 30
+    python benchmarks/importtime.py --report reports/importtime.json
+
+Exits with status 1 when an entry point exceeds its time budget or imports a module it
+must not (`BUDGETS`). `benchmarks/test_import_time.py` runs the same checks under pytest.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT_DIR / "src"
+
+# 仅部分路径使用的重依赖（见 app.core.lazy）
+HEAVY = ("ragflow_async_sdk", "httpx", "jose", "passlib", "yaml")
+
+
+@dataclass
+class Budget:
+    # 总导入耗时上限（毫秒），按 IMPORT_TIME_BUDGET_SCALE 缩放以适应较慢的机器
+    total_ms: float
+    forbidden: Tuple[str, ...] = ()
+
+
+BUDGETS: Dict[str, Budget] = {
+    # API 路由的响应模型引用 SDK 的数据类，SDK 随路由导入
+    "app.main": Budget(2500, forbidden=("jose", "passlib", "yaml")),
+    "app.tasks.worker": Budget(2000, forbidden=HEAVY),
+    "app.tasks.scheduler": Budget(2000, forbidden=HEAVY),
+    "app.cli.init_perms": Budget(1200, forbidden=HEAVY + ("fastapi", "taskiq", "redis")),
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+@dataclass
+class ModuleTime:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+@dataclass
+class ImportProfile:
+    entry: str
+    modules: List[ModuleTime] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, entry: str, output: str) -> "ImportProfile":
+        profile = cls(entry)
+        for line in output.splitlines():
+            match = _LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, name = match.groups()
+                profile.modules.append(ModuleTime(name, int(self_us), int(cumulative_us), len(indent) // 2))
+        return profile
+
+    @property
+    def total_ms(self) -> float:
+        return sum(m.self_us for m in self.modules) / 1000
+
+    def imported(self, package: str) -> bool:
+        return any(m.name == package or m.name.startswith(package + ".") for m in self.modules)
+
+    def slowest(self, top: int) -> List[ModuleTime]:
+        return sorted(self.modules, key=lambda m: m.self_us, reverse=True)[:top]
+
+    def by_package(self) -> Counter:
+        packages = Counter()
+        for m in self.modules:
+            packages[m.name.split(".")[0]] += m.self_us
+        return packages
+
+    def violations(self, budget: Budget, scale: float = 1.0) -> List[str]:
+        problems = [f"imports {name}" for name in budget.forbidden if self.imported(name)]
+        if self.total_ms > budget.total_ms * scale:
+            problems.append(f"took {self.total_ms:.0f} ms (budget {budget.total_ms * scale:.0f} ms)")
+        return problems
+
+    def to_dict(self, top: int = 20) -> dict:
+        return {
+            "total_ms": round(self.total_ms, 1),
+            "slowest": [{"module": m.name, "self_ms": m.self_us / 1000, "cumulative_ms": m.cumulative_us / 1000}
+                        for m in self.slowest(top)],
+            "packages": {name: us / 1000 for name, us in self.by_package().most_common(top)},
+        }
+
+
+def measure(entry: str, runs: int = 3) -> ImportProfile:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC_DIR), env.get("PYTHONPATH")]))
+    best: Optional[ImportProfile] = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {entry}"],
+            cwd=ROOT_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing {entry} failed:\n{proc.stderr[-2000:]}")
+        profile = ImportProfile.parse(entry, proc.stderr)
+        if best is None or profile.total_ms < best.total_ms:
+            best = profile
+    return best
+
+
+def budget_scale() -> float:
+    return float(os.getenv("IMPORT_TIME_BUDGET_SCALE", "1.0"))
+
+
+def print_profile(profile: ImportProfile, top: int):
+    print(f"== {profile.entry}: {profile.total_ms:.0f} ms, {len(profile.modules)} modules")
+    print("  slowest modules (self / cumulative ms):")
+    for m in profile.slowest(top):
+        print(f"    {m.self_us / 1000:8.1f} {m.cumulative_us / 1000:8.1f}  {m.name}")
+    print("  packages (self ms):")
+    for name, us in profile.by_package().most_common(top):
+        print(f"    {us / 1000:8.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entries", nargs="*", help="modules to import (default: all with a budget)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--report", help="write the JSON report here")
+    args = parser.parse_args()
+
+    failed = False
+    report = {}
+    for entry in args.entries or list(BUDGETS):
+        profile = measure(entry, args.runs)
+        print_profile(profile, args.top)
+        report[entry] = profile.to_dict(args.top)
+        budget = BUDGETS.get(entry)
+        if budget is not None:
+            problems = profile.violations(budget, budget_scale())
+            report[entry]["violations"] = problems
+            for problem in problems:
+                failed = True
+                print(f"  BUDGET: {entry} {problem}")
+
+    if args.report:
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.report).write_text(json.dumps(report, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
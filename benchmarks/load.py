@@ -0,0 +1,350 @@
+"""
+End-to-end load driver (async httpx, closed loop) for the auth, IAM listing and RAGFlow
+proxy paths.
+
+By default the gateway runs in-process (ASGI transport, lifespan included) against:
+- the Postgres configured by `DB_*` (migrated, see README), with a benchmark superuser
+  created on demand (`--create-user`);
+- fakeredis instead of Redis (`--redis real` to use `REDIS_*`);
+- the fake RAGFlow server (`benchmarks/stubs/ragflow.py`) started on a local port, with
+  optional latency / error injection (`--upstream-latency-ms`, `--upstream-faults`, ...).
+
+`--base-url` drives an already running gateway instead (nothing is patched then).
+
+Usage (from the project root):
+    PYTHONPATH=src:. python benchmarks/load.py --duration 30 --concurrency 32 \\
+        --report reports/load.json [--baseline reports/load-main.json --max-regression 0.15]
+
+The JSON report holds per-scenario throughput, error count and latency percentiles; with
+`--baseline` the run exits with status 1 when a scenario's p95 latency or throughput
+regressed by more than `--max-regression`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+API = "/api/v1"
+
+
+@dataclass
+class Scenario:
+    name: str
+    weight: int
+    request: Callable[["LoadContext"], httpx.Request]
+
+
+@dataclass
+class Samples:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[int, int] = field(default_factory=dict)
+
+
+@dataclass
+class LoadContext:
+    client: httpx.AsyncClient
+    token: str
+    username: str
+    password: str
+    dataset_ids: List[str]
+    rng: random.Random
+
+    @property
+    def auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+SCENARIOS = [
+    Scenario("auth.login", 1, lambda c: c.client.build_request(
+        "POST", f"{API}/auth/login", json={"username": c.username, "password": c.password})),
+    Scenario("iam.list_users", 4, lambda c: c.client.build_request(
+        "GET", f"{API}/iam/users", params={"page": 1, "page_size": 20}, headers=c.auth)),
+    Scenario("iam.list_roles", 3, lambda c: c.client.build_request(
+        "GET", f"{API}/iam/roles", headers=c.auth)),
+    Scenario("ragflow.list_datasets", 4, lambda c: c.client.build_request(
+        "GET", f"{API}/ragflow/datasets", params={"source": "upstream", "page_size": 30}, headers=c.auth)),
+    Scenario("ragflow.list_documents", 6, lambda c: c.client.build_request(
+        "GET", f"{API}/ragflow/datasets/{c.rng.choice(c.dataset_ids)}/documents",
+        params={"source": "upstream", "page": c.rng.randint(1, 5), "page_size": 30}, headers=c.auth)),
+]
+
+
+# ---------- 环境 ----------
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub_ragflow(port: int, config=None):
+    import uvicorn
+    from benchmarks.stubs.ragflow import FakeConfig, create_app
+
+    stub_app = create_app(config or FakeConfig.from_env())
+    server = uvicorn.Server(uvicorn.Config(stub_app, host="127.0.0.1", port=port, log_level="warning"))
+    server.stub_app = stub_app
+    threading.Thread(target=server.run, name="stub-ragflow", daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Stub RAGFlow did not start")
+        time.sleep(0.05)
+    return server
+
+
+def stub_config(args):
+    from benchmarks.stubs.ragflow import FakeConfig, Fault
+
+    config = FakeConfig.from_env()
+    if args.upstream_latency_ms or args.upstream_error_rate:
+        config.default = Fault(latency_ms=args.upstream_latency_ms, latency_sigma=args.upstream_latency_sigma,
+                               error_rate=args.upstream_error_rate)
+    if args.upstream_faults:
+        config.set_faults(json.loads(args.upstream_faults))
+    return config
+
+
+def use_fake_redis():
+    """
+    Back the process's Redis clients (`app.core.redis.redis_manager`) with one fakeredis
+    server and skip the task broker (the scenarios enqueue no tasks).
+    """
+    import fakeredis
+    from app.core import lifespan as lifespan_module
+    from app.core.redis import POOLS, redis_manager
+
+    server = fakeredis.FakeServer()
+
+    def create_client(purpose: str):
+        return fakeredis.FakeAsyncRedis(server=server, decode_responses=POOLS[purpose].decode_responses)
+
+    async def noop():
+        pass
+
+    redis_manager.create_client = create_client
+    lifespan_module.broker.startup = noop
+    lifespan_module.broker.shutdown = noop
+
+
+async def ensure_user(username: str, password: str):
+    from app.core.db import async_session
+    from app.core.security import get_password_context
+    from app.models import User
+    from app.repositories.iam import UserRepo
+
+    async with async_session() as db:
+        user = await UserRepo().get_or_none(db, field_name="username", value=username)
+        if user is None:
+            db.add(User(username=username, password=get_password_context().hash(password), is_superuser=True))
+        else:
+            user.password = get_password_context().hash(password)
+            user.is_superuser = True
+            user.is_active = True
+        await db.commit()
+
+
+# ---------- 压测 ----------
+
+async def worker(ctx: LoadContext, scenarios: List[Scenario], samples: Dict[str, Samples],
+                 warmup_until: float, stop_at: float):
+    weights = [s.weight for s in scenarios]
+    while (now := time.perf_counter()) < stop_at:
+        scenario = ctx.rng.choices(scenarios, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = await ctx.client.send(scenario.request(ctx))
+            await response.aread()
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 0
+        elapsed = time.perf_counter() - started
+        if now < warmup_until:
+            continue
+        result = samples[scenario.name]
+        result.latencies.append(elapsed)
+        result.statuses[status] = result.statuses.get(status, 0) + 1
+        if not 200 <= status < 400:
+            result.errors += 1
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples: Dict[str, Samples], seconds: float) -> Dict[str, dict]:
+    report = {}
+    for name, result in samples.items():
+        latencies = result.latencies
+        report[name] = {
+            "requests": len(latencies),
+            "errors": result.errors,
+            "statuses": {str(k): v for k, v in sorted(result.statuses.items())},
+            "rps": round(len(latencies) / seconds, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            **{f"p{int(q * 100)}_ms": round(percentile(latencies, q) * 1000, 3) for q in (0.5, 0.9, 0.95, 0.99)},
+            "max_ms": round(max(latencies, default=0.0) * 1000, 3),
+        }
+    return report
+
+
+async def run_load(client: httpx.AsyncClient, args) -> Dict[str, dict]:
+    response = await client.post(f"{API}/auth/login", json={"username": args.username, "password": args.password})
+    response.raise_for_status()
+    token = response.json()["data"]["access_token"]
+
+    headers = {"Authorization": f"Bearer {token}"}
+    response = await client.get(f"{API}/ragflow/datasets", params={"source": "upstream", "page_size": 100},
+                                headers=headers)
+    response.raise_for_status()
+    dataset_ids = [d["id"] for d in response.json()["data"]["items"]] or ["missing"]
+
+    scenarios = [s for s in SCENARIOS if not args.scenarios or s.name in args.scenarios]
+    samples = {s.name: Samples() for s in scenarios}
+    started = time.perf_counter()
+    warmup_until = started + args.warmup
+    stop_at = warmup_until + args.duration
+    await asyncio.gather(*(
+        worker(LoadContext(client, token, args.username, args.password, dataset_ids, random.Random(args.seed + i)),
+               scenarios, samples, warmup_until, stop_at)
+        for i in range(args.concurrency)
+    ))
+    return summarize(samples, args.duration)
+
+
+async def run_in_process(args) -> Dict[str, dict]:
+    if args.redis == "fake":
+        use_fake_redis()
+    if args.create_user:
+        await ensure_user(args.username, args.password)
+    if not args.rate_limit:
+        # 压测只有一个用户，按用户限流会让大部分请求变成 429
+        from app.core.settings import settings
+        settings.ratelimit.enabled = False
+
+    from app.main import app
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway", limits=limits,
+                                     timeout=args.timeout) as client:
+            return await run_load(client, args)
+
+
+async def run_remote(args) -> Dict[str, dict]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        return await run_load(client, args)
+
+
+# ---------- 报告 ----------
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> List[str]:
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous or not previous["requests"]:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["rps"] < previous["rps"] * (1 - max_regression):
+            regressions.append(f"{name}: rps {previous['rps']} -> {current['rps']}")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="drive a running gateway instead of the in-process app")
+    parser.add_argument("--ragflow-url", help="use this RAGFlow instead of starting the stub")
+    parser.add_argument("--redis", choices=("fake", "real"), default="fake")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0, help="fake RAGFlow median latency")
+    parser.add_argument("--upstream-latency-sigma", type=float, default=0.0, help="log-normal spread")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-faults", help='per-operation JSON, e.g. \'{"documents.list": {"error_rate": 0.1}}\'')
+    parser.add_argument("--username", default=os.getenv("BENCH_USERNAME", "bench"))
+    parser.add_argument("--password", default=os.getenv("BENCH_PASSWORD", "Bench#Passw0rd"))
+    parser.add_argument("--create-user", action="store_true", help="create / reset the benchmark superuser")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the gateway's rate limits (in-process)")
+    parser.add_argument("--scenarios", nargs="*", help="subset of: " + ", ".join(s.name for s in SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--report", help="write the JSON report here (stdout otherwise)")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    args = parser.parse_args()
+
+    stub = None
+    if args.base_url:
+        scenarios = asyncio.run(run_remote(args))
+    else:
+        if args.ragflow_url:
+            os.environ["RAGFLOW_ORIGIN_URL"] = args.ragflow_url
+        else:
+            port = free_port()
+            stub = start_stub_ragflow(port, stub_config(args))
+            os.environ["RAGFLOW_ORIGIN_URL"] = f"http://127.0.0.1:{port}"
+        scenarios = asyncio.run(run_in_process(args))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "target": args.base_url or "in-process",
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "seed": args.seed,
+        },
+        "scenarios": scenarios,
+    }
+    if stub is not None:
+        fake = stub.stub_app.state.fake
+        report["upstream"] = {"requests": dict(fake.stats), "injected": dict(fake.injected)}
+    output = json.dumps(report, indent=2)
+    if args.report:
+        os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,581 @@
+"""
+Fake RAGFlow server (ASGI) for load tests and local runs.
+
+Implements the part of the RAGFlow HTTP API used through `ragflow_async_sdk`: datasets
+(list / create / update / delete), documents (upload / list / update / download / delete /
+parse / stop parsing) and chunks (list / add / update / delete), backed by deterministic
+in-memory data. Parsing completes `parse_seconds` after it was started.
+
+Faults are injected per operation (`documents.download`, `datasets.list`, ...) or for all
+operations (`default`):
+- latency: log-normal around `latency_ms` with spread `latency_sigma` (0 = fixed);
+- `error_rate`: HTTP `error_status` responses; `api_error_rate`: HTTP 200 with code != 0;
+- `timeout_rate`: the request hangs for `hang_seconds` (longer than the client timeout).
+Downloads stream `document_size` bytes in `stream_chunk_size` chunks, sleeping
+`stream_delay_ms` between chunks; `padding_bytes` inflates every listed item.
+All randomness comes from `seed`, so a run can be reproduced exactly.
+
+Run standalone (configured from FAKE_RAGFLOW_* variables, see `FakeConfig.from_env`):
+    uvicorn benchmarks.stubs.ragflow:app --port 9380
+
+Or in-process:
+    app = create_app(FakeConfig(default=Fault(latency_ms=50), operations={
+        "documents.download": Fault(error_rate=0.1)}))
+
+Control endpoints: `GET /_fake/stats`, `PUT /_fake/faults` (same shape as
+`FAKE_RAGFLOW_FAULTS`), `POST /_fake/reset`.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+CREATE_TIME = 1700000000000
+
+
+@dataclass
+class Fault:
+    latency_ms: float = 0.0
+    latency_sigma: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    api_error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    hang_seconds: float = 60.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Fault":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+@dataclass
+class FakeConfig:
+    seed: int = 0
+    # 为空时不校验 Authorization
+    api_key: Optional[str] = None
+    datasets: int = 20
+    documents_per_dataset: int = 200
+    chunks_per_document: int = 12
+    document_size: int = 64 * 1024
+    padding_bytes: int = 0
+    stream_chunk_size: int = 64 * 1024
+    stream_delay_ms: float = 0.0
+    parse_seconds: float = 2.0
+    default: Fault = field(default_factory=Fault)
+    operations: Dict[str, Fault] = field(default_factory=dict)
+
+    def fault(self, operation: str) -> Fault:
+        return self.operations.get(operation, self.default)
+
+    def set_faults(self, data: Dict[str, Any]):
+        """
+        `{"default": {...}, "documents.download": {...}}`; a missing key keeps its fault.
+        """
+        for name, values in data.items():
+            if name == "default":
+                self.default = Fault.from_dict(values)
+            else:
+                self.operations[name] = Fault.from_dict(values)
+
+    @classmethod
+    def from_env(cls) -> "FakeConfig":
+        """
+        FAKE_RAGFLOW_SEED, _API_KEY, _DATASETS, _DOCUMENTS_PER_DATASET, _CHUNKS_PER_DOCUMENT,
+        _DOCUMENT_SIZE, _PADDING_BYTES, _STREAM_CHUNK_SIZE, _STREAM_DELAY_MS, _PARSE_SECONDS
+        and _FAULTS (JSON, e.g. '{"default": {"latency_ms": 20}, "documents.list": {"error_rate": 0.05}}').
+        """
+        config = cls()
+        for f in fields(cls):
+            value = os.getenv(f"FAKE_RAGFLOW_{f.name.upper()}")
+            if value is None or f.name in ("default", "operations"):
+                continue
+            setattr(config, f.name, value if f.name == "api_key" else type(getattr(config, f.name))(value))
+        if faults := os.getenv("FAKE_RAGFLOW_FAULTS"):
+            config.set_faults(json.loads(faults))
+        return config
+
+
+def ok(data: Any = None, **extra) -> JSONResponse:
+    body = {"code": 0, **extra}
+    if data is not None:
+        body["data"] = data
+    return JSONResponse(body)
+
+
+def api_error(code: int, message: str) -> JSONResponse:
+    # RAGFlow 业务错误同样以 HTTP 200 返回
+    return JSONResponse({"code": code, "message": message})
+
+
+def paginate(items: List[dict], request: Request) -> List[dict]:
+    page = int(request.query_params.get("page", 1))
+    page_size = int(request.query_params.get("page_size", 30))
+    return items[(page - 1) * page_size: page * page_size]
+
+
+def ordered(items: List[dict], request: Request) -> List[dict]:
+    key = request.query_params.get("orderby", "create_time")
+    if key not in ("create_time", "update_time"):
+        key = "create_time"
+    desc = request.query_params.get("desc", "true").lower() != "false"
+    return sorted(items, key=lambda item: item.get(key) or 0, reverse=desc)
+
+
+class FakeRAGFlow:
+    def __init__(self, config: Optional[FakeConfig] = None):
+        self.config = config or FakeConfig()
+        self.reset()
+
+    # ---------- 数据 ----------
+
+    def reset(self):
+        self.rng = random.Random(self.config.seed)
+        self.stats: Counter = Counter()
+        self.injected: Counter = Counter()
+        self.datasets: Dict[str, dict] = {}
+        self.documents: Dict[str, Dict[str, dict]] = {}
+        self.contents: Dict[str, bytes] = {}
+        self.chunks: Dict[str, List[dict]] = {}
+        for i in range(self.config.datasets):
+            dataset = self._new_dataset(f"dataset-{i}", CREATE_TIME + i)
+            for j in range(self.config.documents_per_dataset):
+                self._new_document(dataset["id"], f"report-{j}.pdf", self.config.document_size, CREATE_TIME + j,
+                                   run="DONE")
+
+    def _id(self) -> str:
+        return uuid.UUID(int=self.rng.getrandbits(128)).hex
+
+    def _padding(self) -> Optional[str]:
+        return "x" * self.config.padding_bytes if self.config.padding_bytes else None
+
+    def _new_dataset(self, name: str, created: int, **attrs) -> dict:
+        dataset = {
+            "id": self._id(),
+            "name": name,
+            "status": "1",
+            "permission": "me",
+            "document_count": 0,
+            "chunk_count": 0,
+            "token_num": 0,
+            "chunk_method": "naive",
+            "embedding_model": "BAAI/bge-large-zh-v1.5",
+            "description": self._padding(),
+            "create_time": created,
+            "update_time": created,
+            **attrs,
+        }
+        self.datasets[dataset["id"]] = dataset
+        self.documents[dataset["id"]] = {}
+        return dataset
+
+    def _new_document(self, dataset_id: str, name: str, size: int, created: int, run: str = "UNSTART") -> dict:
+        suffix = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+        done = run == "DONE"
+        document = {
+            "id": self._id(),
+            "dataset_id": dataset_id,
+            "name": name,
+            "type": suffix or "doc",
+            "location": name,
+            "suffix": suffix,
+            "size": size,
+            "run": run,
+            "progress": 1.0 if done else 0.0,
+            "progress_msg": self._padding(),
+            "chunk_method": "naive",
+            "chunk_count": self.config.chunks_per_document if done else 0,
+            "token_count": 280 * self.config.chunks_per_document if done else 0,
+            "parser_config": {"chunk_token_num": 512, "delimiter": "\n"},
+            "enabled": 1,
+            "create_time": created,
+            "update_time": created,
+        }
+        self.documents[dataset_id][document["id"]] = document
+        dataset = self.datasets[dataset_id]
+        dataset["document_count"] += 1
+        dataset["chunk_count"] += document["chunk_count"]
+        return document
+
+    def _refresh(self, document: dict) -> dict:
+        started = document.get("_parse_started")
+        if document["run"] == "RUNNING" and started is not None:
+            elapsed = time.monotonic() - started
+            if elapsed >= self.config.parse_seconds:
+                document.update(run="DONE", progress=1.0, chunk_count=self.config.chunks_per_document,
+                                token_count=280 * self.config.chunks_per_document)
+                document.pop("_parse_started")
+            else:
+                document["progress"] = round(elapsed / self.config.parse_seconds, 3)
+        return document
+
+    @staticmethod
+    def _public(item: dict) -> dict:
+        return {k: v for k, v in item.items() if not k.startswith("_")}
+
+    def _chunks_of(self, document: dict) -> List[dict]:
+        chunks = self.chunks.get(document["id"])
+        if chunks is None:
+            chunks = [
+                {
+                    "id": self._id(),
+                    "dataset_id": document["dataset_id"],
+                    "document_id": document["id"],
+                    "content": f"Chunk {i} of {document['name']}. " + "Lorem ipsum dolor sit amet. " * 8,
+                    "available": True,
+                    "docnm_kwd": document["name"],
+                    "important_keywords": [],
+                    "questions": [],
+                }
+                for i in range(document["chunk_count"] or 0)
+            ]
+            self.chunks[document["id"]] = chunks
+        return chunks
+
+    def _content(self, document: dict) -> Callable[[int, int], bytes]:
+        stored = self.contents.get(document["id"])
+        if stored is not None:
+            return lambda start, end: stored[start:end]
+        # 预置文档按需生成确定性的内容，避免占用内存
+        pattern = (document["id"] * 64).encode()
+
+        def read(start: int, end: int) -> bytes:
+            offset = start % len(pattern)
+            repeat = (offset + end - start) // len(pattern) + 1
+            return (pattern * repeat)[offset: offset + end - start]
+
+        return read
+
+    # ---------- 故障注入 ----------
+
+    async def _inject(self, operation: str) -> Optional[Response]:
+        fault = self.config.fault(operation)
+        if fault.latency_ms:
+            latency = fault.latency_ms
+            if fault.latency_sigma:
+                latency *= math.exp(self.rng.gauss(0.0, fault.latency_sigma))
+            await asyncio.sleep(latency / 1000)
+        roll = self.rng.random()
+        if roll < fault.timeout_rate:
+            self.injected[f"{operation}:timeout"] += 1
+            await asyncio.sleep(fault.hang_seconds)
+        roll -= fault.timeout_rate
+        if 0 <= roll < fault.error_rate:
+            self.injected[f"{operation}:http_{fault.error_status}"] += 1
+            return JSONResponse({"code": 100, "message": "Injected failure"}, status_code=fault.error_status)
+        roll -= fault.error_rate
+        if 0 <= roll < fault.api_error_rate:
+            self.injected[f"{operation}:api_error"] += 1
+            return api_error(102, "Injected API error")
+        return None
+
+    def endpoint(self, operation: str, handler: Callable[[Request], Awaitable[Response]]):
+        async def wrapped(request: Request) -> Response:
+            self.stats[operation] += 1
+            if self.config.api_key and request.headers.get("authorization") != f"Bearer {self.config.api_key}":
+                return api_error(109, "Authentication error: API key is invalid!")
+            if injected := await self._inject(operation):
+                return injected
+            return await handler(request)
+
+        return wrapped
+
+    # ---------- datasets ----------
+
+    def _dataset(self, request: Request) -> Optional[dict]:
+        return self.datasets.get(request.path_params["dataset_id"])
+
+    @staticmethod
+    def _not_owned(request: Request) -> JSONResponse:
+        return api_error(102, f"You don't own the dataset {request.path_params['dataset_id']}.")
+
+    async def list_datasets(self, request: Request) -> Response:
+        items = list(self.datasets.values())
+        if dataset_id := request.query_params.get("id"):
+            items = [d for d in items if d["id"] == dataset_id]
+        if name := request.query_params.get("name"):
+            items = [d for d in items if d["name"] == name]
+        items = ordered(items, request)
+        return ok([self._public(d) for d in paginate(items, request)], total_datasets=len(items))
+
+    async def create_dataset(self, request: Request) -> Response:
+        body = await request.json()
+        if not body.get("name"):
+            return api_error(101, "`name` is required.")
+        if any(d["name"] == body["name"] for d in self.datasets.values()):
+            return api_error(103, f"Dataset name '{body['name']}' already exists")
+        now = int(time.time() * 1000)
+        attrs = {k: body[k] for k in ("avatar", "description", "permission", "embedding_model", "chunk_method")
+                 if body.get(k) is not None}
+        return ok(self._public(self._new_dataset(body["name"], now, **attrs)))
+
+    async def update_dataset(self, request: Request) -> Response:
+        dataset = self._dataset(request)
+        if dataset is None:
+            return self._not_owned(request)
+        body = await request.json()
+        dataset.update({k: v for k, v in body.items() if k in dataset and k != "id"})
+        dataset["update_time"] = int(time.time() * 1000)
+        return ok()
+
+    async def delete_datasets(self, request: Request) -> Response:
+        ids = (await request.json()).get("ids") or list(self.datasets)
+        for dataset_id in ids:
+            if dataset_id not in self.datasets:
+                return api_error(102, f"You don't own the dataset {dataset_id}.")
+        for dataset_id in ids:
+            self.datasets.pop(dataset_id)
+            for document_id in self.documents.pop(dataset_id):
+                self.contents.pop(document_id, None)
+                self.chunks.pop(document_id, None)
+        return ok()
+
+    # ---------- documents ----------
+
+    async def upload_documents(self, request: Request) -> Response:
+        dataset = self._dataset(request)
+        if dataset is None:
+            return self._not_owned(request)
+        form = await request.form()
+        uploads = form.getlist("file")
+        if not uploads:
+            return api_error(101, "No file part!")
+        documents = []
+        now = int(time.time() * 1000)
+        for upload in uploads:
+            content = await upload.read()
+            document = self._new_document(dataset["id"], upload.filename, len(content), now)
+            self.contents[document["id"]] = content
+            documents.append(self._public(document))
+        return ok(documents)
+
+    async def list_documents(self, request: Request) -> Response:
+        dataset = self._dataset(request)
+        if dataset is None:
+            return self._not_owned(request)
+        params = request.query_params
+        items = [self._refresh(d) for d in self.documents[dataset["id"]].values()]
+        if document_id := params.get("id"):
+            items = [d for d in items if d["id"] == document_id]
+        if name := params.get("name"):
+            items = [d for d in items if d["name"] == name]
+        if keywords := params.get("keywords"):
+            items = [d for d in items if keywords.lower() in d["name"].lower()]
+        if suffix := params.getlist("suffix"):
+            items = [d for d in items if d["suffix"] in suffix]
+        if run := params.getlist("run"):
+            items = [d for d in items if d["run"] in run]
+        items = ordered(items, request)
+        return ok({"docs": [self._public(d) for d in paginate(items, request)], "total": len(items)})
+
+    def _document(self, request: Request) -> Optional[dict]:
+        documents = self.documents.get(request.path_params["dataset_id"], {})
+        return documents.get(request.path_params["document_id"])
+
+    async def update_document(self, request: Request) -> Response:
+        document = self._document(request)
+        if document is None:
+            return api_error(102, "The dataset doesn't own the document.")
+        body = await request.json()
+        document.update({k: v for k, v in body.items() if k in ("name", "meta_fields", "chunk_method",
+                                                                  "parser_config", "enabled")})
+        document["update_time"] = int(time.time() * 1000)
+        return ok(self._public(document))
+
+    async def download_document(self, request: Request) -> Response:
+        document = self._document(request)
+        if document is None:
+            return api_error(102, f"The dataset not own the document {request.path_params['document_id']}.")
+        size, chunk_size = document["size"], self.config.stream_chunk_size
+        read = self._content(document)
+        delay = self.config.stream_delay_ms / 1000
+
+        async def body():
+            for start in range(0, size, chunk_size):
+                if delay and start:
+                    await asyncio.sleep(delay)
+                yield read(start, min(start + chunk_size, size))
+
+        return StreamingResponse(
+            body(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{document["name"]}"',
+                     "Content-Length": str(size)},
+        )
+
+    async def delete_documents(self, request: Request) -> Response:
+        dataset = self._dataset(request)
+        if dataset is None:
+            return self._not_owned(request)
+        documents = self.documents[dataset["id"]]
+        ids = (await request.json()).get("ids") or list(documents)
+        missing = [i for i in ids if i not in documents]
+        if missing:
+            return api_error(102, f"Documents not found: {missing}")
+        for document_id in ids:
+            document = documents.pop(document_id)
+            dataset["document_count"] -= 1
+            dataset["chunk_count"] -= document["chunk_count"] or 0
+            self.contents.pop(document_id, None)
+            self.chunks.pop(document_id, None)
+        return ok()
+
+    async def parse_documents(self, request: Request) -> Response:
+        dataset = self._dataset(request)
+        if dataset is None:
+            return self._not_owned(request)
+        documents = self.documents[dataset["id"]]
+        ids = (await request.json()).get("document_ids") or []
+        if not ids:
+            return api_error(101, "`document_ids` is required")
+        for document_id in ids:
+            if document_id not in documents:
+                return api_error(102, f"You don't own the document {document_id}.")
+        started = time.monotonic()
+        for document_id in ids:
+            documents[document_id].update(run="RUNNING", progress=0.0, _parse_started=started)
+            self.chunks.pop(document_id, None)
+        return ok()
+
+    async def stop_parsing(self, request: Request) -> Response:
+        dataset = self._dataset(request)
+        if dataset is None:
+            return self._not_owned(request)
+        documents = self.documents[dataset["id"]]
+        for document_id in (await request.json()).get("document_ids") or []:
+            document = documents.get(document_id)
+            if document is None or self._refresh(document)["run"] != "RUNNING":
+                return api_error(102, "Can't stop parsing document with progress at 0 or 1")
+            document.update(run="CANCEL")
+            document.pop("_parse_started", None)
+        return ok()
+
+    # ---------- chunks ----------
+
+    async def list_chunks(self, request: Request) -> Response:
+        if self._dataset(request) is None:
+            return self._not_owned(request)
+        document = self._document(request)
+        if document is None:
+            return api_error(102, "You don't own the document.")
+        chunks = self._chunks_of(self._refresh(document))
+        if chunk_id := request.query_params.get("id"):
+            chunks = [c for c in chunks if c["id"] == chunk_id]
+        if keywords := request.query_params.get("keywords"):
+            chunks = [c for c in chunks if keywords.lower() in c["content"].lower()]
+        return ok({"chunks": paginate(chunks, request), "doc": self._public(document), "total": len(chunks)})
+
+    async def add_chunk(self, request: Request) -> Response:
+        if self._dataset(request) is None:
+            return self._not_owned(request)
+        document = self._document(request)
+        if document is None:
+            return api_error(102, "You don't own the document.")
+        body = await request.json()
+        if not body.get("content"):
+            return api_error(101, "`content` is required")
+        chunk = {
+            "id": self._id(),
+            "dataset_id": document["dataset_id"],
+            "document_id": document["id"],
+            "content": body["content"],
+            "available": True,
+            "docnm_kwd": document["name"],
+            "important_keywords": body.get("important_keywords") or [],
+            "questions": body.get("questions") or [],
+        }
+        self._chunks_of(document).append(chunk)
+        document["chunk_count"] = (document["chunk_count"] or 0) + 1
+        return ok({"chunk": chunk})
+
+    async def update_chunk(self, request: Request) -> Response:
+        if self._dataset(request) is None:
+            return self._not_owned(request)
+        document = self._document(request)
+        if document is None:
+            return api_error(102, "You don't own the document.")
+        for chunk in self._chunks_of(document):
+            if chunk["id"] == request.path_params["chunk_id"]:
+                body = await request.json()
+                chunk.update({k: v for k, v in body.items() if k in ("content", "important_keywords", "available")})
+                return ok()
+        return api_error(102, f"Can't find this chunk {request.path_params['chunk_id']}")
+
+    async def delete_chunks(self, request: Request) -> Response:
+        if self._dataset(request) is None:
+            return self._not_owned(request)
+        document = self._document(request)
+        if document is None:
+            return api_error(102, "You don't own the document.")
+        chunks = self._chunks_of(document)
+        ids = set((await request.json()).get("chunk_ids") or [c["id"] for c in chunks])
+        kept = [c for c in chunks if c["id"] not in ids]
+        if len(chunks) - len(kept) != len(ids):
+            return api_error(102, "rm_chunk deleted chunks mismatch")
+        self.chunks[document["id"]] = kept
+        document["chunk_count"] = len(kept)
+        return ok()
+
+    # ---------- 控制接口 ----------
+
+    async def get_stats(self, request: Request) -> Response:
+        return JSONResponse({
+            "requests": dict(self.stats),
+            "injected": dict(self.injected),
+            "faults": {"default": asdict(self.config.default),
+                       **{k: asdict(v) for k, v in self.config.operations.items()}},
+        })
+
+    async def put_faults(self, request: Request) -> Response:
+        self.config.set_faults(await request.json())
+        return await self.get_stats(request)
+
+    async def post_reset(self, request: Request) -> Response:
+        self.reset()
+        return JSONResponse({"reset": True})
+
+    def asgi(self) -> Starlette:
+        e = self.endpoint
+        prefix = "/api/v1/datasets"
+        document = prefix + "/{dataset_id}/documents/{document_id}"
+        return Starlette(routes=[
+            Route(prefix, e("datasets.list", self.list_datasets), methods=["GET"]),
+            Route(prefix, e("datasets.create", self.create_dataset), methods=["POST"]),
+            Route(prefix, e("datasets.delete", self.delete_datasets), methods=["DELETE"]),
+            Route(prefix + "/{dataset_id}", e("datasets.update", self.update_dataset), methods=["PUT"]),
+            Route(prefix + "/{dataset_id}/documents", e("documents.list", self.list_documents), methods=["GET"]),
+            Route(prefix + "/{dataset_id}/documents", e("documents.upload", self.upload_documents), methods=["POST"]),
+            Route(prefix + "/{dataset_id}/documents", e("documents.delete", self.delete_documents), methods=["DELETE"]),
+            Route(document, e("documents.download", self.download_document), methods=["GET"]),
+            Route(document, e("documents.update", self.update_document), methods=["PUT"]),
+            Route(prefix + "/{dataset_id}/chunks", e("documents.parse", self.parse_documents), methods=["POST"]),
+            Route(prefix + "/{dataset_id}/chunks", e("documents.stop_parse", self.stop_parsing), methods=["DELETE"]),
+            Route(document + "/chunks", e("chunks.list", self.list_chunks), methods=["GET"]),
+            Route(document + "/chunks", e("chunks.add", self.add_chunk), methods=["POST"]),
+            Route(document + "/chunks", e("chunks.delete", self.delete_chunks), methods=["DELETE"]),
+            Route(document + "/chunks/{chunk_id}", e("chunks.update", self.update_chunk), methods=["PUT"]),
+            Route("/_fake/stats", self.get_stats, methods=["GET"]),
+            Route("/_fake/faults", self.put_faults, methods=["PUT"]),
+            Route("/_fake/reset", self.post_reset, methods=["POST"]),
+        ])
+
+
+def create_app(config: Optional[FakeConfig] = None) -> Starlette:
+    fake = FakeRAGFlow(config)
+    app = fake.asgi()
+    app.state.fake = fake
+    return app
+
+
+app = create_app(FakeConfig.from_env())
@@ -0,0 +1,45 @@
+import pytest
+
+from app.core.jwt import create_access_token, verify_token
+from app.core.permissions import get_permission_registry, decode_mask
+from app.core.security import get_password_context
+
+PASSWORD = "Benchmark#Passw0rd"
+
+
+def test_create_access_token(benchmark):
+    token = benchmark(create_access_token, 42)
+    assert verify_token(token)["sub"] == "42"
+
+
+def test_verify_token(benchmark):
+    token = create_access_token(42)
+    payload = benchmark(verify_token, token, expected_type="access")
+    assert payload["sub"] == "42"
+
+
+def test_permission_claim_check(benchmark):
+    registry = get_permission_registry()
+    permissions = list(registry.permission_bits)
+    payload = verify_token(create_access_token(42, permissions=permissions, roles=list(registry.role_bits)))
+    bit = registry.permission_bits[permissions[-1]]
+
+    def check():
+        return registry.is_current(payload) and bool(decode_mask(payload.get("perm")) & bit)
+
+    assert benchmark(check)
+
+
+@pytest.fixture(scope="module")
+def password_hash() -> str:
+    return get_password_context().hash(PASSWORD)
+
+
+def test_pwd_hash(benchmark):
+    # pbkdf2 is deliberately slow: a few rounds are enough
+    hashed = benchmark.pedantic(get_password_context().hash, args=(PASSWORD,), rounds=5, iterations=1)
+    assert hashed.startswith("$pbkdf2-sha256$")
+
+
+def test_pwd_verify(benchmark, password_hash):
+    assert benchmark.pedantic(get_password_context().verify, args=(PASSWORD, password_hash), rounds=5, iterations=1)
@@ -0,0 +1,14 @@
+"""
+Import-time budgets of the entry points (`benchmarks/importtime.py`): the worker, the
+scheduler and CLI tools must not import the heavy optional dependencies, and no entry point
+may exceed its time budget (scaled by `IMPORT_TIME_BUDGET_SCALE`).
+"""
+import pytest
+
+from importtime import BUDGETS, budget_scale, measure
+
+
+@pytest.mark.parametrize("entry", list(BUDGETS))
+def test_import_budget(entry):
+    profile = measure(entry)
+    assert profile.violations(BUDGETS[entry], budget_scale()) == []
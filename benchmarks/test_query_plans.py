@@ -0,0 +1,87 @@
+"""
+Query plans of the auth hot path over the role / permission association tables.
+
+The plan checks run `EXPLAIN (FORMAT JSON)` against the Postgres configured by `DB_*`
+(migrated to head) with sequential scans disabled for the transaction, so any scan of an
+association table that no index can serve still shows up as `Seq Scan`; they are skipped
+when the database is not reachable. The metadata checks need no database.
+"""
+import asyncio
+import json
+from typing import Iterator, List
+
+import pytest
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.settings import settings
+from app.models import Permission, Role
+from app.models.iam import auth_role_permissions, auth_user_roles
+
+ASSOCIATIONS = {
+    "auth_user_roles": (auth_user_roles, ("user_id", "role_id"), "idx_user_roles_role"),
+    "auth_role_permissions": (auth_role_permissions, ("role_id", "permission_id"), "idx_role_permissions_permission"),
+}
+
+HOT_PATH = {
+    # selectinload(User.roles)
+    "user_roles": select(auth_user_roles.c.user_id, Role)
+    .join(auth_user_roles, Role.id == auth_user_roles.c.role_id)
+    .where(auth_user_roles.c.user_id.in_([1, 2, 3])),
+    # selectinload(Role.permissions)（has_perm 回退到数据库时）
+    "role_permissions": select(auth_role_permissions.c.role_id, Permission)
+    .join(auth_role_permissions, Permission.id == auth_role_permissions.c.permission_id)
+    .where(auth_role_permissions.c.role_id.in_([1, 2])),
+    # assign_roles 清空用户角色
+    "assign_roles_delete": delete(auth_user_roles).where(auth_user_roles.c.user_id == 1),
+    # 反向：角色下的用户、拥有某权限的角色
+    "role_users": select(auth_user_roles.c.user_id).where(auth_user_roles.c.role_id == 1),
+    "permission_roles": select(auth_role_permissions.c.role_id).where(auth_role_permissions.c.permission_id == 1),
+}
+
+
+@pytest.mark.parametrize("table", list(ASSOCIATIONS))
+def test_association_keys(table):
+    model, pk, reverse_index = ASSOCIATIONS[table]
+    assert tuple(c.name for c in model.primary_key.columns) == pk
+    index = next(i for i in model.indexes if i.name == reverse_index)
+    assert tuple(c.name for c in index.columns) == tuple(reversed(pk))
+
+
+def plan_nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def explain(statements: dict) -> dict:
+    engine = create_async_engine(str(settings.db.dsn), connect_args={"timeout": 2})
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SET LOCAL enable_seqscan = off"))
+            plans = {}
+            for name, stmt in statements.items():
+                sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+                raw = (await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar()
+                plans[name] = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+            await conn.rollback()
+            return plans
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def plans() -> dict:
+    try:
+        return asyncio.run(explain(HOT_PATH))
+    except Exception as e:
+        pytest.skip(f"Postgres not available for query plans: {e!r}")
+
+
+@pytest.mark.parametrize("query", list(HOT_PATH))
+def test_hot_path_uses_indexes(plans, query):
+    scans: List[dict] = [n for n in plan_nodes(plans[query]) if n.get("Relation Name") in ASSOCIATIONS]
+    assert scans, f"{query} does not read an association table"
+    for node in scans:
+        assert node["Node Type"] != "Seq Scan", f"{query}: sequential scan on {node['Relation Name']}"
@@ -0,0 +1,100 @@
+"""
+Serialization of a 100-item page.
+
+Compares FastAPI's default path (the endpoint returns `Response(data=...)`, FastAPI validates
+it against `response_model` and dumps it) with `app.core.responses.json_response`.
+Peak memory of one call is attached to each result as `extra_info["peak_kib"]`.
+"""
+import json
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable
+
+import pytest
+from fastapi.utils import create_model_field
+from ragflow_async_sdk.models import Document
+
+from app.core.responses import json_response
+from app.schemas import Response, PageData
+from app.schemas.iam import UserOut
+
+ITEMS = 100
+
+
+class UserRow:
+    """Stands in for an ORM row: plain attributes, validated via `from_attributes`."""
+
+    def __init__(self, i: int):
+        now = datetime.now(timezone.utc)
+        self.id = i
+        self.username = f"user{i}"
+        self.nickname = None
+        self.is_active = True
+        self.avatar = None
+        self.is_superuser = False
+        self.created_at = now
+        self.updated_at = now
+
+
+def make_document(i: int) -> Document:
+    return Document.from_raw({
+        "id": f"doc-{i}",
+        "dataset_id": "dataset-1",
+        "name": f"report-{i}.pdf",
+        "type": "pdf",
+        "location": f"report-{i}.pdf",
+        "run": "DONE",
+        "suffix": "pdf",
+        "size": 1024 * i,
+        "chunk_method": "naive",
+        "chunk_count": 12,
+        "token_count": 3400,
+        "parser_config": {"chunk_token_num": 512, "delimiter": "\n"},
+        "progress": 1.0,
+        "create_time": 1700000000000 + i,
+    })
+
+
+def legacy(model, items) -> Callable[[], bytes]:
+    field = create_model_field(name="Response_bench", type_=Response[PageData[model]], mode="serialization")
+
+    def run() -> bytes:
+        content = Response(data=PageData(total=len(items), page=1, page_size=len(items), items=items))
+        value, errors = field.validate(content, {}, loc=("response",))
+        assert not errors
+        return field.serialize_json(value)
+    return run
+
+
+def fast(model, items, validate: bool) -> Callable[[], bytes]:
+    def run() -> bytes:
+        page = PageData(total=len(items), page=1, page_size=len(items), items=items)
+        return json_response(page, model=PageData[model] if validate else None).body
+    return run
+
+
+CASES = {
+    "users": (UserOut, lambda: [UserRow(i) for i in range(ITEMS)], True),
+    "documents": (Document, lambda: [make_document(i) for i in range(ITEMS)], False),
+}
+
+
+def peak_kib(fn: Callable[[], bytes]) -> float:
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+@pytest.mark.parametrize("path", ["legacy", "json_response"])
+@pytest.mark.parametrize("case", list(CASES))
+def test_serialize_page(benchmark, case, path):
+    model, make_items, validate = CASES[case]
+    items = make_items()
+    fn = legacy(model, items) if path == "legacy" else fast(model, items, validate)
+    expected = json.loads(legacy(model, items)())
+
+    benchmark.group = f"serialize-{case}"
+    benchmark.extra_info["peak_kib"] = peak_kib(fn)
+    assert json.loads(benchmark(fn)) == expected
@@ -0,0 +1,3 @@
+"""
+运维接口（健康检查、上游状态等），不带版本前缀
+"""
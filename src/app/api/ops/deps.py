@@ -0,0 +1,23 @@
+import secrets
+
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_db_session
+from app.core.security import has_role, oauth2_scheme
+from app.core.settings import settings
+
+admin_required = has_role("admin")
+
+
+async def metrics_access(
+        request: Request,
+        token: str = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_db_session),
+) -> None:
+    """
+    `/metrics` accepts the static `METRICS_TOKEN` (for Prometheus scrapes) or an admin's access token.
+    """
+    if settings.metrics_token and secrets.compare_digest(token.encode(), settings.metrics_token.encode()):
+        return
+    await admin_required(request, token, db)
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi import Response as HTTPResponse
+from fastapi.responses import JSONResponse
+
+from app.api.ops.deps import admin_required, metrics_access
+from app.core.metrics import render_latest
+from app.core.ragflow import ragflow_client
+from app.core.redis import redis_manager
+from app.core.warmup import check_ready, readiness
+from app.schemas import Response
+
+# 运行状态，仅管理员可见
+router = APIRouter(prefix="/ops", tags=["ops"], dependencies=[Depends(admin_required)])
+
+# 约定俗成的根路径端点（/healthz、/readyz），不挂前缀，供探针匿名访问
+root_router = APIRouter(tags=["ops"])
+# /metrics，METRICS_ENABLED 时挂载；需 METRICS_TOKEN 或管理员令牌
+metrics_router = APIRouter(tags=["ops"], dependencies=[Depends(metrics_access)])
+
+
+@router.get("/upstream")
+async def upstream_status():
+    """
+    Circuit breaker, retry budget and concurrency limit state of the RAGFlow upstream.
+    """
+    return Response(data=ragflow_client.guard.snapshot())
+
+
+@router.get("/redis")
+async def redis_status():
+    """
+    Occupancy of this process's Redis connection pools.
+    """
+    return Response(data=redis_manager.snapshot())
+
+
+@root_router.get("/healthz", include_in_schema=False)
+async def healthz():
+    """
+    Liveness: the process serves requests.
+    """
+    return {"status": "ok"}
+
+
+@root_router.get("/readyz", include_in_schema=False)
+async def readyz(request: Request):
+    """
+    Readiness: warm-up finished and the database and Redis answer.
+    """
+    body = {"ready": readiness.ready, "warmup": readiness.snapshot()}
+    if not readiness.ready:
+        return JSONResponse(body, status_code=503)
+    body["checks"] = await check_ready(request.app.state.redis)
+    ok = all(body["checks"].values())
+    body["ready"] = ok
+    return JSONResponse(body, status_code=200 if ok else 503)
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus text exposition.
+    """
+    content, content_type = render_latest()
+    return HTTPResponse(content=content, media_type=content_type)
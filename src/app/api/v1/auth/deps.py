@@ -1,7 +1,9 @@
 from fastapi import Depends
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.db import get_db_session
+from app.core.redis import get_redis
 from app.services.auth import LoginService
 from app.services.auth.registration import RegistrationService
 
@@ -10,5 +12,8 @@ def get_registration_service(db: AsyncSession = Depends(get_db_session)) -> Regi
     return RegistrationService(db)
 
 
-def get_login_service(db: AsyncSession = Depends(get_db_session)) -> LoginService:
-    return LoginService(db)
+def get_login_service(
+        db: AsyncSession = Depends(get_db_session),
+        redis: Redis = Depends(get_redis),
+) -> LoginService:
+    return LoginService(db, redis)
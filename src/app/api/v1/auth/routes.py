@@ -1,6 +1,10 @@
 from fastapi import APIRouter, Depends
 
 from app.api.v1.auth.deps import get_registration_service, get_login_service
+from app.core.conditional import ConditionalRequest, conditional, STATIC
+from app.core.ratelimit import rate_limit
+from app.core.security import login_required
+from app.core.responses import json_response
 from app.core.validators.password import get_password_rules
 from app.schemas.auth import UserLogin, TokenOut, TokenRefresh, UserRegister
 from app.schemas.iam import UserOut
@@ -11,7 +15,8 @@ from app.services.auth.registration import RegistrationService
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
-@router.post("/register", response_model=Response[UserOut])
+@router.post("/register", response_model=Response[UserOut],
+             dependencies=[Depends(rate_limit("auth.register", "5/minute", per="ip"))])
 async def register(
         data: UserRegister,
         service: RegistrationService = Depends(get_registration_service)
@@ -20,7 +25,8 @@ async def register(
     return Response(data=UserOut.model_validate(user))
 
 
-@router.post("/login", response_model=Response[TokenOut])
+@router.post("/login", response_model=Response[TokenOut],
+             dependencies=[Depends(rate_limit("auth.login", "10/minute", per="ip"))])
 async def login(
         data: UserLogin,
         service: LoginService = Depends(get_login_service)
@@ -30,7 +36,8 @@ async def login(
     return Response(data=data)
 
 
-@router.post("/refresh", response_model=Response[TokenOut])
+@router.post("/refresh", response_model=Response[TokenOut],
+             dependencies=[Depends(rate_limit("auth.refresh", "30/minute", per="ip"))])
 async def refresh(
         data: TokenRefresh,
         service: LoginService = Depends(get_login_service)
@@ -38,6 +45,15 @@ async def refresh(
     return Response(data=TokenOut(**await service.refresh_token(data.refresh_token)))
 
 
+@router.post("/logout", response_model=Response)
+async def logout(
+        payload: dict = Depends(login_required),
+        service: LoginService = Depends(get_login_service)
+):
+    await service.logout(payload)
+    return Response()
+
+
 @router.get("/password-rules")
-async def password_rules():
-    return Response(data=get_password_rules())
+async def password_rules(cache: ConditionalRequest = Depends(conditional(STATIC))):
+    return cache.respond(json_response(get_password_rules()))
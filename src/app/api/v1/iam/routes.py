@@ -4,6 +4,9 @@ from fastapi import APIRouter, Query, Depends, Path
 
 from app.api.v1.iam.deps import get_user_service, get_role_service
 from app.api.v1.iam.schemas import AssignRolesRequest, CreateUserRequest, DisableUsersRequest
+from app.core.conditional import ConditionalRequest, conditional
+from app.core.ratelimit import rate_limit
+from app.core.responses import json_response
 from app.core.security import login_required, has_role, get_current_user
 from app.models import User
 from app.schemas import Response, PageData
@@ -17,7 +20,8 @@ router = APIRouter(
     tags=["iam"],
     dependencies=[
         Depends(login_required),
-        Depends(has_role("admin"))
+        Depends(has_role("admin")),
+        Depends(rate_limit("iam", "120/minute")),
     ]
 )
 
@@ -43,7 +47,7 @@ async def list_users(
         page_size=page_size,
         items=items
     )
-    return Response(data=page_data)
+    return json_response(page_data, model=PageData[UserOut])
 
 
 @router.post("/users", response_model=Response[UserOut])
@@ -78,13 +82,14 @@ async def delete_users_batch(
 @router.get("/users/{user_id}/roles", response_model=Response[List[RoleOut]])
 async def list_user_roles(
         user_id: int = Path(..., ge=1),
-        service: UserService = Depends(get_user_service)
+        service: UserService = Depends(get_user_service),
+        cache: ConditionalRequest = Depends(conditional()),
 ):
     """
     Fetch roles for a user
     """
     roles = await service.list_roles_for_user(user_id)
-    return Response(data=roles)
+    return cache.respond(json_response(roles, model=List[RoleOut]))
 
 
 @router.post("/users/{user_id}/roles", response_model=Response[List[RoleOut]])
@@ -119,8 +124,12 @@ async def list_roles(
         page_size: int = Query(10, ge=1, le=100),
         order_by: str | None = Query("id"),
         desc: bool = Query(True),
-        service: RoleService = Depends(get_role_service)
+        service: RoleService = Depends(get_role_service),
+        cache: ConditionalRequest = Depends(conditional()),
 ):
+    if not_modified := cache.not_modified(await service.get_version()):
+        return not_modified
+
     items, total = await service.get_paged(
         page=page,
         page_size=page_size,
@@ -134,4 +143,4 @@ async def list_roles(
         page_size=page_size,
         items=items
     )
-    return Response(data=page_data)
+    return cache.respond(json_response(page_data, model=PageData[RoleOut]))
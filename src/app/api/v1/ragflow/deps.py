@@ -0,0 +1,14 @@
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_db_session
+from app.services.ragflow.access import RagflowAccessService
+from app.services.ragflow.mirror import RagflowMirrorService
+
+
+def get_mirror_service(db: AsyncSession = Depends(get_db_session)) -> RagflowMirrorService:
+    return RagflowMirrorService(db)
+
+
+def get_access_service(db: AsyncSession = Depends(get_db_session)) -> RagflowAccessService:
+    return RagflowAccessService(db)
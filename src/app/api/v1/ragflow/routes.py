@@ -1,24 +1,93 @@
+from datetime import datetime, timezone
 from typing import Optional, List
 
-from fastapi import APIRouter, Query, Depends, UploadFile, File
+from fastapi import APIRouter, Query, Depends, UploadFile, File, Body, status
+from fastapi import Response as HTTPResponse
 from fastapi.responses import StreamingResponse
+from redis.asyncio import Redis
 
-from app.api.v1.ragflow.schemas import HandleDocumentsRequest
+from app.api.v1.ragflow.deps import get_mirror_service, get_access_service
+from app.api.v1.ragflow.schemas import HandleDocumentsRequest, HandleChunksRequest, JobOut
 from ragflow_async_sdk.models import Dataset, Document
-from ragflow_async_sdk import AsyncRAGFlowClient
-from app.api.v1.ragflow.utils import get_content_disposition
+from app.api.v1.ragflow.utils import get_content_disposition, upload_size
+from app.core.exceptions import NotFoundError
+from app.core.conditional import ConditionalRequest, conditional
+from app.core.ragflow import ragflow_client as client
+from app.core.ratelimit import rate_limit
+from app.core.responses import json_response
+from app.core.redis import get_redis
 from app.core.security import login_required
-from app.core.settings import settings
 from app.schemas import Response, PageData
+from app.core.settings import settings
+from app.services.ragflow import JobStore, RagflowAccessService
+from app.services.ragflow.batch import (
+    BatchExecutor,
+    DELETE_CHUNKS_JOB_KIND,
+    DELETE_DOCUMENTS_JOB_KIND,
+    delete_chunk_ids_op,
+    delete_document_chunks_op,
+    delete_documents_op,
+)
+from app.services.ragflow.mirror import RagflowMirrorService, DATASETS_SCOPE, documents_scope
+from app.services.ragflow.parsing import PARSE_JOB_KIND
+from app.services.ragflow.quota import QuotaCounters
+from app.tasks.ragflow import parse_documents, delete_batch
 from ragflow_async_sdk.utils.files import file_from_bytes
 
-
-client = AsyncRAGFlowClient(
-    server_url=settings.ragflow.origin_url,
-    api_key=settings.ragflow.api_key,
+# 每个路由按用户各 120 次 / 分钟；上游操作另有按用户的限额（RATELIMIT_OPERATIONS）
+router = APIRouter(
+    prefix="/ragflow",
+    tags=["ragflow"],
+    dependencies=[Depends(login_required), Depends(rate_limit("ragflow", "120/minute"))],
 )
 
-router = APIRouter(prefix="/ragflow", tags=["ragflow"], dependencies=[Depends(login_required)])
+SOURCE_PATTERN = "^(upstream|mirror)$"
+
+
+def use_mirror(source: Optional[str]) -> bool:
+    return source == "mirror" if source else settings.ragflow.mirror_reads
+
+
+async def set_mirror_headers(response: HTTPResponse, mirror: RagflowMirrorService, scope: str):
+    """
+    Tell clients the data came from the local mirror and how old it is.
+    """
+    response.headers["X-Data-Source"] = "mirror"
+    synced_at = await mirror.synced_at(scope)
+    if synced_at:
+        age = (datetime.now(timezone.utc) - synced_at).total_seconds()
+        response.headers["X-Mirror-Synced-At"] = synced_at.isoformat()
+        response.headers["X-Mirror-Age"] = str(max(0, int(age)))
+
+
+async def run_batch_delete(
+        kind: str,
+        dataset_id: str,
+        ids: List[str],
+        background: bool,
+        user_id: str,
+        redis: Redis,
+        response: HTTPResponse,
+        access: RagflowAccessService,
+):
+    """
+    Run a batch delete inline, or as a background job when asked to or when the id set is large.
+    Deleted documents lose their ownership and mirror rows.
+    """
+    ids = list(dict.fromkeys(ids))
+    if background or len(ids) > settings.ragflow.delete_background_threshold:
+        store = JobStore(redis)
+        job_id = await store.create(kind, user_id, dataset_id, ids)
+        await delete_batch.kiq(job_id)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return Response(data=JobOut(**await store.get(job_id)))
+
+    if kind == DELETE_DOCUMENTS_JOB_KIND:
+        outcomes = await BatchExecutor().run(ids, delete_documents_op(dataset_id, client))
+        await access.forget_documents(dataset_id, [o["id"] for o in outcomes if o["success"]])
+    else:
+        outcomes = await BatchExecutor(batch_size=1).run(ids, delete_document_chunks_op(dataset_id, client))
+    return Response(data=outcomes)
 
 
 @router.get("/datasets", response_model=Response[PageData[Dataset]])
@@ -29,22 +98,48 @@ async def list_datasets(
         desc: Optional[bool] = Query(None),
         _id: Optional[str] = Query(None),
         name: Optional[str] = Query(None),
+        source: Optional[str] = Query(None, pattern=SOURCE_PATTERN),
+        response: HTTPResponse = None,
+        payload: dict = Depends(login_required),
+        mirror: RagflowMirrorService = Depends(get_mirror_service),
+        access: RagflowAccessService = Depends(get_access_service),
+        cache: ConditionalRequest = Depends(conditional()),
 ):
-    datasets, total = await client.datasets.list_datasets(
-        page=page,
-        page_size=page_size,
-        order_by=order_by,
-        desc=desc,
-        dataset_id=_id,
-        name=name
-    )
+    """
+    Non-admin users only see datasets granted to them; their listing is always read from the
+    mirror, where the grants are an indexed semi-join with exact totals.
+    Mirror reads are versioned by the mirror rows, so unchanged listings answer 304 without a query.
+    """
+    scope = await access.get_scope(int(payload["sub"]))
+    if use_mirror(source) or not scope.unrestricted:
+        if not_modified := cache.not_modified(await mirror.datasets_version(), scope):
+            return not_modified
+        datasets, total = await mirror.list_datasets(
+            page=page,
+            page_size=page_size,
+            order_by=order_by,
+            desc=desc,
+            dataset_id=_id,
+            name=name,
+            owner_id=None if scope.unrestricted else scope.user_id,
+        )
+        await set_mirror_headers(response, mirror, DATASETS_SCOPE)
+    else:
+        datasets, total = await client.datasets.list_datasets(
+            page=page,
+            page_size=page_size,
+            order_by=order_by,
+            desc=desc,
+            dataset_id=_id,
+            name=name
+        )
     page_data = PageData(
         total=total,
         page=page,
         page_size=page_size,
         items=datasets
     )
-    return Response(data=page_data)
+    return cache.respond(json_response(page_data, response=response))
 
 
 @router.get("/datasets/{dataset_id}/documents", response_model=Response[PageData[Document]])
@@ -56,23 +151,50 @@ async def list_documents(
         desc: Optional[bool] = Query(None),
         keywords: Optional[str] = Query(None),
         suffix: Optional[str] = Query(None),
+        source: Optional[str] = Query(None, pattern=SOURCE_PATTERN),
+        response: HTTPResponse = None,
+        payload: dict = Depends(login_required),
+        mirror: RagflowMirrorService = Depends(get_mirror_service),
+        access: RagflowAccessService = Depends(get_access_service),
+        cache: ConditionalRequest = Depends(conditional()),
 ):
-    items, total = await client.documents.list_documents(
-        dataset_id,
-        page=page,
-        page_size=page_size,
-        order_by=order_by,
-        desc=desc,
-        keywords=keywords,
-        suffix=suffix
-    )
+    """
+    Users granted the dataset see all of its documents; others only the documents they uploaded,
+    read from the mirror like the restricted dataset listing.
+    """
+    scope = await access.get_scope(int(payload["sub"]))
+    restricted = not scope.can_list_dataset(dataset_id)
+    if use_mirror(source) or restricted:
+        if not_modified := cache.not_modified(await mirror.documents_version(dataset_id), scope):
+            return not_modified
+        items, total = await mirror.list_documents(
+            dataset_id,
+            page=page,
+            page_size=page_size,
+            order_by=order_by,
+            desc=desc,
+            keywords=keywords,
+            suffix=suffix,
+            owner_id=scope.user_id if restricted else None,
+        )
+        await set_mirror_headers(response, mirror, documents_scope(dataset_id))
+    else:
+        items, total = await client.documents.list_documents(
+            dataset_id,
+            page=page,
+            page_size=page_size,
+            order_by=order_by,
+            desc=desc,
+            keywords=keywords,
+            suffix=suffix
+        )
     page_data = PageData(
         total=total,
         page=page,
         page_size=page_size,
         items=items
     )
-    return Response(data=page_data)
+    return cache.respond(json_response(page_data, response=response))
 
 
 @router.post("/datasets/{dataset_id}/documents",
@@ -80,22 +202,85 @@ async def list_documents(
 async def upload_documents(
         dataset_id: str,
         files: List[UploadFile] = File(...),
+        payload: dict = Depends(login_required),
+        access: RagflowAccessService = Depends(get_access_service),
+        redis: Redis = Depends(get_redis),
 ):
-    files = [file_from_bytes(f.filename, await f.read(), f.content_type) for f in files]
-    docs = await client.documents.upload_documents(dataset_id, files=files)
+    """
+    Upload documents; storage quotas are reserved from the declared sizes before the files
+    are read into memory, and an over-quota upload never reaches RAGFlow.
+    """
+    sizes = [upload_size(f) for f in files]
+    reservation = await QuotaCounters(redis).reserve_upload(payload["sub"], dataset_id, sizes)
+    try:
+        files = [file_from_bytes(f.filename, await f.read(), f.content_type) for f in files]
+        docs = await client.documents.upload_documents(dataset_id, files=files)
+    except BaseException:
+        await reservation.release()
+        raise
+    # 以上游记录的大小为准，缺失时按上传顺序取声明大小
+    recorded = [d.size or (sizes[i] if i < len(sizes) else 0) for i, d in enumerate(docs)]
+    try:
+        await access.record_uploaded(int(payload["sub"]), dataset_id, docs, recorded)
+    finally:
+        await reservation.commit()
     return Response(data=docs)
 
 
 @router.delete("/datasets/{dataset_id}/documents")
-async def delete_documents(dataset_id: str, req: HandleDocumentsRequest):
-    await client.documents.delete_documents(dataset_id, req.document_ids)
-    return Response()
+async def delete_documents(
+        dataset_id: str,
+        req: HandleDocumentsRequest,
+        response: HTTPResponse,
+        background: bool = Query(False),
+        payload: dict = Depends(login_required),
+        redis: Redis = Depends(get_redis),
+        access: RagflowAccessService = Depends(get_access_service),
+):
+    """
+    Delete documents in chunked, concurrent upstream batches and report per-id outcomes.
+    Large sets (or `background=true`) run as a job, polled via `/ragflow/jobs/{job_id}`.
+    """
+    return await run_batch_delete(
+        DELETE_DOCUMENTS_JOB_KIND, dataset_id, req.document_ids, background, payload["sub"], redis, response,
+        access,
+    )
+
+
+@router.delete("/datasets/{dataset_id}/chunks")
+async def delete_documents_chunks(
+        dataset_id: str,
+        req: HandleDocumentsRequest,
+        response: HTTPResponse,
+        background: bool = Query(False),
+        payload: dict = Depends(login_required),
+        redis: Redis = Depends(get_redis),
+        access: RagflowAccessService = Depends(get_access_service),
+):
+    """
+    Delete all chunks of many documents concurrently.
+    """
+    return await run_batch_delete(
+        DELETE_CHUNKS_JOB_KIND, dataset_id, req.document_ids, background, payload["sub"], redis, response,
+        access,
+    )
 
 
 @router.delete("/datasets/{dataset_id}/documents/{document_id}/chunks")
-async def delete_document_chunks(dataset_id: str, document_id: str):
-    await client.chunks.delete_chunks(dataset_id, document_id)
-    return Response()
+async def delete_document_chunks(
+        dataset_id: str,
+        document_id: str,
+        req: Optional[HandleChunksRequest] = Body(None),
+):
+    """
+    Delete all chunks of a document, or only `chunks_ids` (split into upstream batches).
+    """
+    if not req or not req.chunks_ids:
+        await client.chunks.delete_chunks(dataset_id, document_id)
+        return Response()
+
+    outcomes = await BatchExecutor().run(req.chunks_ids, delete_chunk_ids_op(dataset_id, document_id, client))
+    return Response(data=outcomes)
 
 
 @router.get("/datasets/{dataset_id}/documents/{document_id}")
@@ -113,10 +298,38 @@ async def download_document(
     )
 
 
-@router.post("/datasets/{dataset_id}/chunks")
+@router.post("/datasets/{dataset_id}/chunks",
+             response_model=Response[JobOut],
+             status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(rate_limit("ragflow.parse", "10/minute burst=5", per_route=False))])
 async def parse_document_chunks(
         dataset_id: str,
         req: HandleDocumentsRequest,
+        payload: dict = Depends(login_required),
+        redis: Redis = Depends(get_redis),
+):
+    """
+    Enqueue a background parse job and return immediately; poll `/ragflow/jobs/{job_id}` for progress.
+    """
+    store = JobStore(redis)
+    document_ids = list(dict.fromkeys(req.document_ids))
+    reservation = await QuotaCounters(redis).reserve_parses(payload["sub"], dataset_id, len(document_ids))
+    try:
+        job_id = await store.create(PARSE_JOB_KIND, payload["sub"], dataset_id, document_ids)
+        await parse_documents.kiq(job_id)
+    except BaseException:
+        await reservation.release()
+        raise
+    return Response(data=await store.get(job_id))
+
+
+@router.get("/jobs/{job_id}", response_model=Response[JobOut])
+async def get_job(
+        job_id: str,
+        payload: dict = Depends(login_required),
+        redis: Redis = Depends(get_redis),
 ):
-    await client.documents.parse_documents(dataset_id, req.document_ids)
-    return Response()
+    job = await JobStore(redis).get(job_id)
+    if not job or job["user_id"] != payload["sub"]:
+        raise NotFoundError(f"Job '{job_id}' not found")
+    return Response(data=job)
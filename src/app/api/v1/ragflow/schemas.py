@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 from pydantic import BaseModel, constr, Field
 
@@ -11,3 +11,29 @@ class HandleDocumentsRequest(BaseModel):
 
 class HandleChunksRequest(BaseModel):
     chunks_ids: Optional[List[NonEmptyStr]] = Field([], min_length=1)
+
+
+class BatchOutcome(BaseModel):
+    id: str
+    success: bool
+    reason: Optional[str] = None
+
+
+class JobItemOut(BaseModel):
+    status: str
+    progress: Optional[float] = None
+    message: Optional[str] = None
+
+
+class JobOut(BaseModel):
+    id: str
+    kind: str
+    dataset_id: str
+    status: str
+    total: int
+    done: int = 0
+    failed: int = 0
+    created_at: float
+    updated_at: float
+    error: Optional[str] = None
+    items: Dict[str, JobItemOut] = {}
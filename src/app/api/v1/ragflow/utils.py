@@ -1,5 +1,8 @@
+import os
 from urllib.parse import quote
 
+from fastapi import UploadFile
+
 
 def get_content_disposition(filename: str) -> str:
     """
@@ -7,3 +10,15 @@ def get_content_disposition(filename: str) -> str:
     """
     quoted_name = quote(filename)
     return f"attachment; filename*=UTF-8''{quoted_name}"
+
+
+def upload_size(file: UploadFile) -> int:
+    """
+    上传文件的字节数（已由网关接收，尚未读入内存）
+    """
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    size = file.file.seek(0, os.SEEK_END)
+    file.file.seek(position)
+    return size
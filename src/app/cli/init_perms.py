@@ -1,10 +1,23 @@
+"""
+Sync roles, permissions and their links with `permissions.yaml`.
+
+The database is read in two queries (roles + permissions, role-permission links), the
+difference with the file is computed in memory and applied with a few set-based
+statements in one short transaction. The plan is always printed; `--dry-run` stops there.
+Roles missing from the file are left untouched. Afterwards a permission-cache
+invalidation is published to the running API processes.
+
+    python -m app.cli.init_perms [--dry-run] [--no-publish]
+"""
+import argparse
 import asyncio
 import logging
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
 
-import yaml
-from sqlalchemy import delete
-from sqlalchemy.future import select
+from sqlalchemy import Integer, column, delete, func, literal_column, null, select, union_all, values
+from sqlalchemy.dialects.postgresql import insert
 
 from app.core.db import async_session
 from app.core.settings import settings
@@ -21,89 +34,179 @@ formatter = logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s")
 console_handler.setFormatter(formatter)
 logger.addHandler(console_handler)
 
+Link = Tuple[str, str]  # (role name, permission name)
+
+
+@dataclass
+class Catalog:
+    roles: Dict[str, Tuple[int, Optional[str]]] = field(default_factory=dict)  # name -> (id, display_name)
+    permissions: Dict[str, int] = field(default_factory=dict)  # name -> id
+    links: Set[Link] = field(default_factory=set)
+
+
+@dataclass
+class SyncPlan:
+    new_roles: Dict[str, str] = field(default_factory=dict)  # name -> display_name
+    renamed_roles: Dict[str, Tuple[Optional[str], str]] = field(default_factory=dict)  # name -> (old, new)
+    new_permissions: List[str] = field(default_factory=list)
+    grants: List[Link] = field(default_factory=list)
+    revokes: List[Link] = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.new_roles or self.renamed_roles or self.new_permissions or self.grants or self.revokes)
+
+    def lines(self) -> List[str]:
+        lines = [f"+ role {name} ({display_name})" for name, display_name in self.new_roles.items()]
+        lines += [f"~ role {name}: display_name {old!r} -> {new!r}" for name, (old, new) in self.renamed_roles.items()]
+        lines += [f"+ permission {name}" for name in self.new_permissions]
+        lines += [f"+ grant {perm} to {role}" for role, perm in self.grants]
+        lines += [f"- revoke {perm} from {role}" for role, perm in self.revokes]
+        return lines
+
+
+def load_yaml(path: Path) -> dict:
+    import yaml
+
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def compute_plan(data: dict, catalog: Catalog) -> SyncPlan:
+    plan = SyncPlan()
+    roles = data.get("roles") or {}
+    wanted: Set[Link] = set()
+    for role_name, info in roles.items():
+        display_name = info.get("display_name", "")
+        if role_name not in catalog.roles:
+            plan.new_roles[role_name] = display_name
+        elif catalog.roles[role_name][1] != display_name:
+            plan.renamed_roles[role_name] = (catalog.roles[role_name][1], display_name)
+        wanted.update((role_name, p) for p in info.get("permissions", []))
+
+    # 权限目录与角色引用的权限都要存在
+    names = list(dict.fromkeys([*(data.get("permissions") or []), *(p for _, p in sorted(wanted))]))
+    plan.new_permissions = [name for name in names if name not in catalog.permissions]
+
+    # 只调整文件中列出的角色
+    current = {link for link in catalog.links if link[0] in roles}
+    plan.grants = sorted(wanted - current)
+    plan.revokes = sorted(current - wanted)
+    return plan
+
+
+async def load_catalog(session) -> Catalog:
+    catalog = Catalog()
+    entities = union_all(
+        select(literal_column("'role'").label("kind"), Role.id, Role.name, Role.display_name),
+        select(literal_column("'permission'"), Permission.id, Permission.name, null()),
+    )
+    for kind, entity_id, name, display_name in await session.execute(entities):
+        if kind == "role":
+            catalog.roles[name] = (entity_id, display_name)
+        else:
+            catalog.permissions[name] = entity_id
+
+    links = (
+        select(Role.name, Permission.name)
+        .select_from(auth_role_permissions)
+        .join(Role, Role.id == auth_role_permissions.c.role_id)
+        .join(Permission, Permission.id == auth_role_permissions.c.permission_id)
+    )
+    catalog.links = {(role, perm) for role, perm in await session.execute(links)}
+    return catalog
+
+
+def link_values(links: List[Link], catalog: Catalog):
+    return values(column("role_id", Integer), column("permission_id", Integer), name="links").data(
+        [(catalog.roles[role][0], catalog.permissions[perm]) for role, perm in links]
+    )
+
+
+async def apply_plan(session, plan: SyncPlan, catalog: Catalog):
+    roles = {**plan.new_roles, **{name: new for name, (_, new) in plan.renamed_roles.items()}}
+    if roles:
+        stmt = insert(Role).values([{"name": n, "display_name": d} for n, d in roles.items()])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"display_name": stmt.excluded.display_name, "updated_at": func.now()},
+        ).returning(Role.id, Role.name)
+        for role_id, name in await session.execute(stmt):
+            catalog.roles[name] = (role_id, roles[name])
+
+    if plan.new_permissions:
+        stmt = insert(Permission).values([{"name": n} for n in plan.new_permissions])
+        stmt = stmt.on_conflict_do_nothing(index_elements=["name"]).returning(Permission.id, Permission.name)
+        catalog.permissions.update({name: perm_id for perm_id, name in await session.execute(stmt)})
+        # 并发创建的权限不会出现在 RETURNING 中
+        missing = [n for n in plan.new_permissions if n not in catalog.permissions]
+        if missing:
+            found = await session.execute(select(Permission.id, Permission.name).where(Permission.name.in_(missing)))
+            catalog.permissions.update({name: perm_id for perm_id, name in found})
+
+    if plan.revokes:
+        links = link_values(plan.revokes, catalog)
+        await session.execute(
+            delete(auth_role_permissions).where(
+                auth_role_permissions.c.role_id == links.c.role_id,
+                auth_role_permissions.c.permission_id == links.c.permission_id,
+            )
+        )
+
+    if plan.grants:
+        links = link_values(plan.grants, catalog)
+        await session.execute(
+            insert(auth_role_permissions)
+            .from_select(["role_id", "permission_id"], select(links.c.role_id, links.c.permission_id))
+            .on_conflict_do_nothing()
+        )
+
+
+async def publish_invalidation():
+    # 仅在需要时导入 Redis 与缓存模块，保持命令行启动轻量
+    from app.core.perm_cache import publish_permissions_changed
+    from app.core.redis import redis_manager
+
+    try:
+        receivers = await publish_permissions_changed("init_perms")
+        logger.info(f"Published permission cache invalidation to {receivers} subscriber(s)")
+    except Exception as e:
+        logger.warning(f"Publishing permission cache invalidation failed (caches expire by TTL): {e}")
+    finally:
+        await redis_manager.close()
+
+
+async def init_group_perms(dry_run: bool = False, publish: bool = True) -> SyncPlan:
+    logger.info(f"Loading permissions from {PERMISSIONS_YAML}")
+    data = load_yaml(PERMISSIONS_YAML)
 
-async def init_group_perms():
     async with async_session() as session:
-        async with session.begin():
-            # Load permissions YAML
-            logger.info(f"Loading permissions from {PERMISSIONS_YAML}")
-            with open(PERMISSIONS_YAML, "r", encoding="utf-8") as f:
-                data = yaml.safe_load(f)
-
-            for role_name, info in data["roles"].items():
-                display_name = info.get("display_name", "")
-                yaml_perms = set(info.get("permissions", []))
-
-                # --- Role ---
-                role = await session.scalar(select(Role).where(Role.name == role_name))
-                if not role:
-                    # Create new role
-                    role = Role(name=role_name, display_name=display_name)
-                    session.add(role)
-                    await session.flush()
-                    logger.info(f"Created role '{role_name}' with display_name '{display_name}'")
-                else:
-                    # Update display_name if changed
-                    if role.display_name != display_name:
-                        role.display_name = display_name
-                        session.add(role)
-                        logger.info(f"Updated role '{role_name}' display_name to '{display_name}'")
-
-                # --- Permissions ---
-                perms_in_db = {
-                    p.name: p
-                    for p in await session.scalars(
-                        select(Permission).where(Permission.name.in_(yaml_perms))
-                    )
-                }
-
-                # Add missing permissions
-                for perm_name in yaml_perms:
-                    perm = perms_in_db.get(perm_name)
-                    if not perm:
-                        perm = Permission(name=perm_name)
-                        session.add(perm)
-                        await session.flush()
-                        perms_in_db[perm_name] = perm
-                        logger.info(f"Created permission '{perm_name}'")
-
-                # --- Current role's associated permissions ---
-                current_perm_ids = set(
-                    await session.scalars(
-                        select(auth_role_permissions.c.permission_id)
-                        .where(auth_role_permissions.c.role_id == role.id)  # type: ignore
-                    )
-                )
-
-                # --- Remove associations not in YAML ---
-                perms_to_remove = current_perm_ids - {p.id for p in perms_in_db.values() if p.name in yaml_perms}
-                if perms_to_remove:
-                    await session.execute(
-                        delete(auth_role_permissions)
-                        .where(auth_role_permissions.c.role_id == role.id)  # type: ignore
-                        .where(auth_role_permissions.c.permission_id.in_(perms_to_remove))
-                    )
-                    logger.info(f"Removed {len(perms_to_remove)} permissions from role '{role_name}'")
-
-                # --- Add new associations from YAML ---
-                added_count = 0
-                for perm in perms_in_db.values():
-                    if perm.id not in current_perm_ids and perm.name in yaml_perms:
-                        await session.execute(
-                            auth_role_permissions.insert().values(
-                                role_id=role.id,
-                                permission_id=perm.id,
-                            )
-                        )
-                        added_count += 1
-                if added_count:
-                    logger.info(f"Added {added_count} permissions to role '{role_name}'")
-
-        logger.info(f"Roles and permissions initialized successfully.")
+        # 读取与写入在同一个短事务中，未提交即回滚
+        catalog = await load_catalog(session)
+        plan = compute_plan(data, catalog)
+        for line in plan.lines():
+            logger.info(line)
+        if plan.empty:
+            logger.info("Roles and permissions are up to date.")
+            return plan
+        if dry_run:
+            logger.info(f"Dry run: {len(plan.lines())} change(s) not applied.")
+            return plan
+        await apply_plan(session, plan, catalog)
+        await session.commit()
+
+    logger.info(f"Roles and permissions initialized successfully ({len(plan.lines())} change(s)).")
+    if publish:
+        await publish_invalidation()
+    return plan
 
 
 def main():
-    asyncio.run(init_group_perms())
+    parser = argparse.ArgumentParser(description="Sync roles and permissions with permissions.yaml")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without applying it")
+    parser.add_argument("--no-publish", action="store_true", help="do not publish a cache invalidation")
+    args = parser.parse_args()
+    asyncio.run(init_group_perms(dry_run=args.dry_run, publish=not args.no_publish))
 
 
 if __name__ == "__main__":
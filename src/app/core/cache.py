@@ -0,0 +1,520 @@
+"""
+通用缓存工具
+
+Read-through caching in Redis for expensive lookups (RAGFlow calls, IAM queries):
+
+    @cached("ragflow:dataset", ttl=30, stale_ttl=300)
+    async def get_dataset(dataset_id: str) -> List[Dataset]: ...
+
+    await get_dataset.invalidate("abc")
+
+- stampede protection: one loader per key and process (single flight) and a Redis lock
+  across processes; the others wait for the value instead of hitting the backend;
+- probabilistic early expiration (XFetch): a read may recompute a key shortly before it
+  expires, with a probability that grows as expiry approaches and with the recompute time;
+- stale-while-revalidate: for `stale_ttl` seconds after expiry the old value is served
+  and refreshed by a background task;
+- negative caching: a `None` result is kept for `negative_ttl` seconds;
+- an optional size-bounded in-process tier in front of Redis (`local_size`);
+- pluggable serializers: JSON (typed via the return annotation), msgpack, pickle.
+
+Loaders refreshed in the background must not depend on request-scoped resources such as
+the DB session; pass `background_refresh=False` for those (refreshes then run inline).
+"""
+import asyncio
+import functools
+import hashlib
+import inspect
+import logging
+import math
+import pickle
+import random
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Protocol, Set, Tuple, Union, get_type_hints
+
+import msgpack
+import orjson
+from pydantic import TypeAdapter
+from redis.asyncio import Redis
+
+from app.core.metrics import CACHE_REQUESTS
+from app.core.redis import redis_manager
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+# 条目头部：逻辑过期时间、上次加载耗时（XFetch 的 delta）、标志位
+_HEADER = struct.Struct("!ddB")
+_NEGATIVE = 1
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+# ---------- 序列化 ----------
+
+class Serializer(Protocol):
+    def dumps(self, value: Any) -> bytes: ...
+
+    def loads(self, raw: bytes) -> Any: ...
+
+
+class JsonSerializer:
+    """
+    JSON via pydantic when a type is given (dataclasses, models, tuples come back typed),
+    plain orjson otherwise.
+    """
+
+    def __init__(self, type_: Any = None):
+        self.adapter = TypeAdapter(type_) if type_ not in (None, Any, inspect.Signature.empty) else None
+
+    def dumps(self, value: Any) -> bytes:
+        if self.adapter is not None:
+            return self.adapter.dump_json(value)
+        return orjson.dumps(value)
+
+    def loads(self, raw: bytes) -> Any:
+        if self.adapter is not None:
+            return self.adapter.validate_json(raw)
+        return orjson.loads(raw)
+
+
+class MsgpackSerializer:
+    def __init__(self, type_: Any = None):
+        self.adapter = TypeAdapter(type_) if type_ not in (None, Any, inspect.Signature.empty) else None
+
+    def dumps(self, value: Any) -> bytes:
+        if self.adapter is not None:
+            value = self.adapter.dump_python(value, mode="json")
+        return msgpack.packb(value)
+
+    def loads(self, raw: bytes) -> Any:
+        value = msgpack.unpackb(raw)
+        return self.adapter.validate_python(value) if self.adapter is not None else value
+
+
+class PickleSerializer:
+    """
+    Any picklable value. Only for trusted Redis instances.
+    """
+
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, raw: bytes) -> Any:
+        return pickle.loads(raw)
+
+
+# ---------- 进程内缓存 ----------
+
+class LocalCache:
+    """
+    Size-bounded LRU with per-entry expiry. Values are shared between callers: treat
+    them as read-only.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return MISSING
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+# ---------- Redis 缓存 ----------
+
+class Cache:
+    def __init__(self, prefix: str = "cache:"):
+        self.prefix = prefix
+        self.redis: Optional[Redis] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._locals: list[LocalCache] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.redis is not None and settings.cache.enabled
+
+    def start(self, redis: Optional[Redis] = None):
+        # 存二进制条目，使用不解码的 cache 客户端；连接池由 redis_manager 关闭
+        self.redis = redis or redis_manager.cache
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.redis = None
+        for local in self._locals:
+            local.clear()
+
+    def local_tier(self, max_size: int, ttl: float) -> LocalCache:
+        local = LocalCache(max_size, ttl)
+        self._locals.append(local)
+        return local
+
+    # ---------- 条目读写 ----------
+
+    @staticmethod
+    def _encode(payload: bytes, expires_at: float, delta: float, negative: bool) -> bytes:
+        return _HEADER.pack(expires_at, delta, _NEGATIVE if negative else 0) + payload
+
+    async def _read(self, key: str, serializer: Serializer) -> Optional[Tuple[Any, float, float, bool]]:
+        raw = await self.redis.get(key)
+        if raw is None:
+            return None
+        expires_at, delta, flags = _HEADER.unpack_from(raw)
+        negative = bool(flags & _NEGATIVE)
+        value = None if negative else serializer.loads(raw[_HEADER.size:])
+        return value, expires_at, delta, negative
+
+    async def _write(self, key: str, value: Any, serializer: Serializer, ttl: float, stale_ttl: float,
+                     negative_ttl: float, delta: float) -> bool:
+        negative = value is None
+        if negative:
+            if negative_ttl <= 0:
+                return False
+            ttl, stale_ttl = negative_ttl, 0
+        payload = b"" if negative else serializer.dumps(value)
+        entry = self._encode(payload, time.time() + ttl, delta, negative)
+        await self.redis.set(key, entry, px=max(1, int((ttl + stale_ttl) * 1000)))
+        return True
+
+    async def get(self, key: str, serializer: Serializer = JsonSerializer()) -> Any:
+        """
+        The cached value (possibly stale), or `MISSING`.
+        """
+        entry = await self._read(self.prefix + key, serializer)
+        return MISSING if entry is None else entry[0]
+
+    async def set(self, key: str, value: Any, ttl: float, serializer: Serializer = JsonSerializer(),
+                  stale_ttl: float = 0, negative_ttl: float = 0):
+        await self._write(self.prefix + key, value, serializer, ttl, stale_ttl, negative_ttl, 0)
+
+    async def delete(self, *keys: str):
+        for local in self._locals:
+            for key in keys:
+                local.delete(self.prefix + key)
+        if keys and self.enabled:
+            await self.redis.delete(*(self.prefix + k for k in keys))
+
+    # ---------- 加锁加载 ----------
+
+    async def _acquire(self, key: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        timeout_ms = int(settings.cache.lock_timeout_seconds * 1000)
+        if await self.redis.set(f"{key}:lock", token, nx=True, px=timeout_ms):
+            return token
+        return None
+
+    async def _release(self, key: str, token: str):
+        try:
+            await self.redis.eval(_RELEASE_SCRIPT, 1, f"{key}:lock", token)
+        except Exception as e:
+            logger.debug(f"Cache lock release failed for {key}: {e}")
+
+    async def _compute(self, key: str, loader: Callable[[], Awaitable[Any]], options: "CacheOptions") -> Any:
+        started = time.perf_counter()
+        value = await loader()
+        delta = time.perf_counter() - started
+        try:
+            await self._write(key, value, options.serializer, options.ttl, options.stale_ttl,
+                              options.negative_ttl, delta)
+        except Exception as e:
+            logger.warning(f"Cache write failed for {key}: {e}")
+        return value
+
+    async def _load_locked(self, key: str, loader: Callable[[], Awaitable[Any]], options: "CacheOptions") -> Any:
+        """
+        Load under the cross-process lock; without it, wait for the holder's value.
+        """
+        try:
+            token = await self._acquire(key)
+        except Exception as e:
+            logger.warning(f"Cache lock failed for {key}: {e}")
+            return await loader()
+        if token is not None:
+            try:
+                return await self._compute(key, loader, options)
+            finally:
+                await self._release(key, token)
+
+        deadline = time.monotonic() + settings.cache.lock_timeout_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(settings.cache.lock_poll_seconds)
+            entry = await self._read(key, options.serializer)
+            if entry is not None and entry[1] > time.time():
+                return entry[0]
+        # 持锁方超时，自行加载
+        return await self._compute(key, loader, options)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], options: "CacheOptions") -> Any:
+        """
+        Single flight within the process: concurrent misses share one load.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load_locked(key, loader, options)
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待者时避免 "exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _refresh_later(self, key: str, loader: Callable[[], Awaitable[Any]], options: "CacheOptions"):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                token = await self._acquire(key)
+                if token is None:
+                    return  # 其他进程正在刷新
+                try:
+                    value = await self._compute(key, loader, options)
+                    if options.local is not None:
+                        options.local.set(key, value, options.negative_ttl if value is None else options.ttl)
+                finally:
+                    await self._release(key, token)
+            except Exception as e:
+                logger.warning(f"Background cache refresh failed for {key}: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def get_or_set(self, key: str, loader: Callable[[], Awaitable[Any]], options: "CacheOptions") -> Any:
+        key = self.prefix + key
+        local = options.local
+        if local is not None:
+            value = local.get(key)
+            if value is not MISSING:
+                CACHE_REQUESTS.labels(options.namespace, "local_hit").inc()
+                return value
+        if not self.enabled:
+            return await loader()
+
+        try:
+            entry = await self._read(key, options.serializer)
+        except Exception as e:
+            logger.warning(f"Cache read failed for {key}: {e}")
+            CACHE_REQUESTS.labels(options.namespace, "error").inc()
+            return await loader()
+
+        if entry is None:
+            CACHE_REQUESTS.labels(options.namespace, "miss").inc()
+            value = await self._load(key, loader, options)
+            if local is not None:
+                local.set(key, value, options.negative_ttl if value is None else options.ttl)
+            return value
+
+        value, expires_at, delta, negative = entry
+        now = time.time()
+        if now >= expires_at:
+            # 过期但仍在 stale 窗口内
+            CACHE_REQUESTS.labels(options.namespace, "stale").inc()
+            if options.background_refresh:
+                self._refresh_later(key, loader, options)
+                return value
+            return await self._load(key, loader, options)
+
+        # XFetch：-delta * beta * ln(U) 越接近剩余时间，越可能提前重算
+        if options.beta > 0 and delta > 0 and now - delta * options.beta * math.log(random.random()) >= expires_at:
+            CACHE_REQUESTS.labels(options.namespace, "early_refresh").inc()
+            if options.background_refresh:
+                self._refresh_later(key, loader, options)
+            else:
+                return await self._load(key, loader, options)
+        else:
+            CACHE_REQUESTS.labels(options.namespace, "negative_hit" if negative else "hit").inc()
+        if local is not None:
+            local.set(key, value, expires_at - now)
+        return value
+
+
+default_cache = Cache()
+
+
+# ---------- 装饰器 ----------
+
+class CacheOptions:
+    def __init__(self, namespace: str, ttl: float, stale_ttl: float, negative_ttl: float, beta: float,
+                 serializer: Serializer, local: Optional[LocalCache], background_refresh: bool):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.beta = beta
+        self.serializer = serializer
+        self.local = local
+        self.background_refresh = background_refresh
+
+
+KeyBuilder = Union[str, Callable[..., str], None]
+
+
+class CachedFunction:
+    """
+    Result of `cached`: call it like the wrapped coroutine function; `invalidate` and
+    `key_for` take the same arguments. Works on functions and methods.
+    """
+
+    def __init__(self, func, namespace: str, key: KeyBuilder, ignore: Tuple[str, ...], cache: Cache,
+                 serializer: Optional[Serializer], options: dict):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.namespace = namespace
+        self.key = key
+        self.ignore = ignore
+        self.cache = cache
+        self.signature = inspect.signature(func)
+        self._serializer = serializer
+        self._options = options
+        self._resolved: Optional[CacheOptions] = None
+
+    @property
+    def options(self) -> CacheOptions:
+        # 首次调用时再解析返回值注解，允许前向引用
+        if self._resolved is None:
+            serializer = self._serializer
+            if serializer is None:
+                serializer = JsonSerializer(get_type_hints(self.func).get("return"))
+            self._resolved = CacheOptions(self.namespace, serializer=serializer, **self._options)
+        return self._resolved
+
+    def key_for(self, *args, **kwargs) -> str:
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = {k: v for k, v in bound.arguments.items() if k not in self.ignore}
+        if callable(self.key):
+            suffix = self.key(**arguments)
+        elif self.key is not None:
+            suffix = self.key.format(**arguments)
+        else:
+            suffix = ":".join(repr(v) for v in arguments.values())
+            if len(suffix) > 128:
+                suffix = hashlib.sha1(suffix.encode()).hexdigest()
+        return f"{self.namespace}:{suffix}"
+
+    async def __call__(self, *args, **kwargs):
+        key = self.key_for(*args, **kwargs)
+        return await self.cache.get_or_set(key, lambda: self.func(*args, **kwargs), self.options)
+
+    async def invalidate(self, *args, **kwargs):
+        await self.cache.delete(self.key_for(*args, **kwargs))
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return _BoundCachedFunction(self, instance)
+
+
+class _BoundCachedFunction:
+    def __init__(self, cached_function: CachedFunction, instance: Any):
+        self.cached_function = cached_function
+        self.instance = instance
+
+    async def __call__(self, *args, **kwargs):
+        return await self.cached_function(self.instance, *args, **kwargs)
+
+    async def invalidate(self, *args, **kwargs):
+        await self.cached_function.invalidate(self.instance, *args, **kwargs)
+
+    def key_for(self, *args, **kwargs) -> str:
+        return self.cached_function.key_for(self.instance, *args, **kwargs)
+
+
+def cached(
+        namespace: str,
+        *,
+        ttl: float,
+        key: KeyBuilder = None,
+        stale_ttl: float = 0,
+        negative_ttl: float = 0,
+        beta: Optional[float] = None,
+        local_size: int = 0,
+        local_ttl: Optional[float] = None,
+        serializer: Optional[Serializer] = None,
+        background_refresh: bool = True,
+        ignore: Tuple[str, ...] = ("self", "cls"),
+        cache: Optional[Cache] = None,
+):
+    """
+    Cache a coroutine function's result under `namespace:<key>`.
+
+    Args:
+        namespace: key prefix, also the metrics label
+        ttl: seconds a value is fresh
+        key: format string over the arguments (e.g. "{user_id}") or a callable taking them;
+             defaults to the reprs of all arguments except `ignore`
+        stale_ttl: seconds an expired value is still served while refreshing in the background
+        negative_ttl: seconds a `None` result is cached (0: not cached)
+        beta: XFetch aggressiveness (0 disables early refresh), see `CACHE_XFETCH_BETA`
+        local_size: entries in the in-process tier (0: no local tier)
+        local_ttl: seconds in the local tier, capped by the remaining Redis freshness
+        serializer: defaults to JSON typed by the function's return annotation
+        background_refresh: False when the loader uses request-scoped resources
+        ignore: arguments left out of the default key
+        cache: the `Cache` to use, `default_cache` otherwise
+    """
+
+    def decorator(func) -> CachedFunction:
+        target = cache or default_cache
+        local = target.local_tier(local_size, local_ttl if local_ttl is not None else ttl) if local_size else None
+        options = dict(
+            ttl=ttl,
+            stale_ttl=stale_ttl,
+            negative_ttl=negative_ttl,
+            beta=settings.cache.xfetch_beta if beta is None else beta,
+            local=local,
+            background_refresh=background_refresh,
+        )
+        return CachedFunction(func, namespace, key, ignore, target, serializer, options)
+
+    return decorator
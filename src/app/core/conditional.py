@@ -0,0 +1,133 @@
+"""
+条件请求：ETag / If-None-Match / Cache-Control
+
+Two ways to get an ETag:
+
+- from version parts (e.g. `BaseRepo.get_version`, mirror sync state), checked with
+  `not_modified(...)` *before* the payload is loaded or serialized;
+- from the serialized body, in `respond(...)`, when no cheap version exists.
+
+Usage:
+    cache: ConditionalRequest = Depends(conditional(REVALIDATE))
+    ...
+    if not_modified := cache.not_modified(await service.get_version()):
+        return not_modified
+    return cache.respond(json_response(...))
+"""
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request
+from starlette.responses import Response as HTTPResponse
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    max_age: int = 0
+    private: bool = True
+    no_cache: bool = False
+    stale_while_revalidate: int = 0
+    vary: Tuple[str, ...] = ()
+
+    @property
+    def cache_control(self) -> str:
+        directives = ["private" if self.private else "public"]
+        if self.no_cache:
+            directives.append("no-cache")
+        directives.append(f"max-age={self.max_age}")
+        if self.stale_while_revalidate:
+            directives.append(f"stale-while-revalidate={self.stale_while_revalidate}")
+        return ", ".join(directives)
+
+
+# 按用户鉴权的数据：浏览器私有缓存，每次带 ETag 重新验证
+REVALIDATE = CachePolicy(private=True, no_cache=True, vary=("Authorization",))
+# 与用户无关、很少变化的配置类数据
+STATIC = CachePolicy(private=False, max_age=60 * 60)
+
+
+def _digest(data: bytes) -> str:
+    return f'W/"{hashlib.blake2b(data, digest_size=16).hexdigest()}"'
+
+
+def version_etag(*parts: Any) -> str:
+    return _digest(repr(parts).encode())
+
+
+def body_etag(body: bytes) -> str:
+    return _digest(body)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison (RFC 9110 13.1.2): `W/` prefixes are ignored, `*` matches anything.
+    """
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == opaque for tag in candidates)
+
+
+class ConditionalRequest:
+    def __init__(self, request: Request, policy: CachePolicy):
+        self.request = request
+        self.policy = policy
+        self.etag: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.request.method in ("GET", "HEAD")
+
+    def headers(self, etag: str) -> Dict[str, str]:
+        headers = {"ETag": etag, "Cache-Control": self.policy.cache_control}
+        if self.policy.vary:
+            headers["Vary"] = ", ".join(self.policy.vary)
+        return headers
+
+    def _not_modified_response(self, etag: str) -> HTTPResponse:
+        return HTTPResponse(status_code=304, headers=self.headers(etag))
+
+    def not_modified(self, *version: Any) -> Optional[HTTPResponse]:
+        """
+        Derive the ETag from `version` (plus the path and query) and return a 304 response
+        if the client already has it; otherwise remember the ETag for `respond`.
+        """
+        if not self.enabled:
+            return None
+        self.etag = version_etag(self.request.url.path, self.request.url.query, *version)
+        if etag_matches(self.request.headers.get("if-none-match"), self.etag):
+            return self._not_modified_response(self.etag)
+        return None
+
+    def respond(self, response: HTTPResponse) -> HTTPResponse:
+        """
+        Attach ETag / Cache-Control to a rendered response. Without a version ETag the body
+        is hashed, and a matching `If-None-Match` still turns the answer into a 304.
+        """
+        if not self.enabled or not 200 <= response.status_code < 300:
+            return response
+
+        etag = self.etag or body_etag(response.body)
+        if etag_matches(self.request.headers.get("if-none-match"), etag):
+            return self._not_modified_response(etag)
+
+        for key, value in self.headers(etag).items():
+            if key == "Vary" and "vary" in response.headers:
+                value = f"{response.headers['vary']}, {value}"
+            response.headers[key] = value
+        return response
+
+
+def conditional(policy: CachePolicy = REVALIDATE):
+    """
+    Dependency factory giving a route its `ConditionalRequest` with a per-route policy.
+    """
+
+    def dependency(request: Request) -> ConditionalRequest:
+        return ConditionalRequest(request, policy)
+
+    return dependency
@@ -0,0 +1,282 @@
+"""
+实体缓存（按主键的读穿透缓存）
+
+Repositories opt in with `cache_ttl`; `get_by_pk` / `get_by_pks` without loader options
+then read the row's columns from Redis (msgpack, one `MGET` per batch), query Postgres
+only for the misses and write those back.
+
+Cached rows are attached to the session without SQL (`make_transient_to_detached` +
+`merge(load=False)`), so they behave like rows loaded by a query without eager loads.
+Rows changed or deleted through a session, and the whole model on bulk ORM
+`update()` / `delete()` statements, are evicted once the transaction commits.
+
+Eviction must win over a concurrent read-through: a request that missed, then read the
+row from Postgres before another transaction changed it, must not write the old row back.
+An evicted key therefore holds a unique tombstone (for `entity_ttl_seconds`) instead of
+being deleted, and a model-wide eviction bumps the model's epoch. Write-back is a
+compare-and-set against the key value and epoch seen by the read (`WRITE_BACK_SCRIPT`).
+"""
+import datetime
+import decimal
+import enum
+import hashlib
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import msgpack
+from redis.asyncio import Redis
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.util import await_only
+
+from app.core.redis import redis_manager
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEYS = "entity_cache_keys"
+_PENDING_MODELS = "entity_cache_models"
+
+# msgpack 扩展类型：无时区的时间、日期、Decimal、UUID
+_EXT_DATETIME, _EXT_DATE, _EXT_DECIMAL, _EXT_UUID = 1, 2, 3, 4
+
+# 0xc1 在 msgpack 中从不使用，以它开头的值是墓碑而非缓存行
+_TOMBSTONE = b"\xc1"
+
+# KEYS[1] 模型 epoch，KEYS[2..] 条目；ARGV[1] 读取时的 epoch，ARGV[2] ttl，之后每个条目两项：
+# 读取时的值（不存在为空串）、新值。epoch 变化则整体放弃，条目值变化（已被失效）则跳过该条目
+WRITE_BACK_SCRIPT = """
+local epoch = redis.call('GET', KEYS[1]) or ''
+if epoch ~= ARGV[1] then
+    return 0
+end
+local written = 0
+for i = 2, #KEYS do
+    local current = redis.call('GET', KEYS[i]) or ''
+    if current == ARGV[2 * i - 1] then
+        redis.call('SET', KEYS[i], ARGV[2 * i], 'EX', ARGV[2])
+        written = written + 1
+    end
+end
+return written
+"""
+
+
+def _encode(value: Any):
+    if isinstance(value, datetime.datetime):
+        return msgpack.ExtType(_EXT_DATETIME, value.isoformat().encode())
+    if isinstance(value, datetime.date):
+        return msgpack.ExtType(_EXT_DATE, value.isoformat().encode())
+    if isinstance(value, decimal.Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(value).encode())
+    if isinstance(value, uuid.UUID):
+        return msgpack.ExtType(_EXT_UUID, value.bytes)
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _decode(code: int, data: bytes):
+    if code == _EXT_DATETIME:
+        return datetime.datetime.fromisoformat(data.decode())
+    if code == _EXT_DATE:
+        return datetime.date.fromisoformat(data.decode())
+    if code == _EXT_DECIMAL:
+        return decimal.Decimal(data.decode())
+    if code == _EXT_UUID:
+        return uuid.UUID(bytes=data)
+    return msgpack.ExtType(code, data)
+
+
+@dataclass
+class Lookup:
+    """
+    Result of `EntityCache.get_many`: the cached rows and, for the misses, what the read
+    saw (key values and model epoch) so that `set_many` only writes back unchanged keys.
+    """
+    found: Dict[Any, Any] = field(default_factory=dict)
+    misses: Dict[Any, bytes] = field(default_factory=dict)
+    epoch: Optional[bytes] = None
+    # Redis 读取失败时无法判断条目是否已被失效，不回写
+    readable: bool = True
+
+
+class EntityCache:
+    def __init__(self):
+        self.redis: Optional[Redis] = None
+        # 已启用缓存的模型 -> 键前缀（含列名摘要，表结构变更后旧条目自然失效）
+        self.models: Dict[type, str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.redis is not None and settings.cache.enabled
+
+    def start(self, redis: Optional[Redis] = None):
+        # msgpack 为二进制，使用不解码的 cache 客户端；连接池由 redis_manager 关闭
+        self.redis = redis or redis_manager.cache
+
+    async def stop(self):
+        self.redis = None
+
+    def register(self, model: type):
+        if model in self.models:
+            return
+        columns = [c.key for c in inspect(model).column_attrs]
+        digest = hashlib.sha1(",".join(columns).encode()).hexdigest()[:8]
+        self.models[model] = f"entity:{model.__tablename__}:{digest}:"
+
+    def key(self, model: type, pk: Any) -> str:
+        return f"{self.models[model]}{pk}"
+
+    @staticmethod
+    def epoch_key(model: type) -> str:
+        # 位于条目前缀之外，不会被按模型 SCAN 删除
+        return f"entity:{model.__tablename__}:epoch"
+
+    # ---------- 序列化 ----------
+
+    @staticmethod
+    def dumps(obj: Any) -> bytes:
+        state = inspect(obj)
+        data = {attr.key: state.dict[attr.key] for attr in state.mapper.column_attrs if attr.key in state.dict}
+        return msgpack.packb(data, datetime=True, default=_encode)
+
+    @staticmethod
+    def loads(model: type, raw: bytes) -> Optional[Any]:
+        data = msgpack.unpackb(raw, timestamp=3, ext_hook=_decode)
+        mapper = inspect(model)
+        if any(attr.key not in data for attr in mapper.column_attrs):
+            return None
+        obj = mapper.class_manager.new_instance()
+        for key, value in data.items():
+            setattr(obj, key, value)
+        # 清空属性变更历史，视为从数据库加载的对象
+        make_transient_to_detached(obj)
+        return obj
+
+    # ---------- 读写 ----------
+
+    async def get_many(self, db: AsyncSession, model: type, pks: List[Any]) -> Lookup:
+        """
+        Cached rows by primary key, attached to `db`. Rows already in the session's
+        identity map are returned as they are (pending changes included).
+        """
+        lookup = Lookup()
+        keys: List[Any] = []
+        identity_map = db.sync_session.identity_map
+        for pk in pks:
+            obj = identity_map.get(db.sync_session.identity_key(model, pk))
+            if obj is not None:
+                lookup.found[pk] = obj
+            else:
+                keys.append(pk)
+        if not keys:
+            return lookup
+        try:
+            epoch, *values = await self.redis.mget([self.epoch_key(model), *(self.key(model, pk) for pk in keys)])
+        except Exception as e:
+            logger.warning(f"Entity cache read failed for {model.__name__}: {e}")
+            lookup.readable = False
+            return lookup
+        lookup.epoch = epoch or b""
+        for pk, raw in zip(keys, values):
+            obj = None
+            if raw is not None and not raw.startswith(_TOMBSTONE):
+                obj = self.loads(model, raw)
+            if obj is not None:
+                lookup.found[pk] = await db.merge(obj, load=False)
+            else:
+                lookup.misses[pk] = raw or b""
+        return lookup
+
+    async def set_many(self, model: type, objs: Iterable[Any], ttl: int, lookup: Lookup):
+        """
+        Write back rows loaded for `lookup`'s misses, skipping keys evicted since the read.
+        """
+        if not lookup.readable:
+            return
+        pk_attr = inspect(model).primary_key[0].key
+        keys: List[str] = [self.epoch_key(model)]
+        args: List[Any] = [lookup.epoch or b"", ttl]
+        for obj in objs:
+            pk = getattr(obj, pk_attr)
+            if pk not in lookup.misses:
+                continue
+            keys.append(self.key(model, pk))
+            args.extend((lookup.misses[pk], self.dumps(obj)))
+        if len(keys) == 1:
+            return
+        try:
+            await self.redis.eval(WRITE_BACK_SCRIPT, len(keys), *keys, *args)
+        except Exception as e:
+            logger.warning(f"Entity cache write failed for {model.__name__}: {e}")
+
+    async def evict(self, keys: Set[str], models: Set[type]):
+        if keys:
+            # 每次失效写入不同的墓碑，进行中的读穿透据此放弃回写
+            ttl = settings.cache.entity_ttl_seconds
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.set(key, _TOMBSTONE + os.urandom(8), ex=ttl)
+                await pipe.execute()
+        for model in models:
+            await self.evict_model(model)
+
+    async def evict_model(self, model: type, redis: Optional[Redis] = None):
+        """
+        Drop every cached row of `model`. The epoch is bumped first, so reads in flight do not write back.
+        """
+        redis = redis or self.redis
+        self.register(model)
+        await redis.incr(self.epoch_key(model))
+        async for key in redis.scan_iter(match=f"{self.models[model]}*", count=500):
+            await redis.delete(key)
+
+    # ---------- 提交后失效 ----------
+
+    def _track(self, session: Session, obj: Any):
+        model = type(obj)
+        if model in self.models:
+            pk = inspect(obj).identity
+            if pk is not None:
+                session.info.setdefault(_PENDING_KEYS, set()).add(self.key(model, pk[0]))
+
+    def after_flush(self, session: Session, flush_context):
+        for obj in list(session.dirty) + list(session.deleted):
+            self._track(session, obj)
+
+    def do_orm_execute(self, orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in self.models:
+            orm_execute_state.session.info.setdefault(_PENDING_MODELS, set()).add(mapper.class_)
+
+    def after_commit(self, session: Session):
+        keys = session.info.pop(_PENDING_KEYS, set())
+        models = session.info.pop(_PENDING_MODELS, set())
+        if not (keys or models) or not self.enabled:
+            return
+        try:
+            # 提交由 AsyncSession 在 greenlet 中驱动，可同步等待 Redis
+            await_only(self.evict(keys, models))
+        except Exception as e:
+            logger.warning(f"Entity cache eviction failed (entries expire by TTL): {e}")
+
+    def after_rollback(self, session: Session):
+        session.info.pop(_PENDING_KEYS, None)
+        session.info.pop(_PENDING_MODELS, None)
+
+    def install(self):
+        event.listen(Session, "after_flush", self.after_flush)
+        event.listen(Session, "do_orm_execute", self.do_orm_execute)
+        event.listen(Session, "after_commit", self.after_commit)
+        event.listen(Session, "after_soft_rollback", lambda session, previous: self.after_rollback(session))
+
+
+entity_cache = EntityCache()
+entity_cache.install()
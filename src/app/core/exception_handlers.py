@@ -46,7 +46,8 @@ def register_exception_handlers(app: FastAPI):
                 "message": exc.message,
                 "detail": exc.detail if settings.debug else None,
                 "data": None
-            }
+            },
+            headers=exc.headers,
         )
 
     @app.exception_handler(Exception)
@@ -1,3 +1,4 @@
+import math
 from typing import Optional
 
 from fastapi import status
@@ -16,6 +17,7 @@ class ServiceError(Exception):
             detail: Optional[str] = None,
             code: Optional[int] = None,
             status_code: Optional[int] = None,
+            headers: Optional[dict] = None,
     ):
         if message:
             self.message = message
@@ -25,6 +27,7 @@ class ServiceError(Exception):
             self.status_code = status_code
 
         self.detail = detail
+        self.headers = headers
 
 
 class UnauthorizedError(ServiceError):
@@ -49,6 +52,11 @@ class PermissionDeniedError(ServiceError):
     message = "权限不足"
 
 
+class QuotaExceededError(PermissionDeniedError):
+    code = 40302
+    message = "超出配额"
+
+
 class NotFoundError(ServiceError):
     code = 40401
     status_code = status.HTTP_404_NOT_FOUND
@@ -64,3 +72,24 @@ class ConflictError(ServiceError):
 class ServiceValidationError(ServiceError):
     code = 42201
     status_code = status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+class UpstreamUnavailableError(ServiceError):
+    code = 50301
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    message = "上游服务暂不可用"
+
+    def __init__(self, message: Optional[str] = None, retry_after: float = 0, **kwargs):
+        headers = {"Retry-After": str(max(1, math.ceil(retry_after)))}
+        super().__init__(message, headers=headers, **kwargs)
+
+
+class RateLimitedError(ServiceError):
+    code = 42901
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    message = "请求过于频繁，请稍后再试"
+
+    def __init__(self, message: Optional[str] = None, retry_after: float = 0, headers: Optional[dict] = None,
+                 **kwargs):
+        headers = {**(headers or {}), "Retry-After": str(max(1, math.ceil(retry_after)))}
+        super().__init__(message, headers=headers, **kwargs)
@@ -1,11 +1,16 @@
+import uuid
 from datetime import datetime, timedelta, timezone
-from typing import Any
-
-from jose import jwt, JWTError, ExpiredSignatureError
+from typing import Any, Iterable
 
 from app.core.exceptions import TokenExpiredError, TokenInvalidError
+from app.core.lazy import lazy_import
+from app.core.permissions import get_permission_registry
 from app.core.settings import settings
 
+# 加密后端较重，首次签发 / 校验时再导入
+jwt = lazy_import("jose.jwt")
+jose_exceptions = lazy_import("jose.exceptions")
+
 JWT_ALGORITHM = "HS256"
 
 SECRET_KEY = settings.secret_key
@@ -13,8 +18,25 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 REFRESH_TOKEN_EXPIRE_DAYS = settings.refresh_token_expire_days
 
 
-def create_access_token(user_id: str | int, expires_delta: timedelta | None = None):
-    to_encode = {"sub": str(user_id), "type": "access"}
+def new_jti() -> str:
+    return uuid.uuid4().hex
+
+
+def create_access_token(
+        user_id: str | int,
+        expires_delta: timedelta | None = None,
+        family: str | None = None,
+        permissions: Iterable[str] | None = None,
+        roles: Iterable[str] = (),
+        superuser: bool = False,
+):
+    # fam：签发时所属的刷新令牌族，吊销该族即同时吊销其访问令牌
+    to_encode = {"sub": str(user_id), "type": "access", "jti": new_jti()}
+    if family:
+        to_encode["fam"] = family
+    # 权限 / 角色位图与目录版本，鉴权时免查库
+    if permissions is not None:
+        to_encode.update(get_permission_registry().claims(permissions, roles, superuser))
 
     expire = (
         datetime.now(timezone.utc) + expires_delta
@@ -25,9 +47,9 @@ def create_access_token(user_id: str | int, expires_delta: timedelta | None = No
     return jwt.encode(to_encode, SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 
-def create_refresh_token(user_id: int):
+def create_refresh_token(user_id: str | int, family: str, jti: str):
     expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode = {"sub": str(user_id), "exp": expire, "type": "refresh"}
+    to_encode = {"sub": str(user_id), "exp": expire, "type": "refresh", "jti": jti, "fam": family}
     return jwt.encode(to_encode, SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 
@@ -38,9 +60,9 @@ def verify_token(token: str, *, expected_type: str | None = None,) -> dict[str,
             SECRET_KEY,
             algorithms=[JWT_ALGORITHM],
         )
-    except ExpiredSignatureError:
+    except jose_exceptions.ExpiredSignatureError:
         raise TokenExpiredError()
-    except JWTError:
+    except jose_exceptions.JWTError:
         raise TokenInvalidError()
 
     token_type = payload.get("type")
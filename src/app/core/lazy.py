@@ -0,0 +1,43 @@
+"""
+延迟导入
+Heavy dependencies that only some code paths use (the RAGFlow SDK, httpx, JOSE / passlib
+crypto backends, yaml) are bound with `lazy_import` and imported on first attribute
+access, so the worker, the scheduler and CLI tools that never touch them do not pay
+for them at startup. Annotations that name a lazy module must be strings.
+
+`python benchmarks/importtime.py <module>` reports where import time goes.
+"""
+import importlib
+import sys
+from types import ModuleType
+from typing import Any, Optional
+
+
+class LazyModule:
+    """
+    Stand-in for a module, importing it on first attribute access.
+    """
+
+    def __init__(self, name: str):
+        self.__name = name
+        self.__module: Optional[ModuleType] = None
+
+    def load(self) -> ModuleType:
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__name)
+        return self.__module
+
+    @property
+    def loaded(self) -> bool:
+        return self.__module is not None or self.__name in sys.modules
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self.load(), item)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module {self.__name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -1,10 +1,19 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from app.core.cache import default_cache
 from app.core.db import engine
-from redis.asyncio import Redis
-
+from app.core.entity_cache import entity_cache
+from app.core.metrics import mark_process_dead
+from app.core.perm_cache import permission_cache_listener
+from app.core.ragflow import ragflow_client
+from app.core.redis import redis_manager
+from app.core.revocation import revocation_list
 from app.core.settings import settings
+from app.core.tracing import shutdown_tracing
+from app.core.warmup import readiness, warm_up
+from app.tasks import broker
 
 logger = logging.getLogger(__name__)
 
@@ -12,16 +21,40 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动逻辑（可选）
-    redis = Redis.from_url(
-        str(settings.redis.default_dsn),
-        encoding="utf-8",
-        decode_responses=True,
-    )
+    redis = redis_manager.default
     app.state.redis = redis
     logger.info("Redis client initialized")
+    await revocation_list.start(redis)
+    entity_cache.start()
+    default_cache.start()
+    permission_cache_listener.start()
+
+    if not broker.is_worker_process:
+        await broker.startup()
+        logger.info("Task broker connected")
+
+    # 预热在后台进行，完成前 /readyz 返回 503
+    warmup_task = None
+    if settings.warmup.enabled:
+        warmup_task = asyncio.create_task(warm_up(app))
+    else:
+        readiness.ready = True
 
     yield
     # 关闭逻辑
-    await redis.close()
-    logger.info("Redis client closed")
+    readiness.ready = False
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    await revocation_list.stop()
+    await permission_cache_listener.stop()
+    await entity_cache.stop()
+    await default_cache.stop()
+    await redis_manager.close()
+    logger.info("Redis clients closed")
+    if not broker.is_worker_process:
+        await broker.shutdown()
+    await ragflow_client.close()
+    logger.info("RAGFlow client closed")
     await engine.dispose()
+    mark_process_dead()
+    shutdown_tracing()
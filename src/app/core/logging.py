@@ -1,77 +1,230 @@
+"""
+日志：QueueHandler + QueueListener
+
+Loggers only put records on a bounded in-memory queue; a background listener thread does
+the formatting and the (possibly blocking) stream / file I/O, including midnight rollover.
+When the queue is full the record is dropped and counted instead of stalling the caller.
+
+Records carry the request context (request id, trace id, user id, route) bound by
+`RequestContextMiddleware`, `TracingMiddleware` and the auth dependencies, see `bind_log_context`.
+"""
+import atexit
+import json
+import logging
 import os
-from logging.config import dictConfig
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Any, Dict, Optional
 
+from app.core.metrics import LOG_RECORDS_DROPPED
 from app.core.settings import settings
 
 os.makedirs(settings.log_dir, exist_ok=True)
 
 LOG_FORMAT = "[%(asctime)s] [%(levelname)s] [%(name)s] [%(filename)s:%(lineno)d] - %(message)s"
 
+# 请求上下文字段，由中间件 / 鉴权依赖写入，JSON 日志中作为顶层字段输出
+CONTEXT_FIELDS = ("request_id", "trace_id", "user_id", "method", "route")
+# 通过 `extra=` 传入、需要输出的附加字段
+EXTRA_FIELDS = ("status", "latency_ms")
 
-def setup_logging():
-    dictConfig({
-        "version": 1,
-        "disable_existing_loggers": False,
-        "formatters": {
-            "default": {"format": LOG_FORMAT},
-        },
-        "handlers": {
-            "console_info": {
-                "class": "logging.StreamHandler",
-                "formatter": "default",
-                "level": "INFO",
-                "stream": "ext://sys.stdout"
-            },
-            "console_error": {
-                "class": "logging.StreamHandler",
-                "formatter": "default",
-                "level": "WARNING",
-                "stream": "ext://sys.stderr"
-            },
-            "file_info": {
-                "()": TimedRotatingFileHandler,
-                "formatter": "default",
-                "filename": os.path.join(settings.log_dir, f"app-{settings.env}.log"),
-                "when": "midnight",
-                "backupCount": 7,
-                "encoding": "utf-8",
-                "level": "INFO"
-            },
-            "file_error": {
-                "()": TimedRotatingFileHandler,
-                "formatter": "default",
-                "filename": os.path.join(settings.log_dir, f"error-{settings.env}.log"),
-                "when": "midnight",
-                "backupCount": 7,
-                "encoding": "utf-8",
-                "level": "WARNING"
-            },
-        },
-        "loggers": {
-            "app": {
-                "handlers": ["console_info", "console_error", "file_info", "file_error"],
-                "level": "INFO",
-                "propagate": False
-            },
-            "uvicorn": {
-                "handlers": ["console_info", "console_error"],
-                "level": "INFO",
-                "propagate": False
-            },
-            "uvicorn.error": {
-                "handlers": ["console_info", "console_error"],
-                "level": "INFO",
-                "propagate": False
-            },
-            "uvicorn.access": {
-                "handlers": ["console_info"],
-                "level": "INFO",
-                "propagate": False
-            },
-        },
-        "root": {
-            "handlers": ["console_info", "console_error", "file_info", "file_error"],
-            "level": "WARNING"
+_log_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("log_context", default=None)
+
+
+def new_log_context(**fields: Any) -> Dict[str, Any]:
+    """
+    Start a fresh context for the current request / task. The returned dict is shared
+    with everything running in this context, so later `bind_log_context` calls (also
+    from threadpool dependencies) are visible to the caller.
+    """
+    context = dict(fields)
+    _log_context.set(context)
+    return context
+
+
+def bind_log_context(**fields: Any):
+    context = _log_context.get()
+    if context is None:
+        context = new_log_context()
+    context.update(fields)
+
+
+def get_log_context() -> Dict[str, Any]:
+    return _log_context.get() or {}
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copies the request context onto the record. Must run in the logging thread, i.e. on
+    the QueueHandler, because the listener thread does not see the request's contextvars.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in get_log_context().items():
+            if key in CONTEXT_FIELDS and not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a `rate` fraction of INFO-and-below records of the high-volume `loggers`;
+    warnings and errors always pass.
+    """
+
+    def __init__(self, rate: float, loggers: list[str]):
+        super().__init__()
+        self.rate = rate
+        self.loggers = tuple(loggers)
+
+    def _sampled(self, name: str) -> bool:
+        return any(name == prefix or name.startswith(prefix + ".") for prefix in self.loggers)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or record.levelno > logging.INFO or not self._sampled(record.name):
+            return True
+        return random.random() < self.rate
+
+
+class ExcludeFilter(logging.Filter):
+    def __init__(self, *names: str):
+        super().__init__()
+        self.names = names
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not any(record.name == name or record.name.startswith(name + ".") for name in self.names)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Never blocks: when the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 只在调用线程中计算消息与异常文本，格式化留给监听线程
+        record = logging.makeLogRecord(record.__dict__)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.labels(record.levelname).inc()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "location": f"{record.filename}:{record.lineno}",
         }
-    })
\ No newline at end of file
+        for key in CONTEXT_FIELDS + EXTRA_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc_info"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def _build_handlers() -> list[logging.Handler]:
+    formatter = JsonFormatter() if settings.logging.format == "json" else logging.Formatter(LOG_FORMAT)
+
+    console_info = logging.StreamHandler(sys.stdout)
+    console_info.setLevel(logging.INFO)
+    console_error = logging.StreamHandler(sys.stderr)
+    console_error.setLevel(logging.WARNING)
+
+    file_info = TimedRotatingFileHandler(
+        os.path.join(settings.log_dir, f"app-{settings.env}.log"),
+        when="midnight", backupCount=7, encoding="utf-8",
+    )
+    file_info.setLevel(logging.INFO)
+    file_error = TimedRotatingFileHandler(
+        os.path.join(settings.log_dir, f"error-{settings.env}.log"),
+        when="midnight", backupCount=7, encoding="utf-8",
+    )
+    file_error.setLevel(logging.WARNING)
+
+    handlers: list[logging.Handler] = [console_info, console_error, file_info, file_error]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    # 与原配置一致：uvicorn 日志只输出到控制台
+    for handler in (file_info, file_error):
+        handler.addFilter(ExcludeFilter("uvicorn"))
+    return handlers
+
+
+def setup_logging():
+    """
+    Route the `app`, `uvicorn` and root loggers through one bounded queue drained by a
+    background listener thread. Safe to call more than once (the previous listener is stopped).
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.logging.queue_size)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(settings.logging.info_sample_rate, settings.logging.sampled_loggers))
+    _queue_handler.addFilter(ContextFilter())
+
+    _listener = QueueListener(log_queue, *_build_handlers(), respect_handler_level=True)
+    _listener.start()
+
+    for name, level in (("app", logging.INFO), ("uvicorn", logging.INFO),
+                        ("uvicorn.error", logging.INFO), ("uvicorn.access", logging.INFO)):
+        logger = logging.getLogger(name)
+        logger.handlers = [_queue_handler]
+        logger.setLevel(level)
+        logger.propagate = False
+
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(logging.WARNING)
+
+
+def shutdown_logging():
+    """
+    Stop the listener after draining the queue; reports records dropped while running.
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    if _queue_handler is not None and _queue_handler.dropped:
+        # 监听线程已停止，直接写到其原有的处理器
+        record = logging.makeLogRecord({
+            "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+            "msg": f"{_queue_handler.dropped} log records dropped (logging queue full)",
+        })
+        logging.lastResort.handle(record)
+
+
+atexit.register(shutdown_logging)
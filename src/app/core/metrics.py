@@ -0,0 +1,174 @@
+"""
+Prometheus 指标
+
+HTTP metrics are recorded by `MetricsMiddleware` (per-request SQL numbers come from the
+request's `QueryProfile`), SQL metrics by engine events (`instrument_engine`) and RAGFlow
+metrics by `UpstreamGuard.call`.
+
+Multiple uvicorn workers: set `PROMETHEUS_MULTIPROC_DIR` to an empty, writable directory
+before the workers start; `/metrics` then aggregates the samples of all workers.
+"""
+import os
+import time
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# ---------- HTTP ----------
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_progress", "HTTP requests in progress", ["method", "route"], multiprocess_mode="livesum"
+)
+
+# ---------- SQL ----------
+
+DB_STATEMENTS = Counter(
+    "db_statements_total", "SQL statements executed", ["operation"]
+)
+DB_LATENCY = Histogram(
+    "db_statement_duration_seconds", "SQL statement latency", ["operation"], buckets=SQL_BUCKETS
+)
+DB_STATEMENTS_PER_REQUEST = Histogram(
+    "http_request_db_statements", "SQL statements per HTTP request", ["route"], buckets=COUNT_BUCKETS
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "http_request_db_seconds", "SQL time per HTTP request", ["route"], buckets=LATENCY_BUCKETS
+)
+
+# ---------- RAGFlow ----------
+
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total",
+    "Upstream call attempts by outcome (ok / error / failure / rejected)",
+    ["upstream", "operation", "outcome"],
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "Upstream call latency", ["upstream", "operation"], buckets=LATENCY_BUCKETS
+)
+
+# ---------- 鉴权 ----------
+
+TOKEN_REVOCATION_CHECKS = Counter(
+    "token_revocation_checks_total",
+    "Token revocation checks by result (miss / revoked / false_positive / unconfirmed)",
+    ["result"],
+)
+REFRESH_TOKEN_REUSE = Counter(
+    "refresh_token_reuse_total", "Rotated refresh tokens presented again (token family revoked)"
+)
+
+# ---------- 限流 ----------
+
+RATE_LIMIT_DECISIONS = Counter(
+    "rate_limit_decisions_total",
+    "Rate limit decisions (allowed / limited / limited_local) and Redis failures (fallback)",
+    ["limit", "outcome"],
+)
+
+# ---------- 配额 ----------
+
+QUOTA_REJECTIONS = Counter(
+    "quota_rejections_total",
+    "Requests rejected by a quota",
+    ["subject", "quota"],
+)
+
+# ---------- 缓存 ----------
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by result (local_hit / hit / negative_hit / early_refresh / stale / miss / error)",
+    ["namespace", "result"],
+)
+
+# ---------- Redis ----------
+
+REDIS_POOL_WAIT = Histogram(
+    "redis_pool_wait_seconds", "Time to acquire a Redis connection from the pool", ["pool"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+REDIS_POOL_TIMEOUTS = Counter(
+    "redis_pool_timeouts_total", "Redis commands failed because no pooled connection freed up in time", ["pool"]
+)
+REDIS_POOL_CONNECTIONS = Gauge(
+    "redis_pool_connections", "Redis connections per pool and state (in_use / idle)", ["pool", "state"],
+    multiprocess_mode="livesum",
+)
+
+# ---------- 日志 ----------
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total", "Log records dropped because the logging queue was full", ["level"]
+)
+
+
+def sql_operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+
+def instrument_engine(engine: AsyncEngine):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        operation = sql_operation(statement)
+        DB_STATEMENTS.labels(operation).inc()
+        DB_LATENCY.labels(operation).observe(elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        # 失败的语句不会触发 after_cursor_execute，丢弃其起始时间
+        conn = context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+def observe_upstream(upstream: str, operation: str, outcome: str, elapsed: Optional[float] = None):
+    UPSTREAM_REQUESTS.labels(upstream, operation, outcome).inc()
+    if elapsed is not None:
+        UPSTREAM_LATENCY.labels(upstream, operation).observe(elapsed)
+
+
+def render_latest() -> tuple[bytes, str]:
+    """
+    Text exposition of all metrics; aggregated over worker processes in multi-process mode.
+    """
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,17 @@
+from .compression import CompressionMiddleware
+from .context import RequestContextMiddleware, bind_route
+from .metrics import MetricsMiddleware, track_in_flight
+from .profiling import QueryProfilerMiddleware
+from .ratelimit import RateLimitHeadersMiddleware
+from .tracing import TracingMiddleware
+
+__all__ = [
+    "CompressionMiddleware",
+    "MetricsMiddleware",
+    "QueryProfilerMiddleware",
+    "RateLimitHeadersMiddleware",
+    "RequestContextMiddleware",
+    "TracingMiddleware",
+    "bind_route",
+    "track_in_flight",
+]
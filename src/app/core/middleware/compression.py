@@ -0,0 +1,264 @@
+"""
+响应压缩中间件（gzip / brotli / zstd）
+
+- Encoding is negotiated from `Accept-Encoding` (q-values honoured) in server preference order.
+  brotli / zstd are optional: they are offered only when `brotli` / `zstandard` are installed.
+- Only allow-listed content types are compressed; already-compressed types (PDF, images,
+  archives, office documents) are always skipped.
+- Complete bodies below `minimum_size` are sent as is. Streaming bodies are compressed
+  chunk by chunk and flushed after each chunk, so nothing is buffered.
+"""
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+DEFAULT_CONTENT_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+# 已压缩的文档类型，即使命中白名单也跳过
+COMPRESSED_CONTENT_TYPES = (
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/vnd.openxmlformats-officedocument.",
+    "application/vnd.oasis.opendocument.",
+    "application/epub+zip",
+    "image/",
+    "audio/",
+    "video/",
+    "font/woff",
+    "text/event-stream",
+)
+
+
+class Encoder(ABC):
+    """
+    Incremental compressor; `compress` returns data flushed up to the end of the chunk.
+    """
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    @abstractmethod
+    def finish(self) -> bytes:
+        ...
+
+
+class GzipEncoder(Encoder):
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder(Encoder):
+    def __init__(self, quality: int):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class ZstdEncoder(Encoder):
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encoders(gzip_level: int, brotli_quality: int, zstd_level: int) -> Dict[str, Callable[[], Encoder]]:
+    encoders: Dict[str, Callable[[], Encoder]] = {"gzip": lambda: GzipEncoder(gzip_level)}
+    if brotli is not None:
+        encoders["br"] = lambda: BrotliEncoder(brotli_quality)
+    if zstandard is not None:
+        encoders["zstd"] = lambda: ZstdEncoder(zstd_level)
+    return encoders
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """
+    `gzip, br;q=0.9, *;q=0.1` -> {"gzip": 1.0, "br": 0.9, "*": 0.1}
+    """
+    accepted: Dict[str, float] = {}
+    for part in value.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, val = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(val)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def negotiate(accept_encoding: str, preferred: Iterable[str]) -> Optional[str]:
+    """
+    Pick the best encoding the client accepts; ties go to the server preference order.
+    """
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in preferred:
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def matches(content_type: str, prefixes: Tuple[str, ...]) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return any(media_type.startswith(p) for p in prefixes)
+
+
+class CompressionMiddleware:
+    def __init__(
+            self,
+            app: ASGIApp,
+            minimum_size: int = 1024,
+            encodings: Iterable[str] = ("br", "zstd", "gzip"),
+            content_types: Iterable[str] = DEFAULT_CONTENT_TYPES,
+            gzip_level: int = 6,
+            brotli_quality: int = 4,
+            zstd_level: int = 3,
+            thread_minimum_size: int = 128 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_minimum_size = thread_minimum_size
+        self.content_types = tuple(t.lower() for t in content_types)
+        self.encoders = available_encoders(gzip_level, brotli_quality, zstd_level)
+        self.encodings = [e for e in encodings if e in self.encoders]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def is_compressible(self, headers: Headers, status: int) -> bool:
+        if status < 200 or status in (204, 206, 304):
+            return False
+        if "content-encoding" in headers or "content-range" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return matches(content_type, self.content_types) and not matches(content_type, COMPRESSED_CONTENT_TYPES)
+
+
+class CompressionResponder:
+    """
+    Per-response state: holds back `http.response.start` until the first body message
+    tells whether the body is complete (size check) or streamed (incremental).
+    """
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start: Optional[Message] = None
+        self.encoder: Optional[Encoder] = None
+        self.passthrough = False
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = not self.middleware.is_compressible(headers, message["status"])
+            if self.passthrough:
+                await self._send(message)
+            else:
+                self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            declared = headers.get("content-length")
+            too_small = (
+                len(body) < self.middleware.minimum_size if not more_body
+                else declared is not None and int(declared) < self.middleware.minimum_size
+            )
+            if too_small:
+                self.passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+
+            self.encoder = self.middleware.encoders[self.encoding]()
+            headers["Content-Encoding"] = self.encoding
+            if more_body:
+                del headers["Content-Length"]
+                await self._send(start)
+            else:
+                body = await self._compress_all(body)
+                headers["Content-Length"] = str(len(body))
+                await self._send(start)
+                await self._send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+
+        data = self.encoder.compress(body) if body else b""
+        if not more_body:
+            data += self.encoder.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    async def _compress_all(self, body: bytes) -> bytes:
+        def run() -> bytes:
+            return self.encoder.compress(body) + self.encoder.finish()
+
+        # 大响应放到线程中压缩，避免阻塞事件循环
+        if len(body) >= self.middleware.thread_minimum_size:
+            return await anyio.to_thread.run_sync(run)
+        return run()
@@ -0,0 +1,67 @@
+import logging
+import re
+import time
+import uuid
+
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logging import bind_log_context, new_log_context
+from app.core.middleware.metrics import route_template
+
+access_logger = logging.getLogger("app.access")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# 只接受调用方传入的合理 ID，避免日志注入
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+
+class RequestContextMiddleware:
+    """
+    Binds the request id (taken from `X-Request-ID` or generated) and method to the log
+    context, echoes the id in the response and, with `access_log`, writes one structured
+    access record with route, status and latency.
+    """
+
+    def __init__(self, app: ASGIApp, access_log: bool = True):
+        self.app = app
+        self.access_log = access_log
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode(), b"").decode("latin-1")
+        request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        context = new_log_context(request_id=request_id, method=scope["method"])
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            context.setdefault("route", route_template(scope))
+            if self.access_log:
+                latency_ms = round((time.perf_counter() - started) * 1000, 1)
+                access_logger.info(
+                    f"{scope['method']} {scope['path']} {status_code} {latency_ms}ms",
+                    extra={"status": status_code, "latency_ms": latency_ms},
+                )
+
+
+async def bind_route(request: Request):
+    """
+    App-level dependency: the route template is only known after routing, so it is bound
+    here for the logs written while the endpoint runs.
+    """
+    bind_log_context(route=route_template(request.scope))
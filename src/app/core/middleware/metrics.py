@@ -0,0 +1,71 @@
+import time
+
+from fastapi import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import metrics, profiling
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Route path template (e.g. `/api/v1/iam/users/{user_id}/roles`) to keep label cardinality low.
+
+    The matched route only knows its path relative to the router it was included into,
+    so the prefix is taken from the same number of leading segments of the actual path.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if not template:
+        return UNMATCHED_ROUTE
+    parts = scope["path"].split("/")
+    prefix = "/".join(parts[:max(len(parts) - template.count("/"), 1)])
+    return prefix + template
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, exclude_paths: tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = route_template(scope)
+            metrics.HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            metrics.HTTP_LATENCY.labels(method, route).observe(elapsed)
+            # 由外层 QueryProfilerMiddleware 开启
+            profile = profiling.current_profile()
+            if profile is not None:
+                metrics.DB_STATEMENTS_PER_REQUEST.labels(route).observe(profile.statements)
+                metrics.DB_TIME_PER_REQUEST.labels(route).observe(profile.seconds)
+
+
+async def track_in_flight(request: Request):
+    """
+    App-level dependency for the in-flight gauge: the route is only known after routing,
+    which happens inside the app, not in the middleware.
+    """
+    gauge = metrics.HTTP_IN_FLIGHT.labels(request.method, route_template(request.scope))
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
@@ -0,0 +1,41 @@
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import profiling
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfilerMiddleware:
+    """
+    Profiles the SQL of each request: warns about likely N+1 patterns and, with
+    `debug_headers`, reports the numbers in `X-DB-*` response headers.
+    """
+
+    def __init__(self, app: ASGIApp, debug_headers: bool = False):
+        self.app = app
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = profiling.start_profile()
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and self.debug_headers:
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Statements"] = str(profile.statements)
+                headers["X-DB-Time-Ms"] = f"{profile.seconds * 1000:.1f}"
+                headers["X-DB-Repeated-Shapes"] = str(len(profile.repeated()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            for shape, count in profile.repeated():
+                logger.warning(f"Possible N+1 in {scope['method']} {scope['path']}: {count}x {shape[:300]}")
+            profiling.publish_profile(profile)
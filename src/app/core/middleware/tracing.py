@@ -0,0 +1,60 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logging import bind_log_context, get_log_context
+from app.core.middleware.metrics import route_template
+from app.core.tracing import SERVER, Span, parse_traceparent, tracer
+
+
+class TracingMiddleware:
+    """
+    Opens the server span of each request, continuing an incoming `traceparent`. With
+    `server_timing`, the per-stage totals known when the response starts are reported in
+    a `Server-Timing` header (auth / db / ragflow, plus the elapsed total).
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        remote_parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        method = scope["method"]
+        attributes = {
+            "http.request.method": method,
+            "url.path": scope["path"],
+            "request.id": get_log_context().get("request_id"),
+        }
+
+        with tracer.start_span(method, kind=SERVER, attributes=attributes, remote_parent=remote_parent) as span:
+            bind_log_context(trace_id=span.trace_id)
+            status_code = 500
+
+            async def send_wrapper(message: Message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    if self.server_timing:
+                        MutableHeaders(scope=message)["Server-Timing"] = self._server_timing(span)
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_template(scope)
+                span.name = f"{method} {route}"
+                span.set_attribute("http.route", route)
+                span.set_attribute("http.response.status_code", status_code)
+                if status_code >= 500:
+                    span.set_status("ERROR")
+
+    @staticmethod
+    def _server_timing(span: Span) -> str:
+        parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in span.stages.items()]
+        parts.append(f"total;dur={span.elapsed * 1000:.1f}")
+        return ", ".join(parts)
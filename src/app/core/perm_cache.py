@@ -0,0 +1,90 @@
+"""
+权限缓存失效通知
+
+Roles and permissions rewritten outside the API (`init_perms`) are announced on
+`PERMISSIONS_CHANNEL`. The publisher drops the shared Redis entries derived from them
+(cached role rows, per-user role lists); every API process subscribes through the pubsub
+client and drops its in-process state (the permission registry read from the catalog).
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from app.core.cache import default_cache
+from app.core.entity_cache import entity_cache
+from app.core.permissions import get_permission_registry
+from app.core.redis import redis_manager
+from app.models import Role
+
+logger = logging.getLogger(__name__)
+
+PERMISSIONS_CHANNEL = "iam:permissions:changed"
+# 由角色 / 权限派生的共享缓存（app.core.cache 命名空间）
+DERIVED_NAMESPACES = ("iam:user_roles",)
+
+
+async def evict_shared():
+    """
+    Drop the Redis entries derived from roles and permissions.
+    """
+    redis = entity_cache.redis or redis_manager.cache
+    await entity_cache.evict_model(Role, redis)
+    for namespace in DERIVED_NAMESPACES:
+        async for key in redis.scan_iter(match=f"{default_cache.prefix}{namespace}:*", count=500):
+            await redis.delete(key)
+
+
+async def publish_permissions_changed(source: str, redis: Optional[Redis] = None) -> int:
+    """
+    Evict the shared entries, then tell every process to reload; returns the number of subscribers.
+    """
+    await evict_shared()
+    message = json.dumps({"source": source, "at": time.time()})
+    return await (redis or redis_manager.default).publish(PERMISSIONS_CHANNEL, message)
+
+
+def invalidate_local():
+    get_permission_registry.cache_clear()
+
+
+class PermissionCacheListener:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def _listen(self, redis: Redis):
+        async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+            await pubsub.subscribe(PERMISSIONS_CHANNEL)
+            async for message in pubsub.listen():
+                invalidate_local()
+                logger.info(f"Permission caches invalidated: {message['data']}")
+
+    async def _listen_forever(self, redis: Redis):
+        while True:
+            try:
+                await self._listen(redis)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 重新订阅前丢弃本地状态，期间错过的通知不再影响
+                invalidate_local()
+                logger.warning(f"Permission invalidation subscription lost, resubscribing: {e}")
+                await asyncio.sleep(1)
+
+    def start(self, redis: Optional[Redis] = None):
+        self._task = asyncio.create_task(self._listen_forever(redis or redis_manager.pubsub))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+permission_cache_listener = PermissionCacheListener()
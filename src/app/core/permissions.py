@@ -0,0 +1,102 @@
+"""
+权限目录与令牌权限位图
+
+`configs/permissions.yaml` lists the permission catalog; the position of a permission in
+the top-level `permissions` list is its bit in the access token's `perm` claim (roles
+likewise get bits in `roles` order). Lists are append-only so the bits stay stable.
+
+The catalog version (`pv` claim) is a digest of both lists and of the permissions each role
+grants: tokens minted against another catalog, including one where only a role's
+permission set changed, are not trusted and the auth dependencies fall back to the database.
+"""
+import base64
+import functools
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PERMISSIONS_YAML = Path(settings.config_dir) / "permissions.yaml"
+
+
+def encode_mask(mask: int) -> str:
+    if not mask:
+        return ""
+    raw = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_mask(value: Optional[str]) -> int:
+    if not value:
+        return 0
+    return int.from_bytes(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)), "little")
+
+
+class PermissionRegistry:
+    def __init__(
+            self, permissions: List[str], roles: List[str], role_permissions: Optional[Dict[str, List[str]]] = None
+    ):
+        self.permission_bits: Dict[str, int] = {name: 1 << i for i, name in enumerate(permissions)}
+        self.role_bits: Dict[str, int] = {name: 1 << i for i, name in enumerate(roles)}
+        # 角色授予的权限集合也计入版本：仅调整角色权限时旧令牌同样失效
+        grants = [
+            f"{role}:{','.join(sorted(set(perms)))}" for role, perms in sorted((role_permissions or {}).items())
+        ]
+        digest = hashlib.sha256("\n".join(permissions + ["--"] + roles + ["--"] + grants).encode()).hexdigest()
+        self.version: Optional[str] = digest[:8] if permissions or roles else None
+
+    @classmethod
+    def from_yaml(cls, path: Path) -> "PermissionRegistry":
+        import yaml
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            logger.warning(f"{path} not found, permission claims disabled")
+            return cls([], [])
+
+        roles = data.get("roles") or {}
+        permissions = list(data.get("permissions") or [])
+        # 角色中引用但未登记的权限排在末尾，位置随目录变化，需补登记到 permissions
+        unlisted = sorted({p for info in roles.values() for p in info.get("permissions", [])} - set(permissions))
+        if unlisted:
+            logger.warning(f"Permissions missing from the catalog list in {path}: {', '.join(unlisted)}")
+        return cls(
+            permissions + unlisted,
+            list(roles),
+            {name: list(info.get("permissions") or []) for name, info in roles.items()},
+        )
+
+    def permission_mask(self, names: Iterable[str]) -> int:
+        return functools.reduce(lambda mask, name: mask | self.permission_bits.get(name, 0), names, 0)
+
+    def role_mask(self, names: Iterable[str]) -> int:
+        return functools.reduce(lambda mask, name: mask | self.role_bits.get(name, 0), names, 0)
+
+    def claims(self, permissions: Iterable[str], roles: Iterable[str], superuser: bool = False) -> dict:
+        """
+        Access token claims for a user's effective permissions and roles.
+        """
+        if self.version is None:
+            return {}
+        claims = {
+            "pv": self.version,
+            "perm": encode_mask(self.permission_mask(permissions)),
+            "roles": encode_mask(self.role_mask(roles)),
+        }
+        if superuser:
+            claims["su"] = True
+        return claims
+
+    def is_current(self, payload: dict) -> bool:
+        return self.version is not None and payload.get("pv") == self.version
+
+
+@functools.cache
+def get_permission_registry() -> PermissionRegistry:
+    return PermissionRegistry.from_yaml(PERMISSIONS_YAML)
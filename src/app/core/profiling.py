@@ -0,0 +1,138 @@
+"""
+请求级 SQL 分析器
+
+Every statement executed while a `QueryProfile` is active (one per HTTP request, see
+`QueryProfilerMiddleware`) is counted and timed, and grouped by statement shape. A shape
+repeated more than `n_plus_one_threshold` times in one request is reported as a likely N+1.
+Slow statements are logged with their parameters redacted to types.
+
+In tests:
+    with assert_max_queries(3):
+        client.get("/api/v1/iam/roles")
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# 展开后的 IN 列表 / VALUES 占位符归一为单个 ?，使参数个数不同的同一语句形状一致
+_PLACEHOLDERS = re.compile(r"(?:\$\d+|%\(\w+\)s|\?)(?:\s*,\s*(?:\$\d+|%\(\w+\)s|\?))*")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    return _WHITESPACE.sub(" ", _PLACEHOLDERS.sub("?", statement)).strip()
+
+
+def redact(parameters: Any) -> Any:
+    """
+    Keep the structure of bound parameters but replace values by their type names.
+    """
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(p) if isinstance(p, (dict, list, tuple)) else type(p).__name__ for p in parameters]
+    return type(parameters).__name__
+
+
+@dataclass
+class QueryProfile:
+    statements: int = 0
+    seconds: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed: float):
+        self.statements += 1
+        self.seconds += elapsed
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Statement shapes executed more than `threshold` times, most frequent first.
+        """
+        threshold = settings.n_plus_one_threshold if threshold is None else threshold
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+
+_profile: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+
+# 请求结束时的回调（测试用于跨线程收集 TestClient 请求的统计）
+_observers: List[Callable[[QueryProfile], None]] = []
+
+
+def start_profile() -> QueryProfile:
+    profile = QueryProfile()
+    _profile.set(profile)
+    return profile
+
+
+def current_profile() -> Optional[QueryProfile]:
+    return _profile.get()
+
+
+def publish_profile(profile: QueryProfile):
+    for observer in list(_observers):
+        observer(profile)
+
+
+def install_query_profiler(engine: AsyncEngine):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["profile_start"].pop()
+        profile = current_profile()
+        if profile is not None:
+            profile.record(statement, elapsed)
+        if elapsed >= settings.slow_query_seconds:
+            logger.warning(
+                f"Slow query ({elapsed * 1000:.1f} ms): {statement_shape(statement)} params={redact(parameters)}"
+            )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("profile_start"):
+            conn.info["profile_start"].pop()
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[List[QueryProfile]]:
+    """
+    Fail if the code in the block (direct calls, or requests served meanwhile) runs more
+    than `limit` SQL statements. Yields the collected profiles for further assertions.
+    """
+    profiles: List[QueryProfile] = []
+    token = _profile.set(QueryProfile())
+    _observers.append(profiles.append)
+    try:
+        yield profiles
+    finally:
+        _observers.remove(profiles.append)
+        direct = _profile.get()
+        _profile.reset(token)
+    if direct.statements and all(p is not direct for p in profiles):
+        profiles.append(direct)
+
+    total = sum(p.statements for p in profiles)
+    if total > limit:
+        shapes = Counter()
+        for p in profiles:
+            shapes.update(p.shapes)
+        detail = "\n".join(f"  {n}x {shape}" for shape, n in shapes.most_common(10))
+        raise AssertionError(f"Expected at most {limit} queries, got {total}:\n{detail}")
@@ -0,0 +1,226 @@
+"""
+共享 RAGFlow 客户端
+Shared RAGFlow client guarded by circuit breakers, a retry budget and an adaptive concurrency limit.
+The SDK (and its HTTP client) is imported and built on first use.
+"""
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable
+
+from app.core.exceptions import UpstreamUnavailableError
+from app.core.lazy import lazy_import
+from app.core.metrics import observe_upstream
+from app.core.ratelimit import limit_operation
+from app.core.resilience import AIMDLimiter, CircuitBreaker, RetryBudget, backoff_delay
+from app.core.settings import settings
+from app.core.tracing import CLIENT, inject_traceparent, tracer
+
+logger = logging.getLogger(__name__)
+
+httpx = lazy_import("httpx")
+ragflow_sdk = lazy_import("ragflow_async_sdk")
+sdk_exceptions = lazy_import("ragflow_async_sdk.exceptions")
+sdk_models = lazy_import("ragflow_async_sdk.models")
+
+# 幂等读操作前缀，仅这些操作允许重试
+IDEMPOTENT_PREFIXES = ("list_", "get_", "download_")
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """
+    Whether an exception means RAGFlow itself is unhealthy (as opposed to a bad request).
+    """
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    if not sdk_exceptions.loaded:
+        # SDK 尚未导入，异常不可能来自上游
+        return False
+    if isinstance(exc, sdk_exceptions.RAGFlowHTTPError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    if isinstance(exc, sdk_exceptions.RAGFlowAPIError):
+        return exc.status_code >= 500
+    return False
+
+
+class UpstreamGuard:
+    """
+    Protection state shared by all calls to one upstream.
+    """
+
+    def __init__(self, name: str):
+        conf = settings.ragflow
+        self.name = name
+        self.limiter = AIMDLimiter(
+            initial=conf.initial_concurrency,
+            min_limit=conf.min_concurrency,
+            max_limit=conf.max_concurrency,
+            latency_threshold=conf.latency_threshold_seconds,
+            acquire_timeout=conf.acquire_timeout_seconds,
+        )
+        self.retry_budget = RetryBudget(
+            ratio=conf.retry_budget_ratio,
+            min_per_second=conf.retry_min_per_second,
+        )
+        self.breakers: dict[str, CircuitBreaker] = {}
+
+    def breaker(self, operation: str) -> CircuitBreaker:
+        breaker = self.breakers.get(operation)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                operation,
+                failure_threshold=settings.ragflow.breaker_failure_threshold,
+                reset_timeout=settings.ragflow.breaker_reset_seconds,
+            )
+            self.breakers[operation] = breaker
+        return breaker
+
+    async def call(self, operation: str, func, *args, **kwargs) -> Any:
+        conf = settings.ragflow
+        idempotent = operation.rsplit(".", 1)[-1].startswith(IDEMPOTENT_PREFIXES)
+        max_attempts = conf.retry_max_attempts if idempotent else 1
+        breaker = self.breaker(operation)
+        # 按用户限流先于熔断与并发限制，被拒绝的调用不占用上游配额
+        await limit_operation(operation)
+
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            # 先取并发槽位再问熔断器：被限流丢弃的调用不会占用半开状态的探测名额
+            if not await self.limiter.acquire():
+                observe_upstream(self.name, operation, "rejected")
+                raise UpstreamUnavailableError("RAGFlow is overloaded, please retry later", retry_after=1)
+            if not breaker.allow():
+                await self.limiter.discard()
+                observe_upstream(self.name, operation, "rejected")
+                raise UpstreamUnavailableError(
+                    f"RAGFlow operation '{operation}' is temporarily unavailable",
+                    retry_after=breaker.retry_after(),
+                )
+
+            started = time.perf_counter()
+            failed = False
+            recorded = False
+            try:
+                # 每次尝试一个 span，其 traceparent 由 HTTP 客户端的事件钩子传给 RAGFlow
+                with tracer.start_span(
+                        f"ragflow {operation}", kind=CLIENT, stage="ragflow",
+                        attributes={"ragflow.operation": operation, "ragflow.attempt": attempt + 1},
+                ):
+                    result = await func(*args, **kwargs)
+            except Exception as e:
+                failed = is_upstream_failure(e)
+                observe_upstream(
+                    self.name, operation, "failure" if failed else "error", time.perf_counter() - started
+                )
+                recorded = True
+                if not failed:
+                    # 业务错误说明上游可用
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                attempt += 1
+                if attempt >= max_attempts or not self.retry_budget.try_withdraw():
+                    raise
+                delay = backoff_delay(attempt, conf.retry_backoff_base_seconds, conf.retry_backoff_cap_seconds)
+                logger.warning(f"RAGFlow {operation} failed ({e!r}), retry {attempt} in {delay:.3f}s")
+            else:
+                observe_upstream(self.name, operation, "ok", time.perf_counter() - started)
+                breaker.record_success()
+                recorded = True
+                return result
+            finally:
+                if recorded:
+                    await self.limiter.release(time.perf_counter() - started, failed=failed)
+                else:
+                    # 被取消（CancelledError 等 BaseException）时没有结果：归还探测名额，不调整并发上限
+                    breaker.release_probe()
+                    await self.limiter.discard()
+            await asyncio.sleep(delay)
+
+    def snapshot(self) -> dict:
+        return {
+            "upstream": self.name,
+            "limiter": self.limiter.snapshot(),
+            "retry_budget": self.retry_budget.snapshot(),
+            "breakers": {name: b.snapshot() for name, b in sorted(self.breakers.items())},
+        }
+
+
+class _GuardedAPI:
+    """
+    Proxy of an SDK API module (`client.documents` etc.) routing coroutine methods through the guard.
+    """
+
+    def __init__(self, api: Any, resource: str, guard: UpstreamGuard):
+        self._api = api
+        self._resource = resource
+        self._guard = guard
+
+    def __getattr__(self, item: str):
+        attr = getattr(self._api, item)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        operation = f"{self._resource}.{item}"
+
+        async def guarded(*args, **kwargs):
+            return await self._guard.call(operation, attr, *args, **kwargs)
+
+        return guarded
+
+
+class GuardedRAGFlowClient:
+    """
+    Drop-in wrapper of `AsyncRAGFlowClient`: `client.documents.list_documents(...)` works unchanged.
+    The SDK client is created by `factory` on first use (`raw` or any resource).
+    """
+
+    RESOURCES = ("datasets", "documents", "chunks", "chats", "sessions", "agents", "systems", "files")
+
+    def __init__(self, factory: Callable[[], Any], guard: UpstreamGuard):
+        self._factory = factory
+        self._raw = None
+        self.guard = guard
+
+    @property
+    def raw(self):
+        if self._raw is None:
+            self._raw = self._factory()
+        return self._raw
+
+    def __getattr__(self, item: str):
+        if item not in self.RESOURCES:
+            raise AttributeError(item)
+        api = _GuardedAPI(getattr(self.raw, item), item, self.guard)
+        setattr(self, item, api)
+        return api
+
+    async def close(self):
+        if self._raw is not None:
+            await self._raw.close()
+
+
+def _new_sdk_client():
+    conf = settings.ragflow
+    return ragflow_sdk.AsyncRAGFlowClient(
+        server_url=conf.origin_url,
+        api_key=conf.api_key,
+        api_version=conf.api_version,
+        timeout=conf.timeout_seconds,
+        limits=httpx.Limits(
+            max_connections=conf.max_concurrency,
+            max_keepalive_connections=conf.max_concurrency,
+        ),
+        event_hooks={"request": [inject_traceparent]},
+    )
+
+
+def create_ragflow_client() -> GuardedRAGFlowClient:
+    return GuardedRAGFlowClient(_new_sdk_client, UpstreamGuard("ragflow"))
+
+
+ragflow_client = create_ragflow_client()
@@ -0,0 +1,287 @@
+"""
+限流（GCRA）
+Generic cell rate algorithm: each key stores one timestamp, the theoretical arrival time
+(TAT) of the next request. A request is allowed when it does not arrive more than
+`burst` emission intervals before the TAT, so a limit of `60/minute burst=10` allows
+10 requests at once and then one per second. The check runs atomically in Redis (Lua,
+Redis server clock), shared by all processes.
+
+In-process parts:
+- fast path: a key denied by Redis is remembered until its retry time and rejected
+  without a round trip, so a flooding client costs no Redis traffic;
+- fallback: when Redis fails, the same algorithm runs per process (`RATELIMIT_LOCAL_FALLBACK`).
+
+Routes attach `rate_limit(...)` like `login_required`; RAGFlow operations listed in
+`RATELIMIT_OPERATIONS` are limited per user inside the upstream guard.
+"""
+import functools
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, Request
+from redis.asyncio import Redis
+
+from app.core.exceptions import RateLimitedError
+from app.core.logging import get_log_context
+from app.core.metrics import RATE_LIMIT_DECISIONS
+from app.core.middleware.metrics import route_template
+from app.core.middleware.ratelimit import RATE_LIMIT_STATE
+from app.core.redis import redis_manager
+from app.core.security import login_required
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "ratelimit:"
+
+_PERIODS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60, "h": 3600, "hour": 3600,
+            "d": 86400, "day": 86400}
+_RATE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*([a-z]+?)s?\s*(?:burst\s*=\s*(\d+))?\s*$")
+
+# KEYS[1]: TAT 键；ARGV: 发射间隔（毫秒）、突发量、本次消耗
+# 返回 {是否放行, 剩余次数, 重试等待毫秒, 恢复满额毫秒}
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local tolerance = interval * tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local new_tat = tat + interval * tonumber(ARGV[3])
+local allow_at = new_tat - tolerance
+if now < allow_at then
+    return {0, 0, math.ceil(allow_at - now), math.ceil(tat - now)}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.max(1, math.ceil(new_tat - now)))
+return {1, math.floor((now - allow_at) / interval), 0, math.ceil(new_tat - now)}
+"""
+
+
+@dataclass(frozen=True)
+class Rate:
+    limit: int
+    period: float
+    burst: int
+
+    @classmethod
+    def parse(cls, text: str) -> Optional["Rate"]:
+        """
+        `"<limit>/<period>[ burst=<n>]"`, period like `second`, `minute`, `15m`, `day`;
+        burst defaults to the limit. `"off"` (or a zero limit) disables the rule.
+        """
+        if text.strip().lower() == "off":
+            return None
+        match = _RATE.match(text.lower())
+        if not match or match.group(3) not in _PERIODS:
+            raise ValueError(f"Invalid rate limit '{text}'")
+        limit, multiplier, unit, burst = match.groups()
+        if not int(limit):
+            return None
+        period = int(multiplier or 1) * _PERIODS[unit]
+        return cls(int(limit), period, int(burst) if burst else int(limit))
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.limit
+
+    @property
+    def policy(self) -> str:
+        return f"{self.burst};w={int(self.period)}"
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    rate: Rate
+    remaining: int
+    retry_after: float
+    reset_after: float
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.rate.burst),
+            "RateLimit-Remaining": str(max(0, self.remaining)),
+            "RateLimit-Reset": str(math.ceil(self.reset_after)),
+            "RateLimit-Policy": self.rate.policy,
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+    def error(self) -> RateLimitedError:
+        headers = self.headers()
+        headers.pop("Retry-After", None)
+        return RateLimitedError(retry_after=self.retry_after, headers=headers)
+
+
+class LocalGCRA:
+    """
+    The same algorithm on the process clock, for the Redis fallback. Keys beyond
+    `max_keys` are dropped oldest first.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._tat: OrderedDict[str, float] = OrderedDict()
+
+    def hit(self, key: str, rate: Rate, cost: int = 1) -> Decision:
+        now = time.monotonic()
+        tat = max(self._tat.get(key, now), now)
+        new_tat = tat + rate.interval * cost
+        allow_at = new_tat - rate.interval * rate.burst
+        if now < allow_at:
+            return Decision(False, rate, 0, allow_at - now, tat - now)
+        self._tat[key] = new_tat
+        self._tat.move_to_end(key)
+        while len(self._tat) > self.max_keys:
+            self._tat.popitem(last=False)
+        return Decision(True, rate, math.floor((now - allow_at) / rate.interval), 0, new_tat - now)
+
+
+class RateLimiter:
+    def __init__(self, redis: Optional[Redis] = None):
+        self._redis = redis
+        conf = settings.ratelimit
+        self.local = LocalGCRA(conf.local_max_keys)
+        # 快速路径：被拒绝的键 -> (解除时间, 恢复满额时间, 限额)
+        self._blocked: OrderedDict[str, Tuple[float, float, Rate]] = OrderedDict()
+
+    @property
+    def redis(self) -> Redis:
+        return self._redis or redis_manager.default
+
+    def _blocked_decision(self, key: str) -> Optional[Decision]:
+        entry = self._blocked.get(key)
+        if entry is None:
+            return None
+        until, reset_at, rate = entry
+        now = time.monotonic()
+        if now >= until:
+            del self._blocked[key]
+            return None
+        return Decision(False, rate, 0, until - now, reset_at - now)
+
+    def _block(self, key: str, decision: Decision):
+        now = time.monotonic()
+        self._blocked[key] = (now + decision.retry_after, now + decision.reset_after, decision.rate)
+        self._blocked.move_to_end(key)
+        while len(self._blocked) > settings.ratelimit.local_max_keys:
+            self._blocked.popitem(last=False)
+
+    async def hit(self, name: str, subject: str, rate: Rate, cost: int = 1) -> Decision:
+        key = f"{KEY_PREFIX}{name}:{subject}"
+        decision = self._blocked_decision(key)
+        if decision is not None:
+            RATE_LIMIT_DECISIONS.labels(name, "limited_local").inc()
+            return decision
+
+        try:
+            allowed, remaining, retry_ms, reset_ms = await self.redis.eval(
+                GCRA_SCRIPT, 1, key, rate.interval * 1000, rate.burst, cost
+            )
+            decision = Decision(bool(allowed), rate, int(remaining), int(retry_ms) / 1000, int(reset_ms) / 1000)
+        except Exception as e:
+            RATE_LIMIT_DECISIONS.labels(name, "fallback").inc()
+            if not settings.ratelimit.local_fallback:
+                logger.warning(f"Rate limit check for {name} failed, allowing: {e!r}")
+                return Decision(True, rate, rate.burst, 0, 0)
+            logger.warning(f"Rate limit check for {name} failed, limiting in process: {e!r}")
+            decision = self.local.hit(key, rate, cost)
+
+        if not decision.allowed:
+            self._block(key, decision)
+        RATE_LIMIT_DECISIONS.labels(name, "allowed" if decision.allowed else "limited").inc()
+        return decision
+
+
+rate_limiter = RateLimiter()
+
+
+@functools.lru_cache(maxsize=256)
+def parse_rate(text: str) -> Optional[Rate]:
+    return Rate.parse(text)
+
+
+def resolve_rate(name: str, default: str) -> Optional[Rate]:
+    return parse_rate(settings.ratelimit.rules.get(name, default))
+
+
+def _record(request: Request, decision: Decision):
+    # 同一请求命中多个限额时，响应头取剩余最少的
+    current: Optional[Decision] = getattr(request.state, RATE_LIMIT_STATE, None)
+    if current is None or decision.remaining < current.remaining:
+        setattr(request.state, RATE_LIMIT_STATE, decision)
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limit(name: str, default: str, *, per: str = "user", per_route: bool = True, cost: int = 1):
+    """
+    Dependency limiting requests counted under `name` to `default` (e.g. `"120/minute"`),
+    overridable through `RATELIMIT_RULES`.
+
+    `per`: `"user"` (JWT `sub`, authenticates the request), `"ip"` or `"global"`.
+    With `per_route`, each route template has its own budget, so one limit attached to a
+    router counts every route separately. Raises `RateLimitedError` (429 with `Retry-After`
+    and `RateLimit-*` headers).
+    """
+    if per not in ("user", "ip", "global"):
+        raise ValueError(f"Unknown rate limit subject '{per}'")
+    # 路由定义时校验默认值
+    parse_rate(default)
+
+    async def check(request: Request, subject: str):
+        rate = resolve_rate(name, default)
+        if rate is None or not settings.ratelimit.enabled:
+            return
+        if per_route:
+            subject = f"{route_template(request.scope)}:{subject}"
+        decision = await rate_limiter.hit(name, subject, rate, cost)
+        _record(request, decision)
+        if not decision.allowed:
+            raise decision.error()
+
+    if per == "user":
+        async def dependency(request: Request, payload: dict = Depends(login_required)):
+            await check(request, f"user:{payload['sub']}")
+    elif per == "ip":
+        async def dependency(request: Request):
+            await check(request, f"ip:{client_ip(request)}")
+    else:
+        async def dependency(request: Request):
+            await check(request, "global")
+
+    return dependency
+
+
+async def limit_operation(operation: str):
+    """
+    Per-user limit of a RAGFlow operation (`RATELIMIT_OPERATIONS`). Only applies where a
+    user is bound to the context, i.e. in requests; background jobs are not limited.
+    Charged once per gateway request and operation, however many upstream calls it makes.
+    """
+    rule = settings.ratelimit.operations.get(operation)
+    if not rule or not settings.ratelimit.enabled:
+        return
+    context = get_log_context()
+    user_id = context.get("user_id")
+    if user_id is None:
+        return
+    rate = parse_rate(rule)
+    if rate is None:
+        return
+    # 请求上下文为整个请求共享的 dict；分页、扇出产生的多次上游调用只计一次
+    charged = context.setdefault("ragflow_operations", set())
+    if operation in charged:
+        return
+    charged.add(operation)
+    decision = await rate_limiter.hit(f"ragflow.{operation}", f"user:{user_id}", rate)
+    if not decision.allowed:
+        raise decision.error()
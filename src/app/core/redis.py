@@ -1,9 +1,147 @@
+"""
+Redis 客户端
+Per-purpose pooled clients shared by everything in the process:
+
+- default: HTTP paths, job state, token families (`decode_responses`)
+- task: non-HTTP helpers on the task database (`decode_responses`)
+- cache: entity cache and `cached` entries (binary)
+- pubsub: subscriptions, which hold a connection each, kept apart from the command pools
+
+Each purpose has a `BlockingConnectionPool`: with `max_connections` in use, a command waits
+up to `REDIS_POOL_TIMEOUT_SECONDS` for a free connection instead of opening another socket.
+Acquisition wait, timeouts and pool occupancy are exported as metrics. Clients are created
+on first use and closed by `redis_manager.close()` (lifespan / worker shutdown).
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
 from fastapi import Request
-from redis.asyncio import Redis
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.exceptions import ConnectionError
 
+from app.core.metrics import REDIS_POOL_CONNECTIONS, REDIS_POOL_TIMEOUTS, REDIS_POOL_WAIT
 from app.core.settings import settings
 
 
+@dataclass(frozen=True)
+class PoolSpec:
+    dsn: str
+    max_connections: str
+    decode_responses: bool = True
+    # 订阅连接长时间阻塞读取，不设读超时
+    socket_timeout: bool = True
+
+
+POOLS: Dict[str, PoolSpec] = {
+    "default": PoolSpec("default_dsn", "max_connections"),
+    "task": PoolSpec("task_dsn", "task_max_connections"),
+    "cache": PoolSpec("default_dsn", "cache_max_connections", decode_responses=False),
+    "pubsub": PoolSpec("default_dsn", "pubsub_max_connections", socket_timeout=False),
+}
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """
+    `BlockingConnectionPool` recording acquisition wait, timeouts and occupancy.
+    """
+
+    def __init__(self, *args, name: str = "default", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.name = name
+        self._in_use_gauge = REDIS_POOL_CONNECTIONS.labels(name, "in_use")
+        self._idle_gauge = REDIS_POOL_CONNECTIONS.labels(name, "idle")
+
+    def _observe(self):
+        self._in_use_gauge.set(len(self._in_use_connections))
+        self._idle_gauge.set(len(self._available_connections))
+
+    async def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            connection = await super().get_connection(*args, **kwargs)
+        except ConnectionError as e:
+            if isinstance(e.__cause__, asyncio.TimeoutError):
+                REDIS_POOL_TIMEOUTS.labels(self.name).inc()
+            raise
+        REDIS_POOL_WAIT.labels(self.name).observe(time.perf_counter() - started)
+        self._observe()
+        return connection
+
+    async def release(self, connection):
+        await super().release(connection)
+        self._observe()
+
+    def snapshot(self) -> dict:
+        return {
+            "max_connections": self.max_connections,
+            "in_use": len(self._in_use_connections),
+            "idle": len(self._available_connections),
+        }
+
+
+class RedisManager:
+    def __init__(self):
+        self.clients: Dict[str, Redis] = {}
+
+    @staticmethod
+    def create_pool(purpose: str) -> InstrumentedConnectionPool:
+        conf = settings.redis
+        spec = POOLS[purpose]
+        return InstrumentedConnectionPool.from_url(
+            str(getattr(conf, spec.dsn)),
+            name=purpose,
+            max_connections=getattr(conf, spec.max_connections),
+            timeout=conf.pool_timeout_seconds,
+            encoding="utf-8",
+            decode_responses=spec.decode_responses,
+            socket_timeout=conf.socket_timeout_seconds if spec.socket_timeout else None,
+            socket_connect_timeout=conf.socket_connect_timeout_seconds,
+            socket_keepalive=True,
+            health_check_interval=conf.health_check_interval_seconds,
+        )
+
+    def create_client(self, purpose: str) -> Redis:
+        # 客户端拥有连接池，aclose 时一并断开
+        return Redis.from_pool(self.create_pool(purpose))
+
+    def get(self, purpose: str = "default") -> Redis:
+        client = self.clients.get(purpose)
+        if client is None:
+            client = self.clients[purpose] = self.create_client(purpose)
+        return client
+
+    @property
+    def default(self) -> Redis:
+        return self.get("default")
+
+    @property
+    def task(self) -> Redis:
+        return self.get("task")
+
+    @property
+    def cache(self) -> Redis:
+        return self.get("cache")
+
+    @property
+    def pubsub(self) -> Redis:
+        return self.get("pubsub")
+
+    def snapshot(self) -> Dict[str, Optional[dict]]:
+        return {
+            purpose: pool.snapshot() if isinstance(pool := client.connection_pool, InstrumentedConnectionPool) else None
+            for purpose, client in self.clients.items()
+        }
+
+    async def close(self):
+        clients, self.clients = self.clients, {}
+        await asyncio.gather(*(client.aclose() for client in clients.values()), return_exceptions=True)
+
+
+redis_manager = RedisManager()
+
+
 async def get_redis(request: Request) -> Redis:
     """
     用于接口请求的依赖注入
@@ -13,11 +151,6 @@ async def get_redis(request: Request) -> Redis:
 
 async def get_task_redis() -> Redis:
     """
-    用于 TaskIQ 任务或非 HTTP 上下文，多进程安全
+    用于 TaskIQ 任务或非 HTTP 上下文（任务库），进程内共享连接池
     """
-    redis = Redis.from_url(
-        str(settings.redis_task_url),
-        encoding="utf-8",
-        decode_responses=True,
-    )
-    return redis
+    return redis_manager.task
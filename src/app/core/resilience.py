@@ -0,0 +1,217 @@
+"""
+上游保护组件
+Upstream protection primitives: circuit breaker, retry budget and adaptive concurrency limit.
+"""
+import asyncio
+import random
+import time
+from enum import Enum
+from typing import Optional
+
+
+class BreakerState(str, Enum):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    - closed: calls pass through, consecutive failures are counted.
+    - open: calls are rejected until `reset_timeout` seconds have passed.
+    - half_open: up to `half_open_max_calls` probe calls are let through;
+      a success closes the breaker, a failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = BreakerState.closed
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._half_open_calls = 0
+
+    def _maybe_half_open(self):
+        if self.state is BreakerState.open and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = BreakerState.half_open
+            self._half_open_calls = 0
+
+    def allow(self) -> bool:
+        self._maybe_half_open()
+        if self.state is BreakerState.closed:
+            return True
+        if self.state is BreakerState.half_open and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return True
+        return False
+
+    def release_probe(self):
+        """
+        Give back a half_open probe slot taken by `allow()` whose call recorded no outcome
+        (shed, cancelled), so the breaker does not stay half_open with no slot left.
+        """
+        if self.state is BreakerState.half_open and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def retry_after(self) -> float:
+        if self.state is not BreakerState.open:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        self.state = BreakerState.closed
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state is BreakerState.half_open or self.failures >= self.failure_threshold:
+            self.state = BreakerState.open
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        self._maybe_half_open()
+        return {
+            "state": self.state.value,
+            "failures": self.failures,
+            "retry_after": round(self.retry_after(), 3),
+        }
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries to a fraction of the request volume.
+
+    Each request deposits `ratio` tokens, each retry withdraws one token.
+    `min_per_second` tokens are always available so that low traffic can still retry.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 5.0, max_balance: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+
+        self._balance = 0.0
+        self._reserve = min_per_second
+        self._reserve_at = time.monotonic()
+        self.exhausted = 0
+
+    def _refill_reserve(self):
+        now = time.monotonic()
+        self._reserve = min(
+            self.min_per_second,
+            self._reserve + (now - self._reserve_at) * self.min_per_second
+        )
+        self._reserve_at = now
+
+    def deposit(self):
+        self._balance = min(self.max_balance, self._balance + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        if self._balance >= 1:
+            self._balance -= 1
+            return True
+        self._refill_reserve()
+        if self._reserve >= 1:
+            self._reserve -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+    def snapshot(self) -> dict:
+        self._refill_reserve()
+        return {
+            "balance": round(self._balance, 2),
+            "reserve": round(self._reserve, 2),
+            "exhausted": self.exhausted,
+        }
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Full-jitter exponential backoff: uniform(0, min(cap, base * 2 ** attempt)).
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AIMDLimiter:
+    """
+    Adaptive concurrency limit using additive increase / multiplicative decrease.
+
+    The limit grows by ~1 per window of successful calls faster than `latency_threshold`,
+    and shrinks by `backoff_ratio` on failures or slow calls. Callers that cannot get a
+    slot within `acquire_timeout` seconds are shed.
+    """
+
+    def __init__(self, initial: int = 16, min_limit: int = 4, max_limit: int = 64,
+                 latency_threshold: float = 2.0, backoff_ratio: float = 0.9, acquire_timeout: float = 0.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_threshold = latency_threshold
+        self.backoff_ratio = backoff_ratio
+        self.acquire_timeout = acquire_timeout
+
+        self._limit = float(initial)
+        self.inflight = 0
+        self.shed = 0
+        self._cond: Optional[asyncio.Condition] = None
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _condition(self) -> asyncio.Condition:
+        # 延迟创建，避免在导入时绑定事件循环
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def acquire(self) -> bool:
+        if self.inflight < self.limit:
+            self.inflight += 1
+            return True
+        if self.acquire_timeout <= 0:
+            self.shed += 1
+            return False
+
+        cond = self._condition()
+        async with cond:
+            try:
+                await asyncio.wait_for(
+                    cond.wait_for(lambda: self.inflight < self.limit),
+                    timeout=self.acquire_timeout,
+                )
+            except asyncio.TimeoutError:
+                self.shed += 1
+                return False
+            self.inflight += 1
+            return True
+
+    async def release(self, latency: float, failed: bool = False):
+        if failed or latency > self.latency_threshold:
+            self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+        else:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+        await self.discard()
+
+    async def discard(self):
+        """
+        Release a slot without adjusting the limit (the call never reached the upstream).
+        """
+        self.inflight -= 1
+        if self._cond is not None:
+            async with self._cond:
+                self._cond.notify()
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "inflight": self.inflight,
+            "shed": self.shed,
+        }
@@ -0,0 +1,97 @@
+"""
+快速 JSON 序列化
+
+Endpoints on hot paths return `json_response(...)` instead of a bare `Response(data=...)`.
+FastAPI skips `response_model` validation for returned `starlette` responses, so the
+payload is encoded exactly once with orjson (`response_model` is still declared for OpenAPI).
+"""
+from functools import lru_cache
+from typing import Any, Mapping, Optional
+
+import orjson
+from fastapi.responses import JSONResponse
+from fastapi import Response as HTTPResponse
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_jsonable_python
+
+from app.schemas.pagination import PageData
+from app.schemas.response import Response
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+# 信封模型只是容器，按字段浅展开，由 orjson 继续编码其中的数据
+ENVELOPE_TYPES = (Response, PageData)
+
+
+@lru_cache(maxsize=None)
+def get_type_adapter(tp: Any) -> TypeAdapter:
+    """
+    One `TypeAdapter` per type; building the core schema is the expensive part.
+    """
+    return TypeAdapter(tp)
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, ENVELOPE_TYPES):
+        return dict(obj)
+    if isinstance(obj, BaseModel):
+        return orjson.Fragment(get_type_adapter(type(obj)).dump_json(obj))
+    return to_jsonable_python(obj)
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode with orjson. Dataclasses (e.g. RAGFlow entities), dicts and datetimes are handled
+    natively; pydantic models are dumped by their cached adapter and embedded as fragments.
+    """
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(
+        data: Any = None,
+        *,
+        model: Any = None,
+        code: int = 0,
+        message: str = "",
+        status_code: Optional[int] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        response: Optional[HTTPResponse] = None,
+) -> ORJSONResponse:
+    """
+    Wrap `data` in the standard envelope and encode it in one pass.
+
+    Args:
+        data: Payload. Schemas, dataclasses and plain values are trusted as they are.
+        model: Optional type to validate `data` against once (from attributes),
+            e.g. ORM rows into `PageData[UserOut]`.
+        code: Envelope code.
+        message: Envelope message.
+        status_code: HTTP status; defaults to the one set on `response`, else 200.
+        headers: Extra response headers.
+        response: The injected `fastapi.Response`, whose status and headers are carried over.
+
+    Returns:
+        ORJSONResponse
+    """
+    if model is not None:
+        adapter = get_type_adapter(model)
+        data = orjson.Fragment(adapter.dump_json(adapter.validate_python(data, from_attributes=True)))
+
+    if status_code is None:
+        status_code = (response.status_code if response is not None else None) or 200
+
+    result = ORJSONResponse(
+        Response(code=code, message=message, data=data),
+        status_code=status_code,
+        headers=headers,
+    )
+    if response is not None:
+        result.headers.update(response.headers)
+    return result
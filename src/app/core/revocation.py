@@ -0,0 +1,152 @@
+"""
+令牌吊销列表
+
+Revoked token ids (access token `jti`s and refresh token families) live in one Redis
+sorted set, scored by the time after which no token carrying the id can still be valid.
+Every process keeps a bloom filter of the set, rebuilt when the set's version counter
+changes, so the auth path only asks Redis about the rare ids the filter may contain:
+
+    bloom miss  -> not revoked (no I/O)
+    bloom hit   -> ZSCORE to rule out a false positive
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Iterable, Optional
+
+from redis.asyncio import Redis
+
+from app.core.metrics import TOKEN_REVOCATION_CHECKS
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+REVOKED_KEY = "auth:revoked"
+REVOKED_VERSION_KEY = "auth:revoked:version"
+
+
+class BloomFilter:
+    """
+    Fixed-size bloom filter over strings, sized for `capacity` items at `error_rate`.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # 双重哈希：一次 blake2b 摘要拆成两个 64 位值
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationList:
+    """
+    Process-local view of the revoked ids, see the module docstring.
+    """
+
+    def __init__(self):
+        self.bloom = self._new_bloom(0)
+        self.version: Optional[str] = None
+        self._redis: Optional[Redis] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _new_bloom(count: int) -> BloomFilter:
+        # 超出预设容量时按实际数量放大，保持误判率
+        capacity = max(settings.auth.revocation_bloom_capacity, count * 2)
+        return BloomFilter(capacity, settings.auth.revocation_bloom_error_rate)
+
+    async def revoke(self, redis: Redis, *ids: str, ttl: int):
+        """
+        Revoke `ids` for `ttl` seconds, i.e. until every token carrying them has expired.
+        """
+        if not ids:
+            return
+        expires_at = time.time() + ttl
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(REVOKED_KEY, {i: expires_at for i in ids})
+            pipe.incr(REVOKED_VERSION_KEY)
+            await pipe.execute()
+        for i in ids:
+            self.bloom.add(i)
+
+    async def is_revoked(self, redis: Optional[Redis], *ids: Optional[str]) -> bool:
+        candidates = [i for i in ids if i and i in self.bloom]
+        if not candidates:
+            TOKEN_REVOCATION_CHECKS.labels("miss").inc()
+            return False
+        if redis is None:
+            # 无法确认时按已吊销处理
+            TOKEN_REVOCATION_CHECKS.labels("unconfirmed").inc()
+            return True
+        try:
+            scores = await redis.zmscore(REVOKED_KEY, candidates)
+        except Exception as e:
+            logger.warning(f"Revocation lookup failed, rejecting token: {e}")
+            TOKEN_REVOCATION_CHECKS.labels("unconfirmed").inc()
+            return True
+        now = time.time()
+        revoked = any(score is not None and float(score) > now for score in scores)
+        TOKEN_REVOCATION_CHECKS.labels("revoked" if revoked else "false_positive").inc()
+        return revoked
+
+    async def sync(self, redis: Redis, force: bool = False):
+        """
+        Rebuild the bloom filter if the revocation set changed since the last sync.
+        """
+        version = await redis.get(REVOKED_VERSION_KEY)
+        if not force and version == self.version:
+            return
+        now = time.time()
+        await redis.zremrangebyscore(REVOKED_KEY, "-inf", now)
+        ids = await redis.zrangebyscore(REVOKED_KEY, now, "+inf")
+        bloom = self._new_bloom(len(ids))
+        for i in ids:
+            bloom.add(i)
+        self.bloom, self.version = bloom, version
+        logger.debug(f"Revocation list synced: {len(ids)} ids, version {version}")
+
+    async def _sync_forever(self):
+        while True:
+            await asyncio.sleep(settings.auth.revocation_sync_seconds)
+            try:
+                await self.sync(self._redis)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Revocation list sync failed: {e}")
+
+    async def start(self, redis: Redis):
+        self._redis = redis
+        try:
+            await self.sync(redis, force=True)
+        except Exception as e:
+            logger.warning(f"Initial revocation list sync failed: {e}")
+        self._task = asyncio.create_task(self._sync_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._redis = None
+
+
+revocation_list = RevocationList()
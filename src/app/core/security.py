@@ -1,17 +1,20 @@
+import functools
 import logging
 import traceback
 
 from fastapi import Request, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.db import get_db_session
 from app.core.exceptions import NotFoundError, PermissionDeniedError
-from app.core.exceptions import UnauthorizedError
-from app.core.jwt import decode_token
+from app.core.exceptions import UnauthorizedError, TokenInvalidError
 from app.core.jwt import verify_token
+from app.core.logging import bind_log_context
+from app.core.permissions import get_permission_registry, decode_mask
+from app.core.revocation import revocation_list
 from app.core.settings import settings
+from app.core.tracing import traced
 from app.models import User
 from app.repositories.iam import UserRepo
 
@@ -34,21 +37,42 @@ class ServiceOAuth2PasswordBearer(OAuth2PasswordBearer):
 
 oauth2_scheme = ServiceOAuth2PasswordBearer(settings.login_url)
 
-pwd_context = CryptContext(
-    schemes=["pbkdf2_sha256"],
-    default="pbkdf2_sha256",
-    deprecated="auto"
-)
 
+@functools.cache
+def get_password_context():
+    # passlib 仅登录与建用户时需要，首次使用时再导入
+    from passlib.context import CryptContext
 
-async def login_required(token: str = Depends(oauth2_scheme)) -> dict:
-    payload = verify_token(token)
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        default="pbkdf2_sha256",
+        deprecated="auto"
+    )
+
+
+async def authenticate(request: Request, token: str) -> dict:
+    """
+    Verify an access token: signature, expiry, type, and the revocation list (local
+    bloom filter, Redis only on a hit).
+    """
+    payload = verify_token(token, expected_type="access")
     if not payload or payload.get("sub") is None:
         raise UnauthorizedError("Token payload missing subject")
+    redis = getattr(request.app.state, "redis", None)
+    if await revocation_list.is_revoked(redis, payload.get("jti"), payload.get("fam")):
+        raise TokenInvalidError("Token revoked")
+    bind_log_context(user_id=payload["sub"])
     return payload
 
 
+@traced("auth.login_required", stage="auth")
+async def login_required(request: Request, token: str = Depends(oauth2_scheme)) -> dict:
+    return await authenticate(request, token)
+
+
+@traced("auth.get_current_user", stage="auth")
 async def get_current_user(
+        request: Request,
         token: str = Depends(oauth2_scheme),
         db: AsyncSession = Depends(get_db_session)
 ) -> User:
@@ -57,28 +81,40 @@ async def get_current_user(
     Synchronous for simplicity, just returns the ORM object.
     """
     try:
-        payload = decode_token(token)
+        payload = await authenticate(request, token)
         user_id = int(payload.get("sub"))
         # Use UserRepo to get user by username without loading roles/permissions
         user = await user_repo.get_by_pk(db, user_id)
         if not user:
             raise NotFoundError(f"User with ID '{user_id}' not found")
         return user
+    except UnauthorizedError:
+        raise
     except Exception as e:
         logger.debug(traceback.format_exc())
         raise NotFoundError("Invalid token") from e
 
 
 def has_role(role_name: str):
+    @traced("auth.has_role", stage="auth")
     async def dependency(
+            request: Request,
             token: str = Depends(oauth2_scheme),
             db: AsyncSession = Depends(get_db_session),
     ) -> None:
         """
-        Verify that the current user has the specified role.
-        Loads roles for permission check.
+        Verify that the current user has the specified role: a bit test on the token's
+        role claim, or loading the roles when the claim is missing / from another catalog.
         """
-        user_id = int(decode_token(token)["sub"])
+        payload = await authenticate(request, token)
+        registry = get_permission_registry()
+        role_bit = registry.role_bits.get(role_name, 0)
+        if role_bit and registry.is_current(payload):
+            if not payload.get("su") and not decode_mask(payload.get("roles")) & role_bit:
+                raise PermissionDeniedError("Insufficient role")
+            return
+
+        user_id = int(payload["sub"])
         user = await user_repo.get_by_id(db, user_id, load_roles=True)
         if not user:
             raise UnauthorizedError("User not found")
@@ -91,15 +127,25 @@ def has_role(role_name: str):
 
 
 def has_perm(permission_name: str):
+    @traced("auth.has_perm", stage="auth")
     async def dependency(
+            request: Request,
             token: str = Depends(oauth2_scheme),
             db: AsyncSession = Depends(get_db_session),
     ) -> None:
         """
-        Verify that the current user has the specified permission.
-        Loads roles and their permissions.
+        Verify that the current user has the specified permission: a bit test on the token's
+        permission claim, or loading roles and their permissions when the claim is stale.
         """
-        user_id = int(decode_token(token)["sub"])
+        payload = await authenticate(request, token)
+        registry = get_permission_registry()
+        permission_bit = registry.permission_bits.get(permission_name, 0)
+        if permission_bit and registry.is_current(payload):
+            if not payload.get("su") and not decode_mask(payload.get("perm")) & permission_bit:
+                raise PermissionDeniedError("Insufficient permission")
+            return
+
+        user_id = int(payload["sub"])
         user = await user_repo.get_by_id(db, user_id, load_roles=True, load_permissions=True)
         if not user:
             raise UnauthorizedError("User not found")
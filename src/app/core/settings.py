@@ -1,7 +1,7 @@
 import os
 from enum import Enum
 from os import PathLike
-from typing import Optional
+from typing import Dict, Optional
 from urllib.parse import quote_plus
 
 from pydantic import Field, model_validator, BaseModel, PostgresDsn, RedisDsn, AnyUrl
@@ -48,6 +48,18 @@ class RedisConfig(BaseModel):
     task_db: int = 1
     default_dsn: Optional[RedisDsn] = None
     task_dsn: Optional[RedisDsn] = None
+
+    # 连接池（每进程、按用途各一个阻塞式连接池，见 app.core.redis）
+    max_connections: int = 64
+    task_max_connections: int = 16
+    cache_max_connections: int = 64
+    pubsub_max_connections: int = 8
+    # 连接用尽时等待空闲连接的时长，超时报错而不是新建连接
+    pool_timeout_seconds: float = 1.0
+    socket_timeout_seconds: float = 5.0
+    socket_connect_timeout_seconds: float = 2.0
+    # 空闲超过该时长的连接在使用前先 PING
+    health_check_interval_seconds: int = 30
     model_config = SettingsConfigDict(env_prefix="REDIS_")
 
 
@@ -57,9 +69,161 @@ class RAGFlowConfig(BaseSettings):
     api_version: str = "v1"
     timeout_seconds: int = 10
 
+    # 自适应并发限制（AIMD）
+    initial_concurrency: int = 16
+    min_concurrency: int = 4
+    max_concurrency: int = 64
+    latency_threshold_seconds: float = 2.0
+    acquire_timeout_seconds: float = 0.05
+
+    # 熔断
+    breaker_failure_threshold: int = 5
+    breaker_reset_seconds: float = 30.0
+
+    # 重试（仅幂等读操作）
+    retry_max_attempts: int = 3
+    retry_budget_ratio: float = 0.2
+    retry_min_per_second: float = 5.0
+    retry_backoff_base_seconds: float = 0.1
+    retry_backoff_cap_seconds: float = 2.0
+
+    # 后台解析任务
+    parse_batch_size: int = 20
+    parse_batch_interval_seconds: float = 1.0
+    parse_poll_interval_seconds: float = 5.0
+    parse_poll_timeout_seconds: float = 3600.0
+    parse_poll_page_size: int = 100
+    job_ttl_seconds: int = 60 * 60 * 24
+
+    # 批量删除
+    delete_batch_size: int = 100
+    delete_concurrency: int = 4
+    delete_background_threshold: int = 500
+
+    # 本地元数据镜像；受限用户（非管理员）的列表始终读镜像
+    mirror_reads: bool = False
+    mirror_sync_interval_seconds: int = 60
+    mirror_full_sync_interval_seconds: int = 60 * 60
+    mirror_sync_page_size: int = 100
+
+    # 按用户可见范围过滤
+    acl_cache_ttl_seconds: int = 60
+
     model_config = SettingsConfigDict(env_prefix="RAG_")
 
 
+class CompressionConfig(BaseModel):
+    enabled: bool = True
+    minimum_size: int = 1024
+    # 服务端偏好顺序，br / zstd 需安装 brotli / zstandard
+    encodings: list[str] = ["br", "zstd", "gzip"]
+    content_types: list[str] = [
+        "application/json",
+        "application/x-ndjson",
+        "application/javascript",
+        "application/xml",
+        "image/svg+xml",
+        "text/",
+    ]
+    gzip_level: int = 6
+    brotli_quality: int = 4
+    zstd_level: int = 3
+    model_config = SettingsConfigDict(env_prefix="COMPRESSION_")
+
+
+class LoggingConfig(BaseModel):
+    # json：每行一个 JSON 对象；text：沿用原有的纯文本格式
+    format: str = "json"
+    # 队列满时直接丢弃并计数，日志调用永不阻塞事件循环
+    queue_size: int = 10000
+    # 高频 INFO 日志的采样率（0~1），WARNING 及以上始终保留
+    info_sample_rate: float = 1.0
+    sampled_loggers: list[str] = ["app.access", "uvicorn.access"]
+    access_log: bool = True
+    model_config = SettingsConfigDict(env_prefix="LOGGING_")
+
+
+class TracingConfig(BaseModel):
+    enabled: bool = False
+    # otlp：OTLP/HTTP JSON 推送到 collector；file：按行写入 OTLP JSON；memory：测试用
+    exporter: str = "otlp"
+    otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    file_path: Optional[str] = None
+    service_name: str = "ragflow-gateway"
+    sample_ratio: float = 1.0
+    queue_size: int = 2048
+    batch_size: int = 256
+    export_interval_seconds: float = 5.0
+    model_config = SettingsConfigDict(env_prefix="TRACING_")
+
+
+class AuthConfig(BaseModel):
+    # 吊销列表：本地布隆过滤器从 Redis 同步的间隔、容量与误判率
+    revocation_sync_seconds: float = 5.0
+    revocation_bloom_capacity: int = 100000
+    revocation_bloom_error_rate: float = 0.001
+    model_config = SettingsConfigDict(env_prefix="AUTH_")
+
+
+class CacheConfig(BaseModel):
+    enabled: bool = True
+    # Repository 实体缓存（按主键）的过期时间
+    entity_ttl_seconds: int = 300
+    # app.core.cache：跨进程加载锁、等待轮询间隔、XFetch 提前刷新系数（0 关闭）
+    lock_timeout_seconds: float = 5.0
+    lock_poll_seconds: float = 0.05
+    xfetch_beta: float = 1.0
+    # IAM 查询结果缓存
+    iam_ttl_seconds: int = 60
+    model_config = SettingsConfigDict(env_prefix="CACHE_")
+
+
+class RateLimitConfig(BaseModel):
+    enabled: bool = True
+    # 按名称覆盖路由上声明的默认限额，"off" 关闭，如 {"ragflow.parse": "20/minute burst=5"}
+    rules: Dict[str, str] = {}
+    # RAGFlow 操作按用户（JWT sub）限流，每个网关请求每种操作计一次；后台任务不受限
+    operations: Dict[str, str] = {
+        "datasets.list_datasets": "300/minute",
+        "documents.list_documents": "300/minute",
+        "documents.upload_documents": "60/minute",
+        "documents.download_document": "120/minute",
+    }
+    # Redis 不可用时退回进程内限流（限额按进程计算）
+    local_fallback: bool = True
+    # 进程内记录的键数上限（拒绝快速路径与本地退回）
+    local_max_keys: int = 10000
+    model_config = SettingsConfigDict(env_prefix="RATELIMIT_")
+
+
+class QuotaConfig(BaseModel):
+    enabled: bool = True
+    # 按用户 / 按知识库的存储字节数、文档数与每日（UTC）解析文档数上限，0 表示不限
+    user_max_bytes: int = 0
+    user_max_documents: int = 0
+    user_parses_per_day: int = 0
+    dataset_max_bytes: int = 0
+    dataset_max_documents: int = 0
+    dataset_parses_per_day: int = 0
+    # Redis 计数器与 Postgres（RagflowDocumentUser / ragflow_quota_usage）的对账间隔
+    reconcile_interval_seconds: int = 300
+    # Redis 不可用时放行（对账时修正存储计数）
+    fail_open: bool = True
+    model_config = SettingsConfigDict(env_prefix="QUOTA_")
+
+
+class WarmupConfig(BaseModel):
+    enabled: bool = True
+    # 每个池预先建立的连接数（数据库连接池默认大小为 5）
+    db_connections: int = 5
+    redis_connections: int = 4
+    ragflow_connections: int = 4
+    timeout_seconds: float = 10.0
+    # 预热完成后 /readyz 检查数据库与 Redis 的超时
+    check_timeout_seconds: float = 2.0
+    model_config = SettingsConfigDict(env_prefix="WARMUP_")
+
+
 class BaseConfig(BaseSettings):
     # 基础配置
     env: str = Field(EnvEnum.dev.value)
@@ -76,10 +240,25 @@ class BaseConfig(BaseSettings):
     password_complexity: Optional[str] = Field("HIGH")
     cors_origins: Optional[list[Optional[AnyUrl]]] = Field(list())
 
+    # 可观测性
+    metrics_enabled: Optional[bool] = Field(True)
+    # /metrics 的静态 Bearer token，供 Prometheus 抓取；未设置时仅管理员令牌可访问
+    metrics_token: Optional[str] = Field(None)
+    slow_query_seconds: Optional[float] = Field(0.5)
+    n_plus_one_threshold: Optional[int] = Field(5)
+
     # 模块配置
     redis: RedisConfig
     db: DBConfig
     ragflow: RAGFlowConfig
+    auth: AuthConfig = Field(default_factory=AuthConfig)
+    cache: CacheConfig = Field(default_factory=CacheConfig)
+    ratelimit: RateLimitConfig = Field(default_factory=RateLimitConfig)
+    quota: QuotaConfig = Field(default_factory=QuotaConfig)
+    warmup: WarmupConfig = Field(default_factory=WarmupConfig)
+    compression: CompressionConfig = Field(default_factory=CompressionConfig)
+    logging: LoggingConfig = Field(default_factory=LoggingConfig)
+    tracing: TracingConfig = Field(default_factory=TracingConfig)
 
     model_config = SettingsConfigDict(
         env_nested_delimiter="_",
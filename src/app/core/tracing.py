@@ -0,0 +1,536 @@
+"""
+链路追踪
+
+A small tracer producing OpenTelemetry-compatible spans without depending on the OTel SDK:
+ids and `traceparent` follow W3C Trace Context, and exporters write the OTLP/HTTP JSON
+encoding, so any OpenTelemetry collector (or its file receiver) can ingest the output.
+
+Spans are opened by `TracingMiddleware` (server span), the auth dependencies, `BaseRepo`
+methods, SQL statements (`trace_engine`) and RAGFlow calls; the RAGFlow HTTP client sends
+`traceparent` upstream (`inject_traceparent`). Spans may carry a `stage` (auth / db /
+ragflow); the local root span sums the time spent in each stage, counting nested spans of
+the same stage once, into `gateway.stage.<stage>_ms` attributes.
+
+Usage:
+    with tracer.start_span("mirror.sync", stage="ragflow") as span:
+        span.set_attribute("dataset.count", n)
+
+Tests:
+    exporter = InMemorySpanExporter()
+    configure_tracing(exporter)
+    ...
+    exporter.get_finished_spans()
+"""
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.lazy import lazy_import
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+httpx = lazy_import("httpx")
+
+INTERNAL, SERVER, CLIENT = "internal", "server", "client"
+# OTLP SpanKind / StatusCode 取值
+_OTLP_KIND = {INTERNAL: 1, SERVER: 2, CLIENT: 3}
+_OTLP_STATUS = {"UNSET": 0, "OK": 1, "ERROR": 2}
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    match = _TRACEPARENT.match((value or "").strip().lower())
+    if not match:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, sampled=bool(int(flags, 16) & 1))
+
+
+class Span:
+    def __init__(self, name: str, context: SpanContext, parent: Optional["Span"] = None,
+                 remote_parent: Optional[SpanContext] = None, kind: str = INTERNAL,
+                 stage: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.context = context
+        self.parent = parent
+        self.parent_span_id = parent.context.span_id if parent else (remote_parent.span_id if remote_parent else None)
+        self.root: Span = parent.root if parent else self
+        self.kind = kind
+        self.stage = stage
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events: List[Dict[str, Any]] = []
+        self.status = "UNSET"
+        self.status_message: Optional[str] = None
+        self.stages: Dict[str, float] = {}
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.context.trace_id
+
+    @property
+    def span_id(self) -> str:
+        return self.context.span_id
+
+    @property
+    def elapsed(self) -> float:
+        return self.duration if self.duration is not None else time.perf_counter() - self._start
+
+    @property
+    def end_ns(self) -> int:
+        return self.start_ns + int((self.duration or 0.0) * 1e9)
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_status(self, status: str, message: Optional[str] = None):
+        self.status = status
+        self.status_message = message
+
+    def record_exception(self, exc: BaseException):
+        self.events.append({
+            "name": "exception",
+            "time_ns": time.time_ns(),
+            "attributes": {"exception.type": type(exc).__name__, "exception.message": str(exc)},
+        })
+        self.set_status("ERROR", f"{type(exc).__name__}: {exc}")
+
+    def _in_stage(self, stage: str) -> bool:
+        span = self.parent
+        while span is not None:
+            if span.stage == stage:
+                return True
+            span = span.parent
+        return False
+
+    def end(self):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        if self.stage and not self._in_stage(self.stage):
+            self.root.stages[self.stage] = self.root.stages.get(self.stage, 0.0) + self.duration
+        if self.root is self:
+            for stage, seconds in self.stages.items():
+                self.attributes[f"gateway.stage.{stage}_ms"] = round(seconds * 1000, 3)
+        if self.context.sampled:
+            tracer.on_end(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        data = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": _OTLP_KIND[self.kind],
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": _OTLP_STATUS[self.status]},
+        }
+        if self.parent_span_id:
+            data["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            data["status"]["message"] = self.status_message
+        if self.events:
+            data["events"] = [
+                {"name": e["name"], "timeUnixNano": str(e["time_ns"]), "attributes": _otlp_attributes(e["attributes"])}
+                for e in self.events
+            ]
+        return data
+
+
+class _NoopSpan:
+    """
+    Returned while tracing is disabled, so instrumented code needs no checks.
+    """
+    context = None
+    trace_id = span_id = None
+    stages: Dict[str, float] = {}
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_status(self, status: str, message: Optional[str] = None):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+# ---------- 导出 ----------
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, spans: List[Span]):
+        ...
+
+    def shutdown(self):
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    def __init__(self):
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def get_finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+def otlp_payload(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    """
+    OTLP `ExportTraceServiceRequest` in its JSON encoding.
+    """
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+            "scopeSpans": [{"scope": {"name": "app"}, "spans": [span.to_otlp() for span in spans]}],
+        }]
+    }
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    One OTLP JSON request per line (the format of the collector's `otlpjsonfile` receiver).
+    """
+
+    def __init__(self, path: str, service_name: str):
+        self.path = path
+        self.service_name = service_name
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def export(self, spans: List[Span]):
+        line = json.dumps(otlp_payload(spans, self.service_name), ensure_ascii=False)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OTLPSpanExporter(SpanExporter):
+    """
+    OTLP/HTTP with JSON encoding, e.g. `http://collector:4318/v1/traces`.
+    """
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 10.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._client = httpx.Client(timeout=timeout)
+
+    def export(self, spans: List[Span]):
+        try:
+            response = self._client.post(self.endpoint, json=otlp_payload(spans, self.service_name))
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.warning(f"Exporting {len(spans)} spans to {self.endpoint} failed: {e!r}")
+
+    def shutdown(self):
+        self._client.close()
+
+
+class SimpleSpanProcessor:
+    """
+    Exports each span synchronously when it ends. Meant for tests and the in-memory exporter.
+    """
+
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+
+    def on_end(self, span: Span):
+        self.exporter.export([span])
+
+    def force_flush(self):
+        pass
+
+    def shutdown(self):
+        self.exporter.shutdown()
+
+
+class BatchSpanProcessor:
+    """
+    Queues finished spans and exports them in batches from a background thread, so file
+    and network I/O never run on the event loop. Spans are dropped (and counted) when
+    the queue is full.
+    """
+
+    def __init__(self, exporter: SpanExporter, queue_size: int = 2048, batch_size: int = 256,
+                 interval: float = 5.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._flush = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._flush.set()
+
+    def _drain(self):
+        batch: List[Span] = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._export(batch)
+                batch = []
+        if batch:
+            self._export(batch)
+
+    def _export(self, batch: List[Span]):
+        try:
+            self.exporter.export(batch)
+        except Exception:
+            logger.exception("Span export failed")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._flush.wait(self.interval)
+            self._flush.clear()
+            self._drain()
+        self._drain()
+
+    def force_flush(self):
+        self._drain()
+
+    def shutdown(self):
+        self._stopped.set()
+        self._flush.set()
+        self._thread.join(timeout=self.interval + 5)
+        if self.dropped:
+            logger.warning(f"{self.dropped} spans dropped (export queue full)")
+        self.exporter.shutdown()
+
+
+# ---------- Tracer ----------
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+class Tracer:
+    def __init__(self):
+        self.processor = None
+        self.sample_ratio = 1.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None
+
+    def _sampled(self, trace_id: str) -> bool:
+        # 按 trace id 低 64 位比例采样，同一条链路在各服务上的决定一致
+        return int(trace_id[16:], 16) < self.sample_ratio * (1 << 64)
+
+    def create_span(self, name: str, *, kind: str = INTERNAL, stage: Optional[str] = None,
+                    attributes: Optional[Dict[str, Any]] = None,
+                    remote_parent: Optional[SpanContext] = None) -> Span:
+        """
+        A started span that is *not* made current; the caller must `end()` it.
+        """
+        parent = None if remote_parent else current_span()
+        span_id = f"{random.getrandbits(64):016x}"
+        if parent is not None:
+            context = SpanContext(parent.trace_id, span_id, parent.context.sampled)
+        elif remote_parent is not None:
+            context = SpanContext(remote_parent.trace_id, span_id, remote_parent.sampled)
+        else:
+            trace_id = f"{random.getrandbits(128):032x}"
+            context = SpanContext(trace_id, span_id, self._sampled(trace_id))
+        return Span(name, context, parent=parent, remote_parent=remote_parent, kind=kind, stage=stage,
+                    attributes=attributes)
+
+    @contextmanager
+    def start_span(self, name: str, *, kind: str = INTERNAL, stage: Optional[str] = None,
+                   attributes: Optional[Dict[str, Any]] = None,
+                   remote_parent: Optional[SpanContext] = None) -> Iterator[Span]:
+        """
+        Start a span, make it current for the block and end it afterwards; exceptions are
+        recorded on the span and re-raised.
+        """
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        span = self.create_span(name, kind=kind, stage=stage, attributes=attributes, remote_parent=remote_parent)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def on_end(self, span: Span):
+        if self.processor is not None:
+            self.processor.on_end(span)
+
+
+tracer = Tracer()
+
+
+def traced(name: Optional[str] = None, *, stage: Optional[str] = None, kind: str = INTERNAL):
+    """
+    Decorator for coroutine functions (FastAPI dependencies included: the signature is kept).
+    """
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return await func(*args, **kwargs)
+            with tracer.start_span(span_name, kind=kind, stage=stage):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+async def inject_traceparent(request: "httpx.Request"):
+    """
+    httpx request event hook: continue the current trace on the upstream.
+    """
+    span = current_span()
+    if span is not None:
+        request.headers["traceparent"] = span.context.traceparent
+
+
+def trace_engine(engine: AsyncEngine):
+    """
+    One `db.query` client span per SQL statement.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = None
+        if tracer.enabled:
+            span = tracer.create_span(
+                "db.query", kind=CLIENT, stage="db",
+                attributes={"db.system": sync_engine.dialect.name, "db.statement": statement[:500]},
+            )
+        conn.info.setdefault("trace_spans", []).append(span)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = conn.info["trace_spans"].pop()
+        if span is not None:
+            span.end()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("trace_spans"):
+            span = conn.info["trace_spans"].pop()
+            if span is not None:
+                span.record_exception(context.original_exception)
+                span.end()
+
+
+def configure_tracing(exporter: Optional[SpanExporter] = None) -> Tracer:
+    """
+    Enable tracing. With an explicit exporter (tests) spans are exported synchronously;
+    otherwise the exporter comes from `settings.tracing` and runs in a background batch.
+    """
+    shutdown_tracing()
+    conf = settings.tracing
+    tracer.sample_ratio = conf.sample_ratio
+    if exporter is not None:
+        tracer.processor = SimpleSpanProcessor(exporter)
+        return tracer
+
+    if conf.exporter == "memory":
+        tracer.processor = SimpleSpanProcessor(InMemorySpanExporter())
+        return tracer
+    if conf.exporter == "file":
+        path = conf.file_path or os.path.join(settings.log_dir, f"traces-{settings.env}.jsonl")
+        exporter = FileSpanExporter(path, conf.service_name)
+    elif conf.exporter == "otlp":
+        exporter = OTLPSpanExporter(conf.otlp_endpoint, conf.service_name)
+    else:
+        raise ValueError(f"Unknown tracing exporter: {conf.exporter}")
+    tracer.processor = BatchSpanProcessor(
+        exporter,
+        queue_size=conf.queue_size,
+        batch_size=conf.batch_size,
+        interval=conf.export_interval_seconds,
+    )
+    return tracer
+
+
+def shutdown_tracing():
+    processor, tracer.processor = tracer.processor, None
+    if processor is not None:
+        processor.shutdown()
@@ -0,0 +1,167 @@
+"""
+启动预热
+
+Runs after startup, before the worker reports ready (`/readyz`): opens connections in the
+DB, Redis and RAGFlow pools so the first requests do not pay for TCP / TLS / auth
+handshakes, imports the lazily loaded dependencies (`app.core.lazy`) and builds the
+pydantic serializers of every route's response model. Each
+step is timed and logged; a failed step is logged and does not block readiness.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from redis.asyncio import Redis
+from sqlalchemy import text
+
+from app.core.cache import default_cache
+from app.core.db import engine
+from app.core.entity_cache import entity_cache
+from app.core.jwt import jwt, jose_exceptions
+from app.core.permissions import get_permission_registry
+from app.core.ragflow import ragflow_client
+from app.core.responses import get_type_adapter
+from app.core.security import get_password_context
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StepResult:
+    seconds: float
+    ok: bool
+    error: Optional[str] = None
+
+
+@dataclass
+class Readiness:
+    ready: bool = False
+    started_at: Optional[float] = None
+    seconds: Optional[float] = None
+    steps: Dict[str, StepResult] = field(default_factory=dict)
+
+    def snapshot(self) -> dict:
+        return asdict(self)
+
+
+readiness = Readiness()
+
+
+async def warm_db(connections: int):
+    """
+    Check out `connections` pooled connections at once (so they are distinct) and run a trivial query.
+    """
+    async def open_one():
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                await barrier.wait()
+        except Exception:
+            await barrier.abort()
+            raise
+
+    barrier = asyncio.Barrier(connections)
+    await asyncio.gather(*(open_one() for _ in range(connections)))
+
+
+async def warm_redis(redis: Redis, connections: int):
+    # 实体缓存与 cached 共用 cache 客户端，去重
+    clients = {id(c): c for c in (redis, default_cache.redis, entity_cache.redis) if c is not None}.values()
+    # 并发 PING 迫使连接池建立多条连接
+    await asyncio.gather(*(c.ping() for c in clients for _ in range(connections)))
+
+
+async def warm_ragflow(connections: int):
+    # 绕过熔断与限流：预热失败不应计入上游健康状况
+    await asyncio.gather(*(ragflow_client.raw.datasets.list_datasets(page=1, page_size=1) for _ in range(connections)))
+
+
+def warm_imports():
+    """
+    Load what the first authenticated request would otherwise import: JOSE, passlib, yaml.
+    """
+    jwt.load()
+    jose_exceptions.load()
+    get_password_context()
+    get_permission_registry()
+
+
+def _api_routes(routes) -> Iterator[APIRoute]:
+    for route in routes:
+        if isinstance(route, APIRoute):
+            yield route
+        # include_router 挂载的子路由（FastAPI 保留原路由器）
+        included = getattr(route, "original_router", None)
+        if included is not None:
+            yield from _api_routes(included.routes)
+
+
+def warm_schemas(app: FastAPI) -> int:
+    """
+    Build the (cached) type adapters `json_response` uses and the OpenAPI document.
+    """
+    models = {route.response_model for route in _api_routes(app.routes) if route.response_model is not None}
+    for model in models:
+        get_type_adapter(model)
+    app.openapi()
+    return len(models)
+
+
+async def _run_step(name: str, step: Callable[[], Awaitable], timeout: float):
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(step(), timeout)
+        result = StepResult(seconds=round(time.perf_counter() - started, 3), ok=True)
+        logger.info(f"Warm-up {name} done in {result.seconds * 1000:.0f} ms")
+    except Exception as e:
+        result = StepResult(seconds=round(time.perf_counter() - started, 3), ok=False, error=repr(e))
+        logger.warning(f"Warm-up {name} failed after {result.seconds * 1000:.0f} ms: {e!r}")
+    readiness.steps[name] = result
+
+
+async def warm_up(app: FastAPI):
+    conf = settings.warmup
+    readiness.ready = False
+    readiness.started_at = time.time()
+    started = time.perf_counter()
+
+    async def imports():
+        warm_imports()
+
+    async def schemas():
+        count = warm_schemas(app)
+        logger.info(f"Warm-up built {count} response model schemas")
+
+    steps: List[tuple[str, Callable[[], Awaitable]]] = [
+        ("db", lambda: warm_db(conf.db_connections)),
+        ("redis", lambda: warm_redis(app.state.redis, conf.redis_connections)),
+        ("ragflow", lambda: warm_ragflow(conf.ragflow_connections)),
+    ]
+    # 网络步骤互不依赖，并发执行；导入与 schema 构建占用 CPU，放在最后
+    await asyncio.gather(*(_run_step(name, step, conf.timeout_seconds) for name, step in steps))
+    await _run_step("imports", imports, conf.timeout_seconds)
+    await _run_step("schemas", schemas, conf.timeout_seconds)
+
+    readiness.seconds = round(time.perf_counter() - started, 3)
+    readiness.ready = True
+    logger.info(f"Warm-up finished in {readiness.seconds * 1000:.0f} ms, ready")
+
+
+async def check_ready(redis: Redis) -> Dict[str, bool]:
+    """
+    Live dependency checks behind `/readyz` once warm-up is over.
+    """
+    timeout = settings.warmup.check_timeout_seconds
+
+    async def db():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    checks = {"db": db(), "redis": redis.ping()}
+    results = await asyncio.gather(*(asyncio.wait_for(c, timeout) for c in checks.values()), return_exceptions=True)
+    return {name: not isinstance(r, BaseException) for name, r in zip(checks, results)}
@@ -1,17 +1,36 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from starlette.middleware.cors import CORSMiddleware
 
+from app.api.ops.routes import router as ops_router, root_router as ops_root_router, metrics_router
 from app.api.v1 import v1_router
+from app.core.db import engine
 from app.core.exception_handlers import register_exception_handlers
 from app.core.lifespan import lifespan
 from app.core.logging import setup_logging
+from app.core.metrics import instrument_engine
+from app.core.middleware import (
+    CompressionMiddleware,
+    MetricsMiddleware,
+    QueryProfilerMiddleware,
+    RateLimitHeadersMiddleware,
+    RequestContextMiddleware,
+    TracingMiddleware,
+    bind_route,
+    track_in_flight,
+)
+from app.core.profiling import install_query_profiler
 from app.core.settings import settings
+from app.core.tracing import configure_tracing, trace_engine
 
 # Setup logging
 setup_logging()
 
 # Initialize app
-app = FastAPI(title="RAGFlow Gateway", lifespan=lifespan)
+app = FastAPI(
+    title="RAGFlow Gateway",
+    lifespan=lifespan,
+    dependencies=[Depends(bind_route)] + ([Depends(track_in_flight)] if settings.metrics_enabled else []),
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,8 +43,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.ratelimit.enabled:
+    app.add_middleware(RateLimitHeadersMiddleware)
+
+if settings.compression.enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression.minimum_size,
+        encodings=settings.compression.encodings,
+        content_types=settings.compression.content_types,
+        gzip_level=settings.compression.gzip_level,
+        brotli_quality=settings.compression.brotli_quality,
+        zstd_level=settings.compression.zstd_level,
+    )
+
+if settings.metrics_enabled:
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+
+# 为每个请求开启 SQL 统计，内层的指标中间件读取同一份
+install_query_profiler(engine)
+app.add_middleware(QueryProfilerMiddleware, debug_headers=settings.debug)
+if settings.tracing.enabled:
+    configure_tracing()
+    trace_engine(engine)
+    app.add_middleware(TracingMiddleware, server_timing=settings.debug)
+
+# 日志上下文（request id）最先绑定，内层中间件的日志也能带上
+app.add_middleware(RequestContextMiddleware, access_log=settings.logging.access_log)
+
 # Exception handlers
 register_exception_handlers(app)
 
 # Routes
 app.include_router(v1_router)
+app.include_router(ops_router)
+app.include_router(ops_root_router)
+if settings.metrics_enabled:
+    app.include_router(metrics_router)
@@ -1,17 +1,20 @@
-from sqlalchemy import Column, Integer, Table, ForeignKey
+from sqlalchemy import Column, Integer, Index, Table, ForeignKey
 
 from app.core.db import Base
 
+# 复合主键服务正向查询（用户 -> 角色、角色 -> 权限），反向索引服务按角色 / 权限反查
 auth_user_roles = Table(
     "auth_user_roles",
     Base.metadata,
-    Column("user_id", Integer, ForeignKey("auth_users.id")),
-    Column("role_id", Integer, ForeignKey("auth_roles.id"))
+    Column("user_id", Integer, ForeignKey("auth_users.id"), primary_key=True),
+    Column("role_id", Integer, ForeignKey("auth_roles.id"), primary_key=True),
+    Index("idx_user_roles_role", "role_id", "user_id"),
 )
 
 auth_role_permissions = Table(
     "auth_role_permissions",
     Base.metadata,
-    Column("role_id", Integer, ForeignKey("auth_roles.id")),
-    Column("permission_id", Integer, ForeignKey("auth_permissions.id"))
+    Column("role_id", Integer, ForeignKey("auth_roles.id"), primary_key=True),
+    Column("permission_id", Integer, ForeignKey("auth_permissions.id"), primary_key=True),
+    Index("idx_role_permissions_permission", "permission_id", "role_id"),
 )
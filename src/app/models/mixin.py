@@ -1,6 +1,3 @@
-from datetime import datetime, UTC
-
-from pydantic import computed_field
 from sqlalchemy import Column, DateTime, func
 
 
@@ -17,17 +14,6 @@ class TimestampMixin:
         nullable=False,
     )
 
-    @computed_field
-    @property
-    def updated_at(self) -> datetime:
-        """
-        Return the 'updated_at' value safely without triggering lazy loading.
-
-        - If 'updated_at' has been explicitly set or loaded, return it.
-        - Otherwise, return a fallback value (e.g., current UTC time).
-
-        This avoids SQLAlchemy lazy-loading errors (MissingGreenlet) when
-        serializing the model for responses, and ensures a valid datetime
-        is always returned.
-        """
-        return self.__dict__.get("updated_at", datetime.now(UTC))
+    # 服务端生成的时间戳通过 INSERT/UPDATE ... RETURNING 立即回填，
+    # 序列化时不会因属性过期触发懒加载（异步会话下的 MissingGreenlet）
+    __mapper_args__ = {"eager_defaults": True}
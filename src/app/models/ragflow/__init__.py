@@ -1,7 +1,12 @@
-from .dataset import RagflowDatasetUser, RagflowDocumentUser
+from .dataset import RagflowDatasetUser, RagflowDocumentUser, RagflowQuotaUsage
+from .mirror import RagflowDataset, RagflowDocument, RagflowSyncState
 
 
 __all__ = [
     "RagflowDatasetUser",
     "RagflowDocumentUser",
+    "RagflowQuotaUsage",
+    "RagflowDataset",
+    "RagflowDocument",
+    "RagflowSyncState",
 ]
\ No newline at end of file
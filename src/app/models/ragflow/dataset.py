@@ -2,7 +2,7 @@ from datetime import datetime, timezone
 
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.schema import Column, ForeignKey, Index
-from sqlalchemy.sql.sqltypes import Integer, String, DateTime, Enum
+from sqlalchemy.sql.sqltypes import Integer, BigInteger, String, Date, DateTime, Enum
 
 from app.core.db import Base
 from app.models.mixin import TimestampMixin
@@ -21,15 +21,50 @@ class RagflowDatasetUser(TimestampMixin, Base):
     role = Column(Enum("owner", "editor", "viewer", name="dataset_user_role"), default="owner")  # owner / editor / viewer
     user = relationship("User", back_populates="dataset_relations")
 
+    # 本地镜像（无外键，RAGFlow 侧删除后镜像行可能先于关联行消失）
+    dataset = relationship(
+        "RagflowDataset",
+        primaryjoin="foreign(RagflowDatasetUser.dataset_id) == RagflowDataset.id",
+        viewonly=True,
+    )
+
 
 class RagflowDocumentUser(TimestampMixin, Base):
     __tablename__ = "ragflow_document_user"
     __table_args__ = (
         Index("idx_user_document", "user_id", "document_id"),
+        Index("idx_user_dataset_document", "user_id", "dataset_id", "document_id"),
     )
 
     id = Column(Integer, primary_key=True)
     document_id = Column(String, index=True, nullable=False)
+    dataset_id = Column(String, nullable=True)  # 所属知识库，便于按知识库限定可见文档
     user_id = Column(Integer, ForeignKey("auth_users.id"), nullable=False)
+    size = Column(BigInteger, nullable=False, default=0, server_default="0")  # 上传字节数，计入存储配额
 
     user = relationship("User", back_populates="document_relations")
+
+    document = relationship(
+        "RagflowDocument",
+        primaryjoin="foreign(RagflowDocumentUser.document_id) == RagflowDocument.id",
+        viewonly=True,
+    )
+
+
+class RagflowQuotaUsage(TimestampMixin, Base):
+    """
+    Daily snapshot of quota usage per subject ("user:{id}" / "dataset:{id}"), written by the
+    reconcile task: stored bytes and documents as counted from `RagflowDocumentUser`, and the
+    documents parsed that day as counted in Redis.
+    """
+    __tablename__ = "ragflow_quota_usage"
+    __table_args__ = (
+        Index("uq_quota_usage_subject_day", "subject", "day", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    subject = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    bytes = Column(BigInteger, nullable=False, default=0, server_default="0")
+    documents = Column(Integer, nullable=False, default=0, server_default="0")
+    parses = Column(Integer, nullable=False, default=0, server_default="0")
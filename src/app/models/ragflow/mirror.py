@@ -0,0 +1,77 @@
+from sqlalchemy.sql.schema import Column, Index
+from sqlalchemy.sql.sqltypes import Integer, BigInteger, String, Text, Float, DateTime
+
+from app.core.db import Base
+from app.models.mixin import TimestampMixin
+
+
+class RagflowDataset(TimestampMixin, Base):
+    """
+    Local mirror of RAGFlow dataset metadata, kept fresh by the periodic sync task.
+    Column names follow `ragflow_async_sdk.models.Dataset`.
+    """
+    __tablename__ = "ragflow_datasets"
+
+    id = Column(String, primary_key=True)
+    name = Column(String, index=True, nullable=False)
+    status = Column(String)
+    permission = Column(String)
+    document_count = Column(Integer)
+    chunk_count = Column(Integer)
+    token_num = Column(BigInteger)
+    create_time = Column(BigInteger, index=True)
+    create_date = Column(String)
+    update_time = Column(BigInteger, index=True)
+    update_date = Column(String)
+    avatar = Column(Text)
+    description = Column(Text)
+    language = Column(String)
+    embedding_model = Column(String)
+    chunk_method = Column(String)
+
+
+class RagflowDocument(TimestampMixin, Base):
+    """
+    Local mirror of RAGFlow document metadata.
+    Column names follow `ragflow_async_sdk.models.Document`.
+    """
+    __tablename__ = "ragflow_documents"
+    __table_args__ = (
+        Index("idx_document_dataset_update", "dataset_id", "update_time"),
+        Index("idx_document_dataset_suffix", "dataset_id", "suffix"),
+    )
+
+    id = Column(String, primary_key=True)
+    dataset_id = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    type = Column(String)
+    location = Column(String)
+    status = Column(String)
+    run = Column(String)
+    suffix = Column(String)
+    size = Column(BigInteger)
+    created_by = Column(String)
+    create_time = Column(BigInteger)
+    create_date = Column(String)
+    update_time = Column(BigInteger)
+    update_date = Column(String)
+    chunk_method = Column(String)
+    chunk_count = Column(Integer)
+    token_count = Column(BigInteger)
+    thumbnail = Column(Text)
+    pipeline_id = Column(String)
+    progress = Column(Float)
+    progress_msg = Column(Text)
+    enabled = Column(Integer)
+
+
+class RagflowSyncState(Base):
+    """
+    Incremental sync watermark per scope ("datasets" or "documents:{dataset_id}").
+    """
+    __tablename__ = "ragflow_sync_state"
+
+    scope = Column(String, primary_key=True)
+    watermark = Column(BigInteger, nullable=False, default=0)  # max update_time seen (ms)
+    synced_at = Column(DateTime(timezone=True))
+    full_synced_at = Column(DateTime(timezone=True))
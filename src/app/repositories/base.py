@@ -1,6 +1,8 @@
 """
 Base Repositories
 """
+import functools
+import inspect as pyinspect
 import warnings
 from typing import Type, TypeVar, List, Tuple, Generic, Any, Optional
 
@@ -10,16 +12,47 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.interfaces import LoaderOption
 
 from app.core.db import Base
+from app.core.entity_cache import entity_cache
 from app.core.exceptions import NotFoundError
+from app.core.tracing import tracer
 
 T = TypeVar("T", bound=Base)
 
 
+def _traced_repo_method(name: str, func):
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        if not tracer.enabled:
+            return await func(self, *args, **kwargs)
+        with tracer.start_span(f"{type(self).__name__}.{name}", stage="db",
+                               attributes={"db.model": self.model.__name__}):
+            return await func(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _trace_public_methods(cls):
+    """
+    Wrap the public coroutine methods defined on `cls` in a `db` stage span.
+    """
+    for name, attr in list(vars(cls).items()):
+        if not name.startswith("_") and pyinspect.iscoroutinefunction(attr):
+            setattr(cls, name, _traced_repo_method(name, attr))
+    return cls
+
+
 # noinspection PyMethodMayBeStatic,PyUnusedLocal
 
+@_trace_public_methods
 class BaseRepo(Generic[T]):
     model: Type[T]
     pk_column: Column
+    # 设置后 get_by_pk / get_by_pks（无预加载时）经 Redis 读穿透缓存，单位秒
+    cache_ttl: Optional[int] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _trace_public_methods(cls)
 
     def __init__(self, model: Type[T] = None):
         self.model = model or getattr(self, "model", None)
@@ -37,6 +70,26 @@ class BaseRepo(Generic[T]):
             )
 
         self.pk_column = pk_columns[0]
+        if self.cache_ttl:
+            entity_cache.register(self.model)
+
+    def _cacheable(self, preload_options: Optional[List[LoaderOption]]) -> bool:
+        return bool(self.cache_ttl) and not preload_options and entity_cache.enabled
+
+    async def _get_cached(self, db: AsyncSession, pks: List[int | str]) -> List[T]:
+        """
+        Rows for `pks` from the entity cache, the misses from the database (then cached).
+        """
+        lookup = await entity_cache.get_many(db, self.model, pks)
+        found = lookup.found
+        missing = [pk for pk in pks if pk not in found]
+        if missing:
+            result = await db.execute(select(self.model).where(self.pk_column.in_(missing)))
+            loaded: List[T] = result.scalars().all()  # type: ignore
+            if loaded:
+                await entity_cache.set_many(self.model, loaded, self.cache_ttl, lookup)
+            found.update((getattr(o, self.pk_column.key), o) for o in loaded)
+        return [found[pk] for pk in dict.fromkeys(pks) if pk in found]
 
     async def get_by_unique_field(
             self,
@@ -79,8 +132,14 @@ class BaseRepo(Generic[T]):
             raise_not_found: bool = True
     ) -> Optional[T]:
         """
-        Get an object by its primary key, using get_by_unique_field internally.
+        Get an object by its primary key, using get_by_unique_field internally
+        (or the entity cache when the repository opts in and nothing is preloaded).
         """
+        if self._cacheable(preload_options):
+            objs = await self._get_cached(db, [pk])
+            if not objs and raise_not_found:
+                raise NotFoundError(f"{self.model.__name__} with {self.pk_column.key}={pk} not found.")
+            return objs[0] if objs else None
         return await self.get_by_unique_field(
             db=db,
             field_name=self.pk_column.key,  # or self.pk_column.name depending on ORM setup
@@ -98,11 +157,14 @@ class BaseRepo(Generic[T]):
     ) -> List[T]:
         if not pks:
             return []
-        stmt = select(self.model).where(self.pk_column.in_(pks))
-        if preload_options:
-            stmt = stmt.options(*preload_options)
-        result = await db.execute(stmt)
-        objs: List[T] = result.scalars().all()  # type: ignore
+        if self._cacheable(preload_options):
+            objs = await self._get_cached(db, pks)
+        else:
+            stmt = select(self.model).where(self.pk_column.in_(pks))
+            if preload_options:
+                stmt = stmt.options(*preload_options)
+            result = await db.execute(stmt)
+            objs: List[T] = result.scalars().all()  # type: ignore
         if raise_not_found:
             missing = set(pks) - {getattr(o, self.pk_column.name) for o in objs}
             if missing:
@@ -213,6 +275,26 @@ class BaseRepo(Generic[T]):
         result = await db.execute(stmt)
         return result.scalar_one()
 
+    async def get_version(self, db: AsyncSession, filters: Optional[dict] = None) -> Tuple[Any, ...]:
+        """
+        A cheap version stamp of the (filtered) table: row count, max primary key and,
+        for models with `updated_at`, its max. Any insert, delete or update changes it,
+        so it can stand in for the payload when computing an ETag.
+
+        Args:
+            db: AsyncSession
+            filters: same filters as `get_paged`
+
+        Returns:
+            Tuple[Any, ...]
+        """
+        columns = [func.count(self.pk_column), func.max(self.pk_column)]
+        if "updated_at" in inspect(self.model).columns:
+            columns.append(func.max(self.model.updated_at))
+        stmt = self._apply_filters(select(*columns), filters)
+        result = await db.execute(stmt)
+        return tuple(result.one())
+
     async def create(self, db: AsyncSession, obj: T) -> T:
         db.add(obj)
         return obj
@@ -247,7 +329,9 @@ class BaseRepo(Generic[T]):
         if op == "eq":
             return column == value
         if op == "like":
-            return column.like(f"%{value}%")
+            # 关键字按字面匹配且不区分大小写：转义通配符 % 和 _
+            escaped = str(value).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            return column.ilike(f"%{escaped}%", escape="\\")
         if op == "in":
             if isinstance(value, str):
                 value = value.split(",")
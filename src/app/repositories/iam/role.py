@@ -3,9 +3,11 @@ from typing import Optional
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.settings import settings
 from app.models import Role
 from app.repositories.base import BaseRepo
 
 
 class RoleRepo(BaseRepo[Role]):
     model = Role
+    cache_ttl = settings.cache.entity_ttl_seconds
@@ -1,14 +1,17 @@
 from typing import List, Optional
 
+from sqlalchemy import delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.core.settings import settings
 from app.models import User, Role, auth_user_roles
 from app.repositories.base import BaseRepo
 
 
 class UserRepo(BaseRepo[User]):
     model = User
+    cache_ttl = settings.cache.entity_ttl_seconds
 
     async def create_user(
             self,
@@ -46,6 +49,8 @@ class UserRepo(BaseRepo[User]):
             load_permissions: bool = False
     ) -> Optional[User]:
         preload_options = self._make_preload_options(load_roles, load_permissions)
+        if not preload_options:
+            return await self.get_by_pk(db, user_id)
         return await self.get_by_unique_field(
             db=db,
             field_name=self.pk_column.key,
@@ -85,9 +90,29 @@ class UserRepo(BaseRepo[User]):
         return user
 
     async def delete_batch(self, db: AsyncSession, user_ids: List[int], hard_delete: bool = False) -> List[User]:
-        deleted_users = []
-        for uid in user_ids:
-            user = await self.delete(db, uid, hard_delete=hard_delete)
-            if user:
-                deleted_users.append(user)
-        return deleted_users
\ No newline at end of file
+        """
+        Delete many users with set-based statements instead of one round trip per user.
+        Ids that do not exist are ignored.
+
+        Args:
+            db: AsyncSession
+            user_ids: ids of the users to delete
+            hard_delete: remove the rows (and role links) instead of deactivating them
+
+        Returns:
+            List[User]: the affected users
+        """
+        if not user_ids:
+            return []
+        if hard_delete:
+            await db.execute(auth_user_roles.delete().where(auth_user_roles.c.user_id.in_(user_ids)))
+            stmt = delete(User).where(User.id.in_(user_ids)).returning(User)
+        else:
+            stmt = (
+                update(User)
+                .where(User.id.in_(user_ids))
+                .values(is_active=False)
+                .returning(User)
+            )
+        result = await db.scalars(stmt)
+        return list(result.all())
@@ -0,0 +1,13 @@
+from .mirror import RagflowDatasetRepo, RagflowDocumentRepo, RagflowSyncStateRepo
+from .ownership import RagflowDatasetUserRepo, RagflowDocumentUserRepo
+from .quota import RagflowQuotaUsageRepo
+
+
+__all__ = [
+    "RagflowDatasetRepo",
+    "RagflowDocumentRepo",
+    "RagflowSyncStateRepo",
+    "RagflowDatasetUserRepo",
+    "RagflowDocumentUserRepo",
+    "RagflowQuotaUsageRepo",
+]
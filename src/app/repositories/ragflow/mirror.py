@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Iterable, Tuple
+
+from sqlalchemy import all_, bindparam, delete, func, or_, select, String
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.ragflow import RagflowDataset, RagflowDocument, RagflowSyncState
+from app.repositories.base import BaseRepo, T
+
+
+def not_in_array(column, values: Iterable[str]):
+    """
+    `column <> ALL(:values)` binds the ids as one array parameter instead of one parameter per id.
+    """
+    return column != all_(bindparam(None, list(values), type_=ARRAY(String)))
+
+
+class MirrorRepo(BaseRepo[T]):
+    """
+    Shared upsert / prune helpers of the RAGFlow mirror tables.
+    """
+
+    async def upsert_many(self, db: AsyncSession, rows: List[dict]) -> int:
+        if not rows:
+            return 0
+        columns = {c.name for c in self.model.__table__.columns} - {"created_at", "updated_at"}
+        values = [{k: v for k, v in row.items() if k in columns} for row in rows]
+
+        stmt = insert(self.model).values(values)
+        changed = [c for c in columns if c != self.pk_column.name]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.pk_column.name],
+            set_={
+                **{c: stmt.excluded[c] for c in changed},
+                "updated_at": func.now(),
+            },
+            # 内容未变的行不改写，updated_at 因此可作为版本号（ETag）
+            where=or_(*(self.model.__table__.c[c].is_distinct_from(stmt.excluded[c]) for c in changed)),
+        )
+        await db.execute(stmt)
+        return len(values)
+
+    async def get_paged_within(
+            self,
+            db: AsyncSession,
+            ids_subquery,
+            *,
+            page: int = 1,
+            page_size: int = 10,
+            filters: Optional[dict] = None,
+            order_by: Optional[str] = None,
+            desc_order: bool = False,
+    ) -> Tuple[List[T], int]:
+        """
+        Like `get_paged`, restricted to primary keys returned by `ids_subquery`
+        (a semi-join, so duplicate grants do not duplicate rows).
+        """
+        condition = self.pk_column.in_(ids_subquery)
+
+        count_stmt = select(func.count(self.pk_column)).where(condition)
+        count_stmt = self._apply_filters(count_stmt, filters)
+        total = (await db.execute(count_stmt)).scalar_one()
+
+        stmt = select(self.model).where(condition)
+        stmt = self._apply_filters(stmt, filters)
+        stmt = self._apply_ordering(stmt, order_by, desc_order)
+        stmt = self._apply_pagination(stmt, page, page_size)
+        items: List[T] = (await db.execute(stmt)).scalars().all()  # type: ignore
+        return items, total
+
+    async def delete_ids(self, db: AsyncSession, ids: List[str]) -> int:
+        result = await db.execute(delete(self.model).where(self.pk_column.in_(ids)))
+        return result.rowcount
+
+    async def delete_missing(self, db: AsyncSession, keep_ids: Iterable[str], **scope) -> int:
+        """
+        Delete mirrored rows (optionally within a scope such as dataset_id) that are not in `keep_ids`.
+        """
+        stmt = delete(self.model).where(not_in_array(self.pk_column, keep_ids))
+        for key, value in scope.items():
+            stmt = stmt.where(getattr(self.model, key) == value)
+        result = await db.execute(stmt)
+        return result.rowcount
+
+
+class RagflowDatasetRepo(MirrorRepo[RagflowDataset]):
+    model = RagflowDataset
+
+    async def get_all_ids(self, db: AsyncSession) -> List[str]:
+        result = await db.execute(select(RagflowDataset.id))
+        return list(result.scalars().all())
+
+
+class RagflowDocumentRepo(MirrorRepo[RagflowDocument]):
+    model = RagflowDocument
+
+    async def delete_outside_datasets(self, db: AsyncSession, dataset_ids: Iterable[str]) -> int:
+        stmt = delete(RagflowDocument).where(not_in_array(RagflowDocument.dataset_id, dataset_ids))
+        result = await db.execute(stmt)
+        return result.rowcount
+
+
+class RagflowSyncStateRepo(BaseRepo[RagflowSyncState]):
+    model = RagflowSyncState
+
+    async def get_state(self, db: AsyncSession, scope: str) -> Optional[RagflowSyncState]:
+        return await self.get_or_none(db, field_name="scope", value=scope)
+
+    async def save(self, db: AsyncSession, scope: str, watermark: int, full: bool = False):
+        now = datetime.now(timezone.utc)
+        values = {"scope": scope, "watermark": watermark, "synced_at": now}
+        if full:
+            values["full_synced_at"] = now
+        stmt = insert(RagflowSyncState).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["scope"],
+            set_={k: v for k, v in values.items() if k != "scope"},
+        )
+        await db.execute(stmt)
+
+    async def delete_scopes(self, db: AsyncSession, scopes: List[str]):
+        if scopes:
+            await db.execute(delete(RagflowSyncState).where(RagflowSyncState.scope.in_(scopes)))
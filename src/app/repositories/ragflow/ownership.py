@@ -0,0 +1,99 @@
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, exists, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.ragflow import RagflowDatasetUser, RagflowDocumentUser, RagflowDocument, RagflowSyncState
+from app.repositories.base import BaseRepo
+
+
+class RagflowDatasetUserRepo(BaseRepo[RagflowDatasetUser]):
+    model = RagflowDatasetUser
+
+    async def list_dataset_ids(self, db: AsyncSession, user_id: int) -> List[str]:
+        """
+        Dataset ids visible to a user, newest grant first.
+        Filters and projects on (user_id, dataset_id) only, so `idx_user_dataset` serves it.
+        """
+        stmt = (
+            select(RagflowDatasetUser.dataset_id)
+            .where(RagflowDatasetUser.user_id == user_id)
+            .order_by(RagflowDatasetUser.id.desc())
+        )
+        result = await db.execute(stmt)
+        return list(dict.fromkeys(result.scalars().all()))
+
+    @staticmethod
+    def owned_ids_subquery(user_id: int):
+        return select(RagflowDatasetUser.dataset_id).where(RagflowDatasetUser.user_id == user_id)
+
+
+class RagflowDocumentUserRepo(BaseRepo[RagflowDocumentUser]):
+    model = RagflowDocumentUser
+
+    async def list_document_ids(self, db: AsyncSession, user_id: int) -> List[tuple[str, str]]:
+        """
+        (dataset_id, document_id) pairs owned by a user, newest first.
+        Only indexed columns are read, so `idx_user_dataset_document` covers the lookup.
+        """
+        stmt = (
+            select(RagflowDocumentUser.dataset_id, RagflowDocumentUser.document_id)
+            .where(RagflowDocumentUser.user_id == user_id)
+            .order_by(RagflowDocumentUser.id.desc())
+        )
+        result = await db.execute(stmt)
+        return [(row.dataset_id, row.document_id) for row in result.all()]
+
+    @staticmethod
+    def owned_ids_subquery(user_id: int):
+        return select(RagflowDocumentUser.document_id).where(RagflowDocumentUser.user_id == user_id)
+
+    async def add_owned(
+            self, db: AsyncSession, user_id: int, dataset_id: str, document_ids: List[str],
+            sizes: Optional[List[int]] = None,
+    ):
+        sizes = sizes or [0] * len(document_ids)
+        await self.bulk_create(db, [
+            RagflowDocumentUser(user_id=user_id, dataset_id=dataset_id, document_id=document_id, size=size)
+            for document_id, size in zip(document_ids, sizes)
+        ])
+
+    async def delete_owned(self, db: AsyncSession, dataset_id: str, document_ids: List[str]) -> List[int]:
+        """
+        Remove ownership of deleted documents; returns the users who owned any of them.
+        """
+        stmt = (
+            delete(RagflowDocumentUser)
+            .where(RagflowDocumentUser.dataset_id == dataset_id, RagflowDocumentUser.document_id.in_(document_ids))
+            .returning(RagflowDocumentUser.user_id)
+        )
+        result = await db.execute(stmt)
+        return sorted(set(result.scalars().all()))
+
+    @staticmethod
+    def live_condition():
+        """
+        Rows whose document still exists: present in the mirror, or not yet covered by a full
+        mirror sync of its dataset (uploads newer than the last full sync count until it runs).
+        """
+        scope = func.concat("documents:", RagflowDocumentUser.dataset_id)
+        return or_(
+            exists().where(RagflowDocument.id == RagflowDocumentUser.document_id),
+            ~exists().where(
+                RagflowSyncState.scope == scope,
+                RagflowSyncState.full_synced_at > RagflowDocumentUser.created_at,
+            ),
+        )
+
+    async def usage_by(self, db: AsyncSession, column: str) -> Dict[str, Tuple[int, int]]:
+        """
+        Stored (bytes, documents) of live documents grouped by `user_id` or `dataset_id`.
+        """
+        key = getattr(RagflowDocumentUser, column)
+        stmt = (
+            select(key, func.coalesce(func.sum(RagflowDocumentUser.size), 0), func.count())
+            .where(key.is_not(None), self.live_condition())
+            .group_by(key)
+        )
+        result = await db.execute(stmt)
+        return {str(k): (int(size), int(count)) for k, size, count in result.all()}
@@ -0,0 +1,37 @@
+from datetime import date
+from typing import Dict, List
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.ragflow import RagflowQuotaUsage
+from app.repositories.base import BaseRepo
+
+
+class RagflowQuotaUsageRepo(BaseRepo[RagflowQuotaUsage]):
+    model = RagflowQuotaUsage
+
+    async def list_day(self, db: AsyncSession, day: date) -> Dict[str, RagflowQuotaUsage]:
+        result = await db.execute(select(RagflowQuotaUsage).where(RagflowQuotaUsage.day == day))
+        return {row.subject: row for row in result.scalars().all()}
+
+    async def upsert_day(self, db: AsyncSession, day: date, rows: List[dict]) -> int:
+        """
+        Upsert one day's usage rows (`subject` plus any of bytes / documents / parses);
+        columns a row does not carry keep their stored value.
+        """
+        count = 0
+        # 按列集合分组，每组一条语句
+        groups: Dict[tuple, List[dict]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(k for k in row if k != "subject")), []).append(row)
+        for columns, group in groups.items():
+            stmt = insert(RagflowQuotaUsage).values([{**row, "day": day} for row in group])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["subject", "day"],
+                set_={**{c: stmt.excluded[c] for c in columns}, "updated_at": func.now()},
+            )
+            await db.execute(stmt)
+            count += len(group)
+        return count
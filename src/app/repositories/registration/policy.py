@@ -14,6 +14,11 @@ class InviteCodeRepo(BaseRepo[InviteCode]):
     def __init__(self):
         super().__init__(InviteCode)
 
+    @classmethod
+    async def get_for_update(cls, db: AsyncSession, code: str) -> Optional[InviteCode]:
+        # 行锁至事务结束，并发注册不会重复使用同一邀请码
+        return await db.scalar(select(InviteCode).where(InviteCode.code == code).with_for_update())
+
     @classmethod
     async def mark_used(cls, db: AsyncSession, invite: InviteCode, user_id: int):
         invite.used = True
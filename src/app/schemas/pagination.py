@@ -1,11 +1,10 @@
 from typing import Generic, TypeVar, Optional, List
 from pydantic import BaseModel, Field
-from pydantic.generics import GenericModel
 
 T = TypeVar("T")
 
 
-class PageData(GenericModel, Generic[T]):
+class PageData(BaseModel, Generic[T]):
     """
     分页定义
     """
@@ -1,11 +1,10 @@
 from typing import Generic, TypeVar, Optional, List
 from pydantic import BaseModel, Field
-from pydantic.generics import GenericModel
 
 T = TypeVar("T")
 
 
-class Response(GenericModel, Generic[T]):
+class Response(BaseModel, Generic[T]):
     """
     接口返回定义
     """
@@ -1,13 +1,12 @@
-from datetime import timedelta
-
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.exceptions import UnauthorizedError
+from app.core.exceptions import UnauthorizedError, TokenInvalidError
 from app.core.jwt import create_access_token, create_refresh_token, verify_token
-from app.core.security import pwd_context
-from app.core.settings import settings
+from app.core.security import get_password_context
 from app.models import User
 from app.repositories.iam import UserRepo
+from app.services.auth.tokens import TokenFamilyStore, RefreshTokenReuseError
 from app.services.base import BaseService
 
 
@@ -15,29 +14,70 @@ class LoginService(BaseService[User]):
     repo = UserRepo()
     model = User
 
+    def __init__(self, db: AsyncSession, redis: Redis):
+        super().__init__(db)
+        self.families = TokenFamilyStore(redis)
+
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+        return get_password_context().verify(plain_password, hashed_password)
 
     async def authenticate(self, db: AsyncSession, username: str, password: str) -> User | None:
-        user = await self.repo.get_by_username(db, username)
+        user = await self.repo.get_by_username(db, username, load_roles=True, load_permissions=True)
         if user and self.verify_password(password, user.password):
             return user
         return None
 
+    @staticmethod
+    def _issue(user: User, family: str, jti: str) -> dict[str, str]:
+        """
+        `user` must have roles and their permissions loaded, they go into the access token.
+        """
+        access_token = create_access_token(
+            user.id,
+            family=family,
+            permissions={p.name for r in user.roles for p in r.permissions},
+            roles=[r.name for r in user.roles],
+            superuser=user.is_superuser,
+        )
+        return {
+            "access_token": access_token,
+            "refresh_token": create_refresh_token(user.id, family, jti),
+            "token_type": "bearer",
+        }
+
     async def login(self, username: str, password: str) -> dict[str, str]:
         user = await self.authenticate(self.db, username, password)
         if not user:
             raise UnauthorizedError()
-        access_token = create_access_token(user.id)
-        refresh_token = create_refresh_token(user.id)
-        return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+        family, jti = await self.families.start(user.id)
+        return self._issue(user, family, jti)
 
-    @staticmethod
-    async def refresh_token(refresh_token: str) -> dict[str, str]:
-        payload = verify_token(refresh_token)
-        if not payload or payload.get("type") != "refresh":
-            raise UnauthorizedError("Token invalid or expired")
-        user_id = payload["sub"]
-        access_token = create_access_token(user_id, timedelta(days=settings.refresh_token_expire_days))
-        return {"access_token": access_token, "token_type": "bearer"}
+    async def refresh_token(self, refresh_token: str) -> dict[str, str]:
+        """
+        Rotate: the presented refresh token is spent, a new pair is issued in the same family
+        with the user's current roles and permissions.
+        """
+        payload = verify_token(refresh_token, expected_type="refresh")
+        family, jti = payload.get("fam"), payload.get("jti")
+        if not family or not jti:
+            # 轮换上线前签发的刷新令牌，需重新登录
+            raise TokenInvalidError()
+        try:
+            new_jti = await self.families.rotate(family, jti)
+        except RefreshTokenReuseError:
+            raise TokenInvalidError("Refresh token reuse detected, please log in again")
+        if new_jti is None:
+            raise TokenInvalidError("Refresh token revoked or expired")
+        # 重新读取角色与权限，使新访问令牌反映最新授权
+        user = await self.repo.get_by_id(self.db, int(payload["sub"]), load_roles=True, load_permissions=True)
+        if not user:
+            raise TokenInvalidError("User not found")
+        return self._issue(user, family, new_jti)
+
+    async def logout(self, payload: dict):
+        """
+        Revoke the token family the (access or refresh) token belongs to.
+        """
+        if payload.get("fam"):
+            await self.families.revoke(payload["fam"])
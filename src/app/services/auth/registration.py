@@ -19,7 +19,7 @@ class RegistrationService(BaseService[User]):
     model = User
 
     async def validate_invite_code(self, code: str) -> InviteCode:
-        invite = await self.invite_code_repo.get_by_pk(self.db, code)
+        invite = await self.invite_code_repo.get_for_update(self.db, code)
         if not invite:
             raise ConflictError("邀请码不存在")
         if invite.used:
@@ -32,13 +32,13 @@ class RegistrationService(BaseService[User]):
         return ''.join(choice(chars) for _ in range(length))
 
     async def create_invite_codes(self, count: int, length: int = 12) -> List[InviteCode]:
-        codes: List[InviteCode] = []
+        codes: set[str] = set()
         while len(codes) < count:
-            code = self.generate_invite_code(length)
-            exists = await self.invite_code_repo.get_by_pk(self.db, code)
-            if not exists:
-                codes.append(InviteCode(code=code))
-        objs = await self.invite_code_repo.bulk_create(self.db, codes)
+            # 一次查询过滤整批候选码中已存在的，冲突极少，通常一轮即可
+            candidates = {self.generate_invite_code(length) for _ in range(count - len(codes))} - codes
+            existing = await self.invite_code_repo.get_by_pks(self.db, list(candidates), raise_not_found=False)
+            codes |= candidates - {c.code for c in existing}
+        objs = await self.invite_code_repo.bulk_create(self.db, [InviteCode(code=c) for c in codes])
         await self.db.commit()
         return objs
 
@@ -0,0 +1,91 @@
+import logging
+import time
+from typing import Optional, Tuple
+
+from redis.asyncio import Redis
+
+from app.core.jwt import new_jti
+from app.core.metrics import REFRESH_TOKEN_REUSE
+from app.core.revocation import revocation_list
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# 原子轮换：只有当前有效的 jti 才能换出下一个；旧 jti 再次出现即判定为重放，整族作废
+ROTATE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'current')
+if not current then
+    return 0
+end
+if current ~= ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return -1
+end
+redis.call('HSET', KEYS[1], 'current', ARGV[2], 'rotated_at', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+class RefreshTokenReuseError(Exception):
+    def __init__(self, family: str, user_id: Optional[str]):
+        super().__init__(f"Refresh token reuse detected in family {family}")
+        self.family = family
+        self.user_id = user_id
+
+
+class TokenFamilyStore:
+    """
+    Redis-backed refresh token families.
+
+    Every login starts a family; each refresh rotates it to a new `jti` and only the
+    latest one may be used. Presenting an already rotated token means it was copied, so
+    the whole family is revoked, including the access tokens issued from it.
+
+    Layout:
+        auth:family:{family}  hash: user_id, current (jti), created_at, rotated_at
+    """
+
+    PREFIX = "auth:family:"
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.ttl = settings.refresh_token_expire_days * 24 * 60 * 60
+        # 吊销族之后，已签发的访问令牌最多还能存活这么久
+        self.access_ttl = settings.access_token_expire_minutes * 60
+
+    def _key(self, family: str) -> str:
+        return f"{self.PREFIX}{family}"
+
+    async def start(self, user_id: int | str) -> Tuple[str, str]:
+        family, jti = new_jti(), new_jti()
+        now = str(time.time())
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._key(family), mapping={
+                "user_id": str(user_id), "current": jti, "created_at": now, "rotated_at": now,
+            })
+            pipe.expire(self._key(family), self.ttl)
+            await pipe.execute()
+        return family, jti
+
+    async def rotate(self, family: str, jti: str) -> Optional[str]:
+        """
+        Swap `jti` for a new one. Returns None for unknown (expired / revoked) families,
+        raises `RefreshTokenReuseError` when `jti` is not the family's current token.
+        """
+        key = self._key(family)
+        user_id = await self.redis.hget(key, "user_id")
+        new = new_jti()
+        result = int(await self.redis.eval(ROTATE_SCRIPT, 1, key, jti, new, self.ttl, str(time.time())))
+        if result == 0:
+            return None
+        if result < 0:
+            REFRESH_TOKEN_REUSE.inc()
+            logger.warning(f"Refresh token reuse detected, revoking family {family} of user {user_id}")
+            await revocation_list.revoke(self.redis, family, ttl=self.access_ttl)
+            raise RefreshTokenReuseError(family, user_id)
+        return new
+
+    async def revoke(self, family: str):
+        await self.redis.delete(self._key(family))
+        await revocation_list.revoke(self.redis, family, ttl=self.access_ttl)
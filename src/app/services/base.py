@@ -61,6 +61,9 @@ class BaseService(Generic[T]):
         )
         return items, total
 
+    async def get_version(self, filters: dict | None = None) -> Tuple:
+        return await self.repo.get_version(self.db, filters=filters)
+
     async def check_before_create(self, data: dict):
         """
         Hook method for pre creation check
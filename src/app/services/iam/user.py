@@ -5,11 +5,14 @@ from typing import List, Optional, Dict
 from sqlalchemy.orm import selectinload
 
 from app.api.v1.iam.schemas import CreateUserRequest
+from app.core.cache import cached
 from app.core.exceptions import ConflictError, NotFoundError, ServiceValidationError
-from app.core.security import pwd_context
+from app.core.security import get_password_context
+from app.core.settings import settings
 from app.models import User, Role, auth_user_roles
 from app.repositories.iam.role import RoleRepo
 from app.repositories.iam.user import UserRepo
+from app.schemas.iam.role import RoleOut
 from app.services.base import BaseService
 
 
@@ -43,7 +46,7 @@ class UserService(BaseService[User]):
 
         attrs = self._prepare_create_data(data)
         password = attrs["password"]
-        hashed_password = pwd_context.hash(password)
+        hashed_password = get_password_context().hash(password)
         user.password = hashed_password
 
         roles = roles or []
@@ -56,12 +59,18 @@ class UserService(BaseService[User]):
 
         return user
 
-    async def list_roles_for_user(self, user_id: int) -> List[Role]:
+    @cached("iam:user_roles", ttl=settings.cache.iam_ttl_seconds, key="{user_id}", background_refresh=False)
+    async def list_roles_for_user(self, user_id: int) -> List[RoleOut]:
         user = await self.repo.get_by_pk(self.db, user_id, preload_options=[selectinload(User.roles)])
-        return user.roles if user else []
+        return [RoleOut.model_validate(r) for r in user.roles] if user else []
 
     async def assign_roles(self, user_id: int, role_ids: List[int], commit: bool = True) -> List[Role]:
-        """Assign roles to a user, overwrite existing ones"""
+        """
+        Assign roles to a user, overwrite existing ones.
+
+        With `commit=False` the cached role list is left alone: the caller must call
+        `list_roles_for_user.invalidate(user_id)` after its own commit.
+        """
         user = await self.repo.get_by_pk(self.db, user_id)
         if not user:
             raise NotFoundError(f"User with ID '{user_id}' not found")
@@ -84,6 +93,8 @@ class UserService(BaseService[User]):
 
         if commit:
             await self.db.commit()
+            # 提交前失效会让并发读取把旧角色重新回填进缓存
+            await self.list_roles_for_user.invalidate(user_id)
         return roles
 
     async def disable_users(self, user_ids: List[int], current_user_id: int, disable: bool = True, commit: bool = True):
@@ -135,7 +146,7 @@ class UserService(BaseService[User]):
     #     elif not new_password:
     #         raise ValueError("Must provide a new password if not generating randomly")
     #
-    #     user.password = pwd_context.hash(new_password)
+    #     user.password = get_password_context().hash(new_password)
     #     self.db.add(user)
     #
     #     if commit:
@@ -0,0 +1,8 @@
+from .access import AccessScope, RagflowAccessService
+from .jobs import JobStore
+
+__all__ = [
+    "AccessScope",
+    "RagflowAccessService",
+    "JobStore",
+]
@@ -0,0 +1,86 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.constants.roles import SystemRoles
+from app.core.cache import cached
+from app.core.ragflow import sdk_models
+from app.core.settings import settings
+from app.models.ragflow import RagflowDatasetUser
+from app.repositories.iam import UserRepo
+from app.repositories.ragflow import RagflowDatasetUserRepo, RagflowDocumentRepo, RagflowDocumentUserRepo
+from app.services.base import BaseService
+from app.services.ragflow.mirror import entity_to_row
+
+
+@dataclass
+class AccessScope:
+    """
+    What a user may list: everything (admins / superusers), or the datasets granted
+    through `RagflowDatasetUser` plus the documents owned through `RagflowDocumentUser`.
+    """
+    user_id: int
+    unrestricted: bool = False
+    dataset_ids: List[str] = field(default_factory=list)
+    documents: Dict[str, List[str]] = field(default_factory=dict)  # dataset_id -> document ids
+
+    def can_list_dataset(self, dataset_id: str) -> bool:
+        return self.unrestricted or dataset_id in self.dataset_ids
+
+
+class RagflowAccessService(BaseService[RagflowDatasetUser]):
+    """
+    Resolves a user's visible dataset / document ids from the local ownership tables
+    (cached per user) and keeps those tables and the document mirror in step with uploads
+    and deletes. Restricted listings are read from the mirror (`RagflowMirrorService` with
+    `owner_id`), where ownership is an indexed semi-join with exact totals.
+    """
+    repo = RagflowDatasetUserRepo()
+    document_user_repo = RagflowDocumentUserRepo()
+    document_repo = RagflowDocumentRepo()
+    user_repo = UserRepo()
+    model = RagflowDatasetUser
+
+    # ---------- scope ----------
+
+    # 加载依赖请求内的数据库会话，不做后台刷新
+    @cached("ragflow:acl", ttl=settings.ragflow.acl_cache_ttl_seconds, key="{user_id}", background_refresh=False)
+    async def get_scope(self, user_id: int) -> AccessScope:
+        user = await self.user_repo.get_by_id(self.db, user_id, load_roles=True)
+        scope = AccessScope(user_id=user_id)
+        if user.is_superuser or SystemRoles.ADMIN in {r.name for r in user.roles}:
+            scope.unrestricted = True
+        else:
+            scope.dataset_ids = await self.repo.list_dataset_ids(self.db, user_id)
+            for dataset_id, document_id in await self.document_user_repo.list_document_ids(self.db, user_id):
+                scope.documents.setdefault(dataset_id, []).append(document_id)
+        return scope
+
+    async def invalidate(self, user_id: int):
+        await self.get_scope.invalidate(user_id)
+
+    async def record_uploaded(
+            self, user_id: int, dataset_id: str, documents: List["sdk_models.Document"],
+            sizes: Optional[List[int]] = None,
+    ):
+        """
+        Record ownership of uploaded documents and mirror them right away, so the uploader's
+        listing shows them before the next sync.
+        """
+        await self.document_user_repo.add_owned(self.db, user_id, dataset_id, [d.id for d in documents], sizes)
+        await self.document_repo.upsert_many(self.db, [entity_to_row(d) for d in documents])
+        await self.db.commit()
+        await self.invalidate(user_id)
+
+    async def forget_documents(self, dataset_id: str, document_ids: List[str]):
+        """
+        Drop ownership and mirror rows of documents deleted upstream.
+        """
+        if not document_ids:
+            return
+        user_ids = await self.document_user_repo.delete_owned(self.db, dataset_id, document_ids)
+        await self.document_repo.delete_ids(self.db, document_ids)
+        await self.db.commit()
+        for user_id in user_ids:
+            await self.invalidate(user_id)
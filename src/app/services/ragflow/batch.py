@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import re
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.core.ragflow import ragflow_client, is_upstream_failure, sdk_exceptions
+from app.core.settings import settings
+from app.services.ragflow.jobs import JobStore, JobStatus, ItemStatus, chunked
+
+logger = logging.getLogger(__name__)
+
+DELETE_DOCUMENTS_JOB_KIND = "delete_documents"
+DELETE_CHUNKS_JOB_KIND = "delete_document_chunks"
+
+# 上游对单个文档 / 切片已不存在的报错，重试时视为成功以保证幂等；
+# 知识库不存在、无权访问知识库等其它错误仍按失败返回
+ALREADY_GONE_PATTERNS = (
+    re.compile(r"documents? not found\b"),
+    re.compile(r"you don't own the document\b"),
+    re.compile(r"rm_chunk deleted chunks (0\b|mismatch)"),
+)
+
+BatchOp = Callable[[List[str]], Awaitable[None]]
+ProgressCallback = Callable[[Dict[str, Dict]], Awaitable[None]]
+
+
+def is_already_gone(exc: Exception) -> bool:
+    if not isinstance(exc, sdk_exceptions.RAGFlowAPIError):
+        return False
+    message = str(exc).strip().lower()
+    return any(p.match(message) for p in ALREADY_GONE_PATTERNS)
+
+
+class BatchExecutor:
+    """
+    Executes a destructive RAGFlow operation over many ids.
+
+    Ids are de-duplicated, split into chunks of `batch_size` and run with at most
+    `concurrency` upstream calls in flight. A chunk rejected by RAGFlow is retried id by id
+    so that one bad id does not fail its neighbours, and answers saying the document or
+    chunk itself no longer exists count as success, which makes re-running the same request
+    safe. Anything else, e.g. an unknown dataset, is reported as a failure.
+
+    Outcomes use the same shape as the IAM batch operations:
+        {"id": ..., "success": bool, "reason": Optional[str]}
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, concurrency: Optional[int] = None):
+        self.batch_size = batch_size or settings.ragflow.delete_batch_size
+        self.concurrency = concurrency or settings.ragflow.delete_concurrency
+
+    @staticmethod
+    def _outcome(item_id: str, exc: Optional[Exception] = None) -> Dict:
+        if exc is None:
+            return {"id": item_id, "success": True, "reason": None}
+        if is_already_gone(exc):
+            return {"id": item_id, "success": True, "reason": "already deleted"}
+        return {"id": item_id, "success": False, "reason": str(exc) or type(exc).__name__}
+
+    async def _run_chunk(self, op: BatchOp, chunk: List[str], semaphore: asyncio.Semaphore) -> List[Dict]:
+        async with semaphore:
+            try:
+                await op(chunk)
+                return [self._outcome(i) for i in chunk]
+            except Exception as e:
+                if len(chunk) == 1 or is_upstream_failure(e):
+                    return [self._outcome(i, e) for i in chunk]
+
+            outcomes = []
+            for item_id in chunk:
+                try:
+                    await op([item_id])
+                    outcomes.append(self._outcome(item_id))
+                except Exception as e:
+                    outcomes.append(self._outcome(item_id, e))
+            return outcomes
+
+    async def run(self, ids: List[str], op: BatchOp, on_progress: Optional[ProgressCallback] = None) -> List[Dict]:
+        ids = list(dict.fromkeys(ids))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_and_report(chunk: List[str]) -> List[Dict]:
+            outcomes = await self._run_chunk(op, chunk, semaphore)
+            if on_progress:
+                await on_progress({o["id"]: o for o in outcomes})
+            return outcomes
+
+        results = await asyncio.gather(*(run_and_report(c) for c in chunked(ids, self.batch_size)))
+        outcomes = {o["id"]: o for chunk in results for o in chunk}
+        return [outcomes[i] for i in ids]
+
+
+def delete_documents_op(dataset_id: str, client=ragflow_client) -> BatchOp:
+    async def op(batch: List[str]):
+        await client.documents.delete_documents(dataset_id, batch)
+    return op
+
+
+def delete_document_chunks_op(dataset_id: str, client=ragflow_client) -> BatchOp:
+    # RAGFlow 按文档删除切片，每次调用只能处理一个文档
+    async def op(batch: List[str]):
+        for document_id in batch:
+            await client.chunks.delete_chunks(dataset_id, document_id)
+    return op
+
+
+def delete_chunk_ids_op(dataset_id: str, document_id: str, client=ragflow_client) -> BatchOp:
+    async def op(batch: List[str]):
+        await client.chunks.delete_chunks(dataset_id, document_id, chunk_ids=batch)
+    return op
+
+
+JOB_OPS = {
+    DELETE_DOCUMENTS_JOB_KIND: (delete_documents_op, None),
+    DELETE_CHUNKS_JOB_KIND: (delete_document_chunks_op, 1),
+}
+
+
+class BatchJobRunner:
+    """
+    Runs a background batch-delete job stored in `JobStore`.
+
+    Items already marked done by a previous attempt are skipped, so a retried task resumes.
+    """
+
+    def __init__(self, store: JobStore, client=ragflow_client):
+        self.store = store
+        self.client = client
+
+    async def run(self, job_id: str):
+        job = await self.store.get(job_id)
+        if job is None:
+            logger.warning(f"Batch job {job_id} not found or expired")
+            return
+
+        make_op, batch_size = JOB_OPS[job["kind"]]
+        pending = [i for i in job["item_ids"] if job["items"][i]["status"] != ItemStatus.done.value]
+        await self.store.set_status(job_id, JobStatus.running)
+
+        async def on_progress(outcomes: Dict[str, Dict]):
+            await self.store.update_items(job_id, {
+                item_id: {
+                    "status": ItemStatus.done.value if o["success"] else ItemStatus.failed.value,
+                    "message": o["reason"],
+                }
+                for item_id, o in outcomes.items()
+            })
+
+        try:
+            await BatchExecutor(batch_size=batch_size).run(
+                pending, make_op(job["dataset_id"], self.client), on_progress=on_progress
+            )
+        except Exception as e:
+            logger.exception(f"Batch job {job_id} crashed")
+            await self.store.set_status(job_id, JobStatus.failed, error=str(e))
+            return
+
+        job = await self.store.get(job_id)
+        await self.store.set_status(job_id, JobStore.final_status(job["items"]))
@@ -0,0 +1,118 @@
+import json
+import time
+import uuid
+from enum import Enum
+from typing import Optional, List, Dict, Iterator
+
+from redis.asyncio import Redis
+
+from app.core.settings import settings
+
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    partial = "partial"
+    failed = "failed"
+
+
+class ItemStatus(str, Enum):
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+TERMINAL_ITEM_STATUSES = {ItemStatus.done.value, ItemStatus.failed.value}
+
+
+def chunked(items: List[str], size: int) -> Iterator[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class JobStore:
+    """
+    Redis-backed state of background RAGFlow jobs.
+
+    Layout:
+        ragflow:job:{id}        hash of job fields
+        ragflow:job:{id}:items  hash of item id -> JSON item state
+    """
+
+    PREFIX = "ragflow:job:"
+
+    def __init__(self, redis: Redis, ttl: Optional[int] = None):
+        self.redis = redis
+        self.ttl = ttl or settings.ragflow.job_ttl_seconds
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.PREFIX}{job_id}"
+
+    def _items_key(self, job_id: str) -> str:
+        return f"{self.PREFIX}{job_id}:items"
+
+    async def create(self, kind: str, user_id: int | str, dataset_id: str, item_ids: List[str]) -> str:
+        job_id = uuid.uuid4().hex
+        now = str(time.time())
+        pending = json.dumps({"status": ItemStatus.pending.value})
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._key(job_id), mapping={
+                "id": job_id,
+                "kind": kind,
+                "user_id": str(user_id),
+                "dataset_id": dataset_id,
+                "status": JobStatus.queued.value,
+                "total": len(item_ids),
+                "item_ids": json.dumps(item_ids),
+                "created_at": now,
+                "updated_at": now,
+                "error": "",
+            })
+            pipe.hset(self._items_key(job_id), mapping={i: pending for i in item_ids})
+            pipe.expire(self._key(job_id), self.ttl)
+            pipe.expire(self._items_key(job_id), self.ttl)
+            await pipe.execute()
+        return job_id
+
+    async def get(self, job_id: str, with_items: bool = True) -> Optional[Dict]:
+        job = await self.redis.hgetall(self._key(job_id))
+        if not job:
+            return None
+        job["total"] = int(job["total"])
+        job["item_ids"] = json.loads(job["item_ids"])
+        job["created_at"] = float(job["created_at"])
+        job["updated_at"] = float(job["updated_at"])
+        job["error"] = job.get("error") or None
+
+        items = {k: json.loads(v) for k, v in (await self.redis.hgetall(self._items_key(job_id))).items()}
+        job["done"] = sum(1 for i in items.values() if i["status"] == ItemStatus.done.value)
+        job["failed"] = sum(1 for i in items.values() if i["status"] == ItemStatus.failed.value)
+        if with_items:
+            job["items"] = items
+        return job
+
+    async def set_status(self, job_id: str, status: JobStatus, error: Optional[str] = None):
+        mapping = {"status": status.value, "updated_at": str(time.time())}
+        if error is not None:
+            mapping["error"] = error
+        await self.redis.hset(self._key(job_id), mapping=mapping)
+
+    async def update_items(self, job_id: str, items: Dict[str, Dict]):
+        if not items:
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._items_key(job_id), mapping={k: json.dumps(v) for k, v in items.items()})
+            pipe.hset(self._key(job_id), "updated_at", str(time.time()))
+            await pipe.execute()
+
+    @staticmethod
+    def final_status(items: Dict[str, Dict]) -> JobStatus:
+        statuses = [i["status"] for i in items.values()]
+        if all(s == ItemStatus.done.value for s in statuses):
+            return JobStatus.succeeded
+        if all(s == ItemStatus.failed.value for s in statuses):
+            return JobStatus.failed
+        return JobStatus.partial
@@ -0,0 +1,202 @@
+import logging
+from dataclasses import fields
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.ragflow import ragflow_client, sdk_models
+from app.core.settings import settings
+from app.models.ragflow import RagflowDataset
+from app.repositories.ragflow import (
+    RagflowDatasetRepo,
+    RagflowDocumentRepo,
+    RagflowSyncStateRepo,
+    RagflowDatasetUserRepo,
+    RagflowDocumentUserRepo,
+)
+from app.repositories.ragflow.mirror import MirrorRepo
+from app.services.base import BaseService
+
+logger = logging.getLogger(__name__)
+
+DATASETS_SCOPE = "datasets"
+MIRROR_SYNC_LOCK = "ragflow:mirror:sync:lock"
+
+Fetcher = Callable[[int, int], Awaitable[Tuple[list, int]]]
+
+
+def documents_scope(dataset_id: str) -> str:
+    return f"documents:{dataset_id}"
+
+
+def entity_to_row(entity: Any) -> dict:
+    return {f.name: getattr(entity, f.name) for f in fields(entity) if not f.name.startswith("_")}
+
+
+def row_to_dict(row: Any) -> dict:
+    return {attr.key: getattr(row, attr.key) for attr in inspect(row).mapper.column_attrs}
+
+
+class RagflowMirrorService(BaseService[RagflowDataset]):
+    """
+    Incremental sync of RAGFlow dataset / document metadata into Postgres, and reads from that mirror.
+
+    Each scope keeps a watermark (max `update_time` seen). Incremental runs page through
+    upstream ordered by `update_time desc` and stop at the first page reaching the watermark;
+    a periodic full run also prunes rows deleted upstream.
+    """
+    repo = RagflowDatasetRepo()
+    document_repo = RagflowDocumentRepo()
+    state_repo = RagflowSyncStateRepo()
+    model = RagflowDataset
+
+    def __init__(self, db: AsyncSession, client=ragflow_client):
+        super().__init__(db)
+        self.client = client
+        self.page_size = settings.ragflow.mirror_sync_page_size
+
+    # ---------- sync ----------
+
+    async def _sync_scope(
+            self, fetch: Fetcher, repo: MirrorRepo, watermark: int, full: bool
+    ) -> Tuple[List[str], int]:
+        """
+        Page through upstream newest-first, upserting each page.
+        Returns the ids seen and the new watermark.
+        """
+        seen: List[str] = []
+        new_watermark = watermark
+        page = 1
+        while True:
+            items, _ = await fetch(page, self.page_size)
+            await repo.upsert_many(self.db, [entity_to_row(i) for i in items])
+            seen.extend(i.id for i in items)
+            update_times = [i.update_time or 0 for i in items]
+            new_watermark = max([new_watermark, *update_times])
+
+            if len(items) < self.page_size:
+                break
+            if not full and min(update_times) < watermark:
+                break
+            page += 1
+        return seen, new_watermark
+
+    async def _is_full_due(self, scope: str) -> Tuple[int, bool]:
+        state = await self.state_repo.get_state(self.db, scope)
+        if state is None or state.full_synced_at is None:
+            return 0, True
+        interval = timedelta(seconds=settings.ragflow.mirror_full_sync_interval_seconds)
+        return state.watermark, datetime.now(timezone.utc) - state.full_synced_at >= interval
+
+    async def sync_documents(self, dataset_id: str, full: bool = False) -> int:
+        scope = documents_scope(dataset_id)
+        watermark, full_due = await self._is_full_due(scope)
+        full = full or full_due
+
+        async def fetch(page: int, page_size: int):
+            return await self.client.documents.list_documents(
+                dataset_id, page=page, page_size=page_size, order_by="update_time", desc=True
+            )
+
+        seen, watermark = await self._sync_scope(fetch, self.document_repo, 0 if full else watermark, full)
+        if full:
+            await self.document_repo.delete_missing(self.db, seen, dataset_id=dataset_id)
+        await self.state_repo.save(self.db, scope, watermark, full=full)
+        await self.db.commit()
+        return len(seen)
+
+    async def sync(self, full: bool = False) -> dict:
+        watermark, full_due = await self._is_full_due(DATASETS_SCOPE)
+        full = full or full_due
+
+        async def fetch(page: int, page_size: int):
+            return await self.client.datasets.list_datasets(
+                page=page, page_size=page_size, order_by="update_time", desc=True
+            )
+
+        seen, watermark = await self._sync_scope(fetch, self.repo, 0 if full else watermark, full)
+        stats = {"full": full, "datasets": len(seen), "documents": 0, "removed_datasets": 0}
+        if full:
+            existing = set(await self.repo.get_all_ids(self.db))
+            removed = existing - set(seen)
+            stats["removed_datasets"] = await self.repo.delete_missing(self.db, seen)
+            await self.document_repo.delete_outside_datasets(self.db, seen)
+            await self.state_repo.delete_scopes(self.db, [documents_scope(i) for i in removed])
+        await self.state_repo.save(self.db, DATASETS_SCOPE, watermark, full=full)
+        await self.db.commit()
+
+        for dataset_id in await self.repo.get_all_ids(self.db):
+            try:
+                stats["documents"] += await self.sync_documents(dataset_id)
+            except Exception as e:
+                await self.db.rollback()
+                logger.warning(f"Mirror sync of dataset {dataset_id} documents failed: {e!r}")
+        return stats
+
+    # ---------- reads ----------
+
+    async def synced_at(self, scope: str) -> Optional[datetime]:
+        state = await self.state_repo.get_state(self.db, scope)
+        return state.synced_at if state else None
+
+    async def datasets_version(self) -> Tuple:
+        return await self.repo.get_version(self.db)
+
+    async def documents_version(self, dataset_id: str) -> Tuple:
+        return await self.document_repo.get_version(self.db, filters={"dataset_id": dataset_id})
+
+    async def list_datasets(
+            self,
+            page: int = 1,
+            page_size: int = 30,
+            order_by: Optional[str] = None,
+            desc: Optional[bool] = None,
+            dataset_id: Optional[str] = None,
+            name: Optional[str] = None,
+            owner_id: Optional[int] = None,
+    ) -> Tuple[List["sdk_models.Dataset"], int]:
+        """
+        List mirrored datasets; with `owner_id`, only those granted to that user (indexed semi-join).
+        """
+        filters = {"id": dataset_id, "name": name}
+        kwargs = dict(
+            page=page,
+            page_size=page_size,
+            filters={k: v for k, v in filters.items() if v is not None},
+            order_by=order_by or "create_time",
+            desc_order=True if desc is None else desc,
+        )
+        if owner_id is None:
+            items, total = await self.repo.get_paged(self.db, **kwargs)
+        else:
+            owned = RagflowDatasetUserRepo.owned_ids_subquery(owner_id)
+            items, total = await self.repo.get_paged_within(self.db, owned, **kwargs)
+        return [sdk_models.Dataset.from_raw(row_to_dict(i)) for i in items], total
+
+    async def list_documents(
+            self,
+            dataset_id: str,
+            page: int = 1,
+            page_size: int = 30,
+            order_by: Optional[str] = None,
+            desc: Optional[bool] = None,
+            keywords: Optional[str] = None,
+            suffix: Optional[str] = None,
+            owner_id: Optional[int] = None,
+    ) -> Tuple[List["sdk_models.Document"], int]:
+        filters = {"dataset_id": dataset_id, "name__like": keywords, "suffix__in": suffix}
+        kwargs = dict(
+            page=page,
+            page_size=page_size,
+            filters={k: v for k, v in filters.items() if v is not None},
+            order_by=order_by or "create_time",
+            desc_order=True if desc is None else desc,
+        )
+        if owner_id is None:
+            items, total = await self.document_repo.get_paged(self.db, **kwargs)
+        else:
+            owned = RagflowDocumentUserRepo.owned_ids_subquery(owner_id)
+            items, total = await self.document_repo.get_paged_within(self.db, owned, **kwargs)
+        return [sdk_models.Document.from_raw(row_to_dict(i)) for i in items], total
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.core.ragflow import ragflow_client
+from app.core.settings import settings
+from app.services.ragflow.batch import is_already_gone
+from app.services.ragflow.jobs import JobStore, JobStatus, ItemStatus, TERMINAL_ITEM_STATUSES, chunked
+from app.services.ragflow.quota import QuotaCounters
+
+logger = logging.getLogger(__name__)
+
+PARSE_JOB_KIND = "parse_documents"
+
+# RAGFlow 文档 run 字段（字符串或数字形式）到任务项状态的映射
+RUN_STATUS_MAP = {
+    "DONE": ItemStatus.done.value,
+    "3": ItemStatus.done.value,
+    "FAIL": ItemStatus.failed.value,
+    "4": ItemStatus.failed.value,
+    "CANCEL": ItemStatus.failed.value,
+    "2": ItemStatus.failed.value,
+}
+
+
+class ParseJobRunner:
+    """
+    Runs a `parse_documents` job: submits document ids to RAGFlow in rate-limited batches,
+    then polls parsing progress (one paged listing of the dataset per round) until every
+    document reaches a terminal state.
+
+    The parse quota is reserved for every document when the job is enqueued; documents that
+    never reach RAGFlow (rejected batch, job crashed before submitting them) are given back.
+    """
+
+    def __init__(self, store: JobStore, client=ragflow_client):
+        self.store = store
+        self.client = client
+        self.quota = QuotaCounters(store.redis)
+        conf = settings.ragflow
+        self.batch_size = conf.parse_batch_size
+        self.batch_interval = conf.parse_batch_interval_seconds
+        self.poll_interval = conf.parse_poll_interval_seconds
+        self.poll_timeout = conf.parse_poll_timeout_seconds
+        self.poll_page_size = conf.parse_poll_page_size
+
+    async def run(self, job_id: str):
+        job = await self.store.get(job_id, with_items=False)
+        if job is None:
+            logger.warning(f"Parse job {job_id} not found or expired")
+            return
+
+        await self.store.set_status(job_id, JobStatus.running)
+        dataset_id = job["dataset_id"]
+        submitted: Optional[List[str]] = None
+        try:
+            submitted = await self._submit(job_id, dataset_id, job["item_ids"])
+            await self._release_unsubmitted(job, submitted)
+            await self._poll(job_id, dataset_id, submitted)
+        except Exception as e:
+            logger.exception(f"Parse job {job_id} crashed")
+            if submitted is None:
+                # 提交中途失败：已置为 running 的文档已送达上游，其余归还配额
+                items = (await self.store.get(job_id))["items"]
+                await self._release_unsubmitted(
+                    job, [i for i in job["item_ids"] if items[i]["status"] == ItemStatus.running.value]
+                )
+            await self.store.set_status(job_id, JobStatus.failed, error=str(e))
+            return
+
+        job = await self.store.get(job_id)
+        await self.store.set_status(job_id, JobStore.final_status(job["items"]))
+
+    async def _release_unsubmitted(self, job: Dict, submitted: List[str]):
+        count = job["total"] - len(set(submitted))
+        if count:
+            # 配额按入队当天（UTC）预留
+            day = datetime.fromtimestamp(job["created_at"], timezone.utc).date()
+            await self.quota.release_parses(job["user_id"], job["dataset_id"], count, day)
+
+    async def _submit(self, job_id: str, dataset_id: str, document_ids: List[str]) -> List[str]:
+        """
+        Submit document ids in batches; a failed batch marks its documents as failed.
+        """
+        submitted: List[str] = []
+        for index, batch in enumerate(chunked(document_ids, self.batch_size)):
+            if index:
+                await asyncio.sleep(self.batch_interval)
+            try:
+                await self.client.documents.parse_documents(dataset_id, batch)
+            except Exception as e:
+                logger.warning(f"Parse job {job_id}: batch of {len(batch)} documents rejected: {e!r}")
+                await self.store.update_items(
+                    job_id, {i: {"status": ItemStatus.failed.value, "message": str(e)} for i in batch}
+                )
+                continue
+            await self.store.update_items(
+                job_id, {i: {"status": ItemStatus.running.value, "progress": 0.0} for i in batch}
+            )
+            submitted.extend(batch)
+        return submitted
+
+    @staticmethod
+    def _progress(doc) -> Dict:
+        return {
+            "status": RUN_STATUS_MAP.get(str(doc.run), ItemStatus.running.value),
+            "progress": doc.progress,
+            "message": doc.progress_msg,
+        }
+
+    async def _lookup(self, dataset_id: str, document_id: str) -> Optional[Dict]:
+        """
+        Progress of one document by id; None when RAGFlow says it no longer exists.
+        """
+        try:
+            docs, _ = await self.client.documents.list_documents(
+                dataset_id, page=1, page_size=1, document_id=document_id
+            )
+        except Exception as e:
+            if is_already_gone(e):
+                return None
+            raise
+        return self._progress(docs[0]) if docs else None
+
+    async def _fetch_progress(self, dataset_id: str, pending: List[str]) -> Dict[str, Dict]:
+        """
+        Progress of `pending` documents from one paged listing of the dataset, instead of one
+        call per document. The listing is ordered by `create_time`, which parsing does not
+        change, so documents do not move between pages while it is read; ids it still misses
+        are looked up one by one and only those RAGFlow does not know are reported as failed.
+        """
+        wanted = set(pending)
+        progress: Dict[str, Dict] = {}
+        page = 1
+        while wanted:
+            docs, _ = await self.client.documents.list_documents(
+                dataset_id, page=page, page_size=self.poll_page_size, order_by="create_time", desc=True
+            )
+            for doc in docs:
+                if doc.id in wanted:
+                    wanted.discard(doc.id)
+                    progress[doc.id] = self._progress(doc)
+            if len(docs) < self.poll_page_size:
+                break
+            page += 1
+
+        missing = sorted(wanted)
+        found = await asyncio.gather(*(self._lookup(dataset_id, i) for i in missing))
+        for document_id, item in zip(missing, found):
+            progress[document_id] = item or {"status": ItemStatus.failed.value, "message": "Document not found"}
+        return progress
+
+    async def _poll(self, job_id: str, dataset_id: str, pending: List[str]) -> Dict[str, Dict]:
+        deadline = time.monotonic() + self.poll_timeout
+        finished: Dict[str, Dict] = {}
+
+        while pending:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                updates = await self._fetch_progress(dataset_id, pending)
+            except Exception as e:
+                # 本轮失败，下一轮重试
+                logger.warning(f"Parse job {job_id}: polling progress failed: {e!r}")
+                updates = {}
+            await self.store.update_items(job_id, updates)
+
+            finished.update({k: v for k, v in updates.items() if v["status"] in TERMINAL_ITEM_STATUSES})
+            pending = [i for i in pending if i not in finished]
+
+            if pending and time.monotonic() >= deadline:
+                timeout = {i: {"status": ItemStatus.failed.value, "message": "Polling timed out"} for i in pending}
+                await self.store.update_items(job_id, timeout)
+                finished.update(timeout)
+                break
+
+        return finished
@@ -0,0 +1,298 @@
+"""
+配额
+Per-user and per-dataset quotas on stored bytes, stored documents and documents parsed per
+day (UTC), enforced with Redis counters before any upstream call.
+
+Layout:
+    quota:{subject}                     hash: bytes, documents, pending_bytes, pending_documents
+    quota:{subject}:parses:{YYYYMMDD}   hash: parses (expires after two days)
+
+where `subject` is `user:{id}` or `dataset:{id}`. A request reserves everything it needs in
+one Lua call (all counters or none); an upload that fails upstream releases its reservation,
+and a parse job gives back the parses of documents it did not get submitted.
+Stored usage is reserved as pending until the ownership rows are committed.
+
+The reconcile task recomputes stored usage from `RagflowDocumentUser` (documents deleted
+upstream drop out after the next full mirror sync), resets the Redis counters to it plus
+what is still pending, and snapshots the day's usage into `ragflow_quota_usage`, from where
+the parse counters are restored if Redis lost them.
+"""
+import logging
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.exceptions import QuotaExceededError
+from app.core.metrics import QUOTA_REJECTIONS
+from app.core.settings import settings
+from app.models.ragflow import RagflowQuotaUsage
+from app.repositories.ragflow import RagflowDocumentUserRepo, RagflowQuotaUsageRepo
+from app.services.base import BaseService
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "quota:"
+QUOTA_RECONCILE_LOCK = "ragflow:quota:reconcile:lock"
+PARSES_KEY_TTL_SECONDS = 2 * 24 * 3600
+
+# ARGV: 每项 6 个参数 (KEYS 序号, 字段, 数量, 上限, 过期秒数, 是否记入 pending)
+# 全部未超限才一起累加；返回 {超限项序号（0 表示放行）, 该项已用量}
+RESERVE_SCRIPT = """
+for i = 1, #ARGV, 6 do
+    local limit = tonumber(ARGV[i + 3])
+    if limit > 0 then
+        local used = tonumber(redis.call('HGET', KEYS[tonumber(ARGV[i])], ARGV[i + 1])) or 0
+        if used + tonumber(ARGV[i + 2]) > limit then
+            return {(i - 1) / 6 + 1, used}
+        end
+    end
+end
+for i = 1, #ARGV, 6 do
+    local key = KEYS[tonumber(ARGV[i])]
+    redis.call('HINCRBY', key, ARGV[i + 1], ARGV[i + 2])
+    if ARGV[i + 5] == '1' then
+        redis.call('HINCRBY', key, 'pending_' .. ARGV[i + 1], ARGV[i + 2])
+    end
+    if tonumber(ARGV[i + 4]) > 0 then
+        redis.call('EXPIRE', key, ARGV[i + 4])
+    end
+end
+return {0, 0}
+"""
+
+# KEYS[1]: 存储计数；ARGV: (字段, Postgres 中的用量) 对。计数 = 已落库用量 + 尚未落库的预留
+RESET_STORAGE_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    local pending = math.max(0, tonumber(redis.call('HGET', KEYS[1], 'pending_' .. ARGV[i])) or 0)
+    redis.call('HSET', KEYS[1], ARGV[i], tonumber(ARGV[i + 1]) + pending)
+end
+"""
+
+# KEYS[1]: 当日解析计数；ARGV: Postgres 中的当日用量、过期秒数。取两者较大值
+RESTORE_PARSES_SCRIPT = """
+local used = tonumber(redis.call('HGET', KEYS[1], 'parses')) or 0
+local stored = tonumber(ARGV[1])
+if stored > used then
+    redis.call('HSET', KEYS[1], 'parses', stored)
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return stored
+end
+return used
+"""
+
+
+def user_subject(user_id: int | str) -> str:
+    return f"user:{user_id}"
+
+
+def dataset_subject(dataset_id: str) -> str:
+    return f"dataset:{dataset_id}"
+
+
+def storage_key(subject: str) -> str:
+    return f"{KEY_PREFIX}{subject}"
+
+
+def parses_key(subject: str, day: date) -> str:
+    return f"{KEY_PREFIX}{subject}:parses:{day:%Y%m%d}"
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def seconds_until_tomorrow() -> float:
+    now = datetime.now(timezone.utc)
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), time.min, tzinfo=timezone.utc)
+    return (tomorrow - now).total_seconds()
+
+
+@dataclass(frozen=True)
+class QuotaCheck:
+    subject: str
+    key: str
+    field: str
+    amount: int
+    limit: int
+    ttl: int = 0
+    # 存储用量在所有权记录落库前记为 pending，对账时保留
+    pending: bool = False
+
+    def error(self, used: int) -> QuotaExceededError:
+        QUOTA_REJECTIONS.labels(self.subject.split(":", 1)[0], self.field).inc()
+        detail = f"{self.subject} {self.field} quota exceeded: used {used}, requested {self.amount}, limit {self.limit}"
+        headers = None
+        if self.field == "parses":
+            headers = {"Retry-After": str(math.ceil(seconds_until_tomorrow()))}
+        return QuotaExceededError(detail=detail, headers=headers)
+
+
+class Reservation:
+    """
+    Amounts reserved by one request. `commit()` once the usage is recorded in Postgres,
+    `release()` when the operation did not happen.
+    """
+
+    def __init__(self, redis: Optional[Redis], checks: List[QuotaCheck]):
+        self.redis = redis
+        self.checks = checks
+
+    async def _apply(self, release: bool):
+        if not self.checks:
+            return
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for c in self.checks:
+                    if release:
+                        pipe.hincrby(c.key, c.field, -c.amount)
+                    if c.pending:
+                        pipe.hincrby(c.key, f"pending_{c.field}", -c.amount)
+                await pipe.execute()
+        except Exception as e:
+            # 存储计数在下次对账时修正
+            logger.warning(f"Quota {'release' if release else 'commit'} failed: {e!r}")
+        self.checks = []
+
+    async def commit(self):
+        await self._apply(release=False)
+
+    async def release(self):
+        await self._apply(release=True)
+
+
+class QuotaCounters:
+    """
+    Redis side of the quotas: atomic check-and-reserve against the configured limits.
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.conf = settings.quota
+
+    async def reserve(self, checks: List[QuotaCheck]) -> Reservation:
+        """
+        Reserve every check or none; raises `QuotaExceededError` for the first check over its limit.
+        """
+        checks = [c for c in checks if c.amount > 0]
+        if not self.conf.enabled or not checks:
+            return Reservation(None, [])
+
+        keys = list(dict.fromkeys(c.key for c in checks))
+        args = []
+        for c in checks:
+            args += [keys.index(c.key) + 1, c.field, c.amount, c.limit, c.ttl, int(c.pending)]
+        try:
+            exceeded, used = await self.redis.eval(RESERVE_SCRIPT, len(keys), *keys, *args)
+        except Exception as e:
+            if not self.conf.fail_open:
+                raise
+            logger.warning(f"Quota check failed, allowing: {e!r}")
+            return Reservation(None, [])
+
+        if exceeded:
+            raise checks[int(exceeded) - 1].error(int(used))
+        return Reservation(self.redis, checks)
+
+    async def reserve_upload(self, user_id: int | str, dataset_id: str, sizes: List[int]) -> Reservation:
+        total, count = sum(sizes), len(sizes)
+        checks = []
+        for subject, max_bytes, max_documents in (
+                (user_subject(user_id), self.conf.user_max_bytes, self.conf.user_max_documents),
+                (dataset_subject(dataset_id), self.conf.dataset_max_bytes, self.conf.dataset_max_documents),
+        ):
+            key = storage_key(subject)
+            checks.append(QuotaCheck(subject, key, "bytes", total, max_bytes, pending=True))
+            checks.append(QuotaCheck(subject, key, "documents", count, max_documents, pending=True))
+        return await self.reserve(checks)
+
+    def _parse_checks(self, user_id: int | str, dataset_id: str, count: int, day: date) -> List[QuotaCheck]:
+        return [
+            QuotaCheck(subject, parses_key(subject, day), "parses", count, limit, ttl=PARSES_KEY_TTL_SECONDS)
+            for subject, limit in (
+                (user_subject(user_id), self.conf.user_parses_per_day),
+                (dataset_subject(dataset_id), self.conf.dataset_parses_per_day),
+            )
+        ]
+
+    async def reserve_parses(self, user_id: int | str, dataset_id: str, count: int) -> Reservation:
+        return await self.reserve(self._parse_checks(user_id, dataset_id, count, utc_today()))
+
+    async def release_parses(self, user_id: int | str, dataset_id: str, count: int, day: date):
+        """
+        Give back `count` parses reserved on `day` for documents that were never submitted upstream.
+        """
+        if not self.conf.enabled or count <= 0:
+            return
+        await Reservation(self.redis, self._parse_checks(user_id, dataset_id, count, day)).release()
+
+    async def scan(self, pattern: str) -> List[str]:
+        return [key async for key in self.redis.scan_iter(match=pattern, count=500)]
+
+
+class RagflowQuotaService(BaseService[RagflowQuotaUsage]):
+    """
+    Reconciles the Redis counters with Postgres (see the module docstring).
+    """
+    repo = RagflowQuotaUsageRepo()
+    document_user_repo = RagflowDocumentUserRepo()
+    model = RagflowQuotaUsage
+
+    def __init__(self, db: AsyncSession, redis: Redis):
+        super().__init__(db)
+        self.counters = QuotaCounters(redis)
+        self.redis = redis
+
+    async def _stored_usage(self) -> Dict[str, Tuple[int, int]]:
+        usage = {user_subject(k): v for k, v in (await self.document_user_repo.usage_by(self.db, "user_id")).items()}
+        usage.update(
+            (dataset_subject(k), v) for k, v in (await self.document_user_repo.usage_by(self.db, "dataset_id")).items()
+        )
+        # Redis 中有计数而 Postgres 中已无文档的主体归零
+        for key in await self.counters.scan(f"{KEY_PREFIX}*"):
+            if ":parses:" not in key:
+                usage.setdefault(key[len(KEY_PREFIX):], (0, 0))
+        return usage
+
+    async def _parse_counts(self, day: date) -> Dict[str, int]:
+        suffix = f":parses:{day:%Y%m%d}"
+        keys = await self.counters.scan(f"{KEY_PREFIX}*{suffix}")
+        if not keys:
+            return {}
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hget(key, "parses")
+            values = await pipe.execute()
+        return {key[len(KEY_PREFIX):-len(suffix)]: int(value or 0) for key, value in zip(keys, values)}
+
+    async def reconcile(self) -> dict:
+        today = utc_today()
+        yesterday = today - timedelta(days=1)
+
+        usage = await self._stored_usage()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for subject, (size, count) in usage.items():
+                pipe.eval(RESET_STORAGE_SCRIPT, 1, storage_key(subject), "bytes", size, "documents", count)
+            await pipe.execute()
+
+        # Redis 丢失当日解析计数时（重启、淘汰）从快照恢复
+        parses = await self._parse_counts(today)
+        stored = await self.repo.list_day(self.db, today)
+        restore = {s: row.parses for s, row in stored.items() if row.parses > parses.get(s, 0)}
+        for subject, value in restore.items():
+            parses[subject] = int(await self.redis.eval(
+                RESTORE_PARSES_SCRIPT, 1, parses_key(subject, today), value, PARSES_KEY_TTL_SECONDS
+            ))
+
+        rows: Dict[str, dict] = {s: {"subject": s, "bytes": b, "documents": d} for s, (b, d) in usage.items()}
+        for subject, value in parses.items():
+            rows.setdefault(subject, {"subject": subject})["parses"] = value
+        await self.repo.upsert_day(self.db, today, list(rows.values()))
+        # 前一日的最终解析数
+        final = await self._parse_counts(yesterday)
+        await self.repo.upsert_day(self.db, yesterday, [{"subject": s, "parses": v} for s, v in final.items()])
+        await self.db.commit()
+        return {"subjects": len(rows), "restored_parses": len(restore)}
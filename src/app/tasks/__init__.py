@@ -1,12 +1,39 @@
-# from dotenv import load_dotenv
-# from taskiq_redis import RedisStreamBroker, RedisAsyncResultBackend
-#
-# load_dotenv(dotenv_path='../.env', encoding='utf-8')
-#
-# from app.core.settings import settings
-#
-# broker = RedisStreamBroker(
-#     url=settings.redis_task_url
-# ).with_result_backend(
-#     RedisAsyncResultBackend(redis_url=settings.redis_task_url)
-# )
\ No newline at end of file
+"""
+异步任务
+Background tasks (TaskIQ)
+"""
+from taskiq import TaskiqEvents, TaskiqState
+from taskiq_redis import RedisStreamBroker, RedisAsyncResultBackend
+
+from app.core.cache import default_cache
+from app.core.entity_cache import entity_cache
+from app.core.redis import redis_manager
+from app.core.settings import settings
+
+# 消费端 XREAD 阻塞读取，不设读超时
+_pool_options = dict(
+    max_connection_pool_size=settings.redis.task_max_connections,
+    socket_connect_timeout=settings.redis.socket_connect_timeout_seconds,
+    health_check_interval=settings.redis.health_check_interval_seconds,
+)
+
+broker = RedisStreamBroker(
+    url=str(settings.redis.task_dsn), **_pool_options
+).with_result_backend(
+    RedisAsyncResultBackend(redis_url=str(settings.redis.task_dsn), **_pool_options)
+)
+
+
+@broker.on_event(TaskiqEvents.WORKER_STARTUP)
+async def worker_startup(state: TaskiqState):
+    # 任务状态与 HTTP 进程共享默认库
+    state.redis = redis_manager.default
+    entity_cache.start()
+    default_cache.start()
+
+
+@broker.on_event(TaskiqEvents.WORKER_SHUTDOWN)
+async def worker_shutdown(state: TaskiqState):
+    await entity_cache.stop()
+    await default_cache.stop()
+    await redis_manager.close()
@@ -0,0 +1,66 @@
+import logging
+
+from taskiq import Context, TaskiqDepends
+
+from app.core.db import async_session
+from app.core.settings import settings
+from app.services.ragflow.access import RagflowAccessService
+from app.services.ragflow.batch import BatchJobRunner, DELETE_DOCUMENTS_JOB_KIND
+from app.services.ragflow.jobs import ItemStatus, JobStore
+from app.services.ragflow.mirror import RagflowMirrorService, MIRROR_SYNC_LOCK
+from app.services.ragflow.parsing import ParseJobRunner
+from app.services.ragflow.quota import RagflowQuotaService, QUOTA_RECONCILE_LOCK
+from app.tasks import broker
+
+logger = logging.getLogger(__name__)
+
+
+@broker.task(task_name="ragflow.parse_documents")
+async def parse_documents(job_id: str, context: Context = TaskiqDepends()) -> None:
+    runner = ParseJobRunner(JobStore(context.state.redis))
+    await runner.run(job_id)
+
+
+@broker.task(task_name="ragflow.delete_batch")
+async def delete_batch(job_id: str, context: Context = TaskiqDepends()) -> None:
+    store = JobStore(context.state.redis)
+    await BatchJobRunner(store).run(job_id)
+
+    job = await store.get(job_id)
+    if job and job["kind"] == DELETE_DOCUMENTS_JOB_KIND:
+        deleted = [i for i, item in job["items"].items() if item["status"] == ItemStatus.done.value]
+        async with async_session() as db:
+            await RagflowAccessService(db).forget_documents(job["dataset_id"], deleted)
+
+
+@broker.task(
+    task_name="ragflow.sync_mirror",
+    schedule=[{"interval": settings.ragflow.mirror_sync_interval_seconds}],
+)
+async def sync_mirror(full: bool = False, context: Context = TaskiqDepends()) -> None:
+    redis = context.state.redis
+    # 避免多个 worker 同时同步
+    if not await redis.set(MIRROR_SYNC_LOCK, "1", nx=True, ex=settings.ragflow.mirror_full_sync_interval_seconds):
+        return
+    try:
+        async with async_session() as db:
+            stats = await RagflowMirrorService(db).sync(full=full)
+        logger.info(f"RAGFlow mirror synced: {stats}")
+    finally:
+        await redis.delete(MIRROR_SYNC_LOCK)
+
+
+@broker.task(
+    task_name="ragflow.reconcile_quotas",
+    schedule=[{"interval": settings.quota.reconcile_interval_seconds}],
+)
+async def reconcile_quotas(context: Context = TaskiqDepends()) -> None:
+    redis = context.state.redis
+    if not await redis.set(QUOTA_RECONCILE_LOCK, "1", nx=True, ex=settings.quota.reconcile_interval_seconds):
+        return
+    try:
+        async with async_session() as db:
+            stats = await RagflowQuotaService(db, redis).reconcile()
+        logger.info(f"Quota counters reconciled: {stats}")
+    finally:
+        await redis.delete(QUOTA_RECONCILE_LOCK)
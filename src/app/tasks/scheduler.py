@@ -0,0 +1,6 @@
+from taskiq import TaskiqScheduler
+from taskiq.schedule_sources import LabelScheduleSource
+
+from app.tasks.worker import broker
+
+scheduler = TaskiqScheduler(broker, sources=[LabelScheduleSource(broker)])
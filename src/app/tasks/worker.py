@@ -3,8 +3,8 @@ from . import broker # noqa: F401
 import importlib
 
 task_modules = [
-    "app.api.v1.book.tasks",
+    "app.tasks.ragflow",
 ]
 
 for module in task_modules:
-    importlib.import_module(module)
\ No newline at end of file
+    importlib.import_module(module)
@@ -0,0 +1,75 @@
+"""
+Unit tests. They need no database, Redis or RAGFlow; the required settings get placeholder
+values before `app.core.settings` is first imported.
+"""
+import os
+
+for key, value in {
+    "SECRET_KEY": "test-secret-key",
+    "DB_PASSWORD": "test",
+    "REDIS_PASSWORD": "test",
+    "RAGFLOW_API_KEY": "test",
+    "RAGFLOW_ORIGIN_URL": "http://127.0.0.1:9380",
+}.items():
+    os.environ.setdefault(key, value)
+
+import httpx
+import pytest
+from ragflow_async_sdk import AsyncRAGFlowClient
+
+from app.core.profiling import assert_max_queries
+from app.core.ragflow import GuardedRAGFlowClient, UpstreamGuard
+from app.core.tracing import InMemorySpanExporter, configure_tracing, shutdown_tracing
+from benchmarks.stubs.ragflow import FakeConfig, create_app
+
+
+@pytest.fixture
+def max_queries():
+    """
+    Query budget for a block of code or requests:
+
+        def test_list_roles(client, max_queries):
+            with max_queries(3):
+                client.get("/api/v1/iam/roles")
+    """
+    return assert_max_queries
+
+
+@pytest.fixture
+def span_exporter():
+    """
+    Enable tracing into an in-memory exporter for the test:
+
+        def test_trace(client, span_exporter):
+            client.get("/api/v1/iam/roles")
+            names = [s.name for s in span_exporter.get_finished_spans()]
+    """
+    exporter = InMemorySpanExporter()
+    configure_tracing(exporter)
+    yield exporter
+    shutdown_tracing()
+
+
+@pytest.fixture
+def fake_ragflow():
+    """
+    In-process fake RAGFlow server (`benchmarks/stubs/ragflow.py`); inject faults with
+    `fake_ragflow.config.set_faults(...)`, count calls in `fake_ragflow.stats`.
+    """
+    return create_app(FakeConfig(datasets=3, documents_per_dataset=25, parse_seconds=0)).state.fake
+
+
+@pytest.fixture
+def ragflow(fake_ragflow):
+    """
+    Guarded RAGFlow client (fresh breakers, limiter and retry budget) calling `fake_ragflow`
+    through an ASGI transport.
+    """
+
+    def factory():
+        return AsyncRAGFlowClient(
+            server_url="http://ragflow.test", api_key="test",
+            transport=httpx.ASGITransport(app=fake_ragflow.asgi()),
+        )
+
+    return GuardedRAGFlowClient(factory, UpstreamGuard("ragflow"))
@@ -0,0 +1,325 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Optional
+
+import fakeredis
+import pytest
+import pytest_asyncio
+
+from app.core import cache as cache_module
+from app.core.cache import MISSING, Cache, cached
+from app.core.settings import settings
+
+
+@dataclass
+class Dataset:
+    id: str
+    name: str
+
+
+class Loader:
+    """
+    Counting loader returning `value` (or `value(n)` for the n-th call) after `delay` seconds.
+    """
+
+    def __init__(self, value=None, delay: float = 0.0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, *args, **kwargs):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.value(self.calls) if callable(self.value) else self.value
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest_asyncio.fixture
+async def cache(server):
+    cache = Cache(prefix="test:")
+    cache.start(fakeredis.FakeAsyncRedis(server=server))
+    yield cache
+    await cache.stop()
+
+
+async def drain(cache: Cache):
+    # 等待后台刷新任务完成
+    while cache._tasks:
+        await asyncio.gather(*cache._tasks)
+
+
+@pytest.mark.asyncio
+async def test_miss_then_hit_keeps_type(cache):
+    loader = Loader(lambda n: Dataset(id="d1", name=f"v{n}"))
+
+    @cached("datasets", ttl=10, key="{dataset_id}", cache=cache)
+    async def get_dataset(dataset_id: str) -> Dataset:
+        return await loader(dataset_id)
+
+    assert await get_dataset("d1") == Dataset(id="d1", name="v1")
+    assert await get_dataset("d1") == Dataset(id="d1", name="v1")
+    assert loader.calls == 1
+    assert await cache.get("datasets:d1", get_dataset.options.serializer) == Dataset(id="d1", name="v1")
+
+
+@pytest.mark.asyncio
+async def test_single_flight(cache):
+    loader = Loader(lambda n: n, delay=0.05)
+
+    @cached("count", ttl=10, cache=cache)
+    async def count() -> int:
+        return await loader()
+
+    assert await asyncio.gather(*(count() for _ in range(10))) == [1] * 10
+    assert loader.calls == 1
+    assert cache._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_errors(cache):
+    calls = 0
+
+    @cached("broken", ttl=10, cache=cache)
+    async def broken() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        raise RuntimeError("backend down")
+
+    results = await asyncio.gather(*(broken() for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert calls == 1
+    assert await cache.get("broken:") is MISSING
+
+
+@pytest.mark.asyncio
+async def test_cross_process_lock(server):
+    # 两个 Cache 共用一个 Redis，模拟两个进程
+    loader = Loader("value", delay=0.1)
+    caches = [Cache(prefix="test:") for _ in range(2)]
+    functions = []
+    for c in caches:
+        c.start(fakeredis.FakeAsyncRedis(server=server))
+
+        @cached("shared", ttl=10, cache=c)
+        async def shared() -> str:
+            return await loader()
+
+        functions.append(shared)
+
+    assert await asyncio.gather(*(f() for f in functions)) == ["value", "value"]
+    assert loader.calls == 1
+    for c in caches:
+        await c.stop()
+
+
+@pytest.mark.asyncio
+async def test_lock_waiter_loads_after_timeout(cache, monkeypatch):
+    monkeypatch.setattr(settings.cache, "lock_timeout_seconds", 0.1)
+    monkeypatch.setattr(settings.cache, "lock_poll_seconds", 0.01)
+    # 另一进程持锁后失联
+    await cache.redis.set("test:orphan::lock", "other-process")
+    loader = Loader("value")
+
+    @cached("orphan", ttl=10, cache=cache)
+    async def orphan() -> str:
+        return await loader()
+
+    assert await orphan() == "value"
+    assert loader.calls == 1
+    assert await cache.redis.get("test:orphan::lock") == b"other-process"
+
+
+@pytest.mark.asyncio
+async def test_xfetch_refreshes_early(cache, monkeypatch):
+    loader = Loader(lambda n: n, delay=0.05)
+
+    @cached("xfetch", ttl=10, beta=1.0, background_refresh=False, cache=cache)
+    async def value() -> int:
+        return await loader()
+
+    assert await value() == 1
+    # U 接近 1：-delta * ln(U) ≈ 0，远未到期，不提前刷新
+    monkeypatch.setattr(cache_module.random, "random", lambda: 0.999999)
+    assert await value() == 1
+    # U 极小：-delta * ln(U) 超过剩余时间，提前重算
+    monkeypatch.setattr(cache_module.random, "random", lambda: 1e-300)
+    assert await value() == 2
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_xfetch_disabled_with_zero_beta(cache, monkeypatch):
+    monkeypatch.setattr(cache_module.random, "random", lambda: 1e-300)
+    loader = Loader(lambda n: n, delay=0.05)
+
+    @cached("no-xfetch", ttl=10, beta=0, cache=cache)
+    async def value() -> int:
+        return await loader()
+
+    assert [await value(), await value()] == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_xfetch_background_refresh(cache, monkeypatch):
+    loader = Loader(lambda n: n, delay=0.05)
+
+    @cached("xfetch-bg", ttl=10, beta=1.0, cache=cache)
+    async def value() -> int:
+        return await loader()
+
+    assert await value() == 1
+    monkeypatch.setattr(cache_module.random, "random", lambda: 1e-300)
+    # 提前刷新在后台进行，本次仍返回当前值
+    assert await value() == 1
+    await drain(cache)
+    monkeypatch.setattr(cache_module.random, "random", lambda: 0.999999)
+    assert await value() == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(cache):
+    loader = Loader(lambda n: n)
+
+    @cached("swr", ttl=0.05, stale_ttl=10, beta=0, cache=cache)
+    async def value() -> int:
+        return await loader()
+
+    assert await value() == 1
+    await asyncio.sleep(0.06)
+    # 过期但在 stale 窗口内：立即返回旧值，后台只刷新一次
+    assert await asyncio.gather(value(), value()) == [1, 1]
+    await drain(cache)
+    assert loader.calls == 2
+    assert await value() == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_refreshed_inline_without_background(cache):
+    loader = Loader(lambda n: n)
+
+    @cached("swr-inline", ttl=0.05, stale_ttl=10, beta=0, background_refresh=False, cache=cache)
+    async def value() -> int:
+        return await loader()
+
+    assert await value() == 1
+    await asyncio.sleep(0.06)
+    assert await value() == 2
+    assert cache._tasks == set()
+
+
+@pytest.mark.asyncio
+async def test_negative_caching(cache):
+    loader = Loader(None)
+
+    @cached("missing", ttl=10, negative_ttl=10, key="{id}", cache=cache)
+    async def find(id: int) -> Optional[Dataset]:
+        return await loader(id)
+
+    assert await find(1) is None
+    assert await find(1) is None
+    assert loader.calls == 1
+
+    uncached = Loader(None)
+
+    @cached("missing-uncached", ttl=10, key="{id}", cache=cache)
+    async def find_uncached(id: int) -> Optional[Dataset]:
+        return await uncached(id)
+
+    await find_uncached(1)
+    await find_uncached(1)
+    assert uncached.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_local_tier_lru(cache):
+    loader = Loader(lambda n: n)
+
+    @cached("lru", ttl=10, key="{id}", local_size=2, cache=cache)
+    async def value(id: int) -> int:
+        return await loader(id)
+
+    for id in (1, 2):
+        await value(id)
+    local = value.options.local
+    # 本地命中不访问 Redis
+    await cache.redis.flushall()
+    assert [await value(1), await value(2)] == [1, 2]
+    assert loader.calls == 2
+
+    await value(1)
+    await value(3)
+    # 容量为 2：最久未使用的 2 被淘汰
+    assert list(local._data) == ["test:lru:1", "test:lru:3"]
+
+
+@pytest.mark.asyncio
+async def test_local_tier_expires(cache):
+    loader = Loader(lambda n: n)
+
+    @cached("lru-ttl", ttl=10, local_size=10, local_ttl=0.05, cache=cache)
+    async def value() -> int:
+        return await loader()
+
+    await value()
+    await cache.redis.flushall()
+    await asyncio.sleep(0.06)
+    assert await value() == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate(cache):
+    loader = Loader(lambda n: n)
+
+    @cached("inv", ttl=10, key="{id}", local_size=10, cache=cache)
+    async def value(id: int) -> int:
+        return await loader(id)
+
+    assert await value(1) == 1
+    await value.invalidate(1)
+    assert await cache.redis.get("test:inv:1") is None
+    assert await value(1) == 2
+
+
+@pytest.mark.asyncio
+async def test_method_binding(cache):
+    class Service:
+        def __init__(self, tenant: str):
+            self.tenant = tenant
+            self.calls = 0
+
+        @cached("svc", ttl=10, cache=cache)
+        async def lookup(self, item_id: int, verbose: bool = False) -> str:
+            self.calls += 1
+            return f"{self.tenant}:{item_id}"
+
+    a, b = Service("a"), Service("b")
+    # self 不参与默认键
+    assert a.lookup.key_for(1) == "svc:1:False"
+    assert await a.lookup(1) == "a:1"
+    assert await b.lookup(1) == "a:1"
+    assert (a.calls, b.calls) == (1, 0)
+
+    await b.lookup.invalidate(1)
+    assert await b.lookup(1) == "b:1"
+    assert Service.lookup.namespace == "svc"
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_calls_loader(server, monkeypatch):
+    monkeypatch.setattr(settings.cache, "enabled", False)
+    cache = Cache(prefix="test:")
+    cache.start(fakeredis.FakeAsyncRedis(server=server))
+    loader = Loader(lambda n: n)
+
+    @cached("off", ttl=10, cache=cache)
+    async def value() -> int:
+        return await loader()
+
+    assert [await value(), await value()] == [1, 2]
+    await cache.stop()
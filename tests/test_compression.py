@@ -0,0 +1,120 @@
+import asyncio
+import gzip
+import zlib
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from app.core.middleware.compression import CompressionMiddleware, negotiate, parse_accept_encoding
+
+BODY = b'{"items": [' + b",".join(b'{"id": %d}' % i for i in range(200)) + b"]}"
+CHUNKS = [b"x" * 300, b"y" * 300, b"z" * 300]
+
+
+async def stream():
+    for chunk in CHUNKS:
+        yield chunk
+
+
+def build_app():
+    return Starlette(routes=[
+        Route("/large", lambda r: Response(BODY, media_type="application/json")),
+        Route("/small", lambda r: Response(b'{"ok": true}', media_type="application/json")),
+        Route("/pdf", lambda r: Response(b"%PDF" * 1000, media_type="application/pdf")),
+        Route("/image", lambda r: Response(b"\x89PNG" * 1000, media_type="image/png")),
+        Route("/stream", lambda r: StreamingResponse(stream(), media_type="text/plain")),
+    ])
+
+
+@pytest.fixture
+def middleware():
+    return CompressionMiddleware(build_app(), minimum_size=500, encodings=("gzip",))
+
+
+@pytest.fixture
+def client(middleware):
+    return TestClient(middleware, headers={"Accept-Encoding": "gzip"})
+
+
+def test_large_body_is_compressed(client):
+    response = client.get("/large")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.content == BODY
+
+
+def test_body_below_minimum_size_is_not_compressed(client):
+    response = client.get("/small")
+    assert "content-encoding" not in response.headers
+    # 是否压缩取决于请求头，缓存仍需按 Accept-Encoding 区分
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == b'{"ok": true}'
+
+
+@pytest.mark.parametrize("path", ["/pdf", "/image"])
+def test_compressed_types_are_skipped(client, path):
+    response = client.get(path)
+    assert "content-encoding" not in response.headers
+    assert int(response.headers["content-length"]) == 4000
+
+
+def test_no_accepted_encoding_passes_through(client):
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.content == BODY
+
+
+@pytest.mark.asyncio
+async def test_streaming_flushes_each_chunk(middleware):
+    scope = {
+        "type": "http", "method": "GET", "path": "/stream", "raw_path": b"/stream", "root_path": "",
+        "scheme": "http", "query_string": b"", "server": ("test", 80), "client": ("test", 1),
+        "http_version": "1.1", "headers": [(b"accept-encoding", b"gzip")],
+    }
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # 客户端不断开，StreamingResponse 的断开监听一直挂起
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware(scope, receive, send)
+
+    start, *bodies = messages
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+
+    # 每个分片单独可解压，说明已逐块 flush 而非缓冲到结尾
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    streamed = [decoder.decompress(m["body"]) for m in bodies if m.get("more_body")]
+    assert streamed == CHUNKS
+    assert gzip.decompress(b"".join(m["body"] for m in bodies)) == b"".join(CHUNKS)
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, BR;q=0.9 , *;q=0.1, zstd;q=bad,") == {
+        "gzip": 1.0, "br": 0.9, "*": 0.1, "zstd": 0.0,
+    }
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip;q=0.5, br;q=0.9", "br"),
+    ("gzip, br", "br"),
+    ("gzip, br;q=0", "gzip"),
+    ("*;q=0.2, gzip;q=0.1", "br"),
+    ("*, br;q=0", "gzip"),
+    ("identity", None),
+    ("", None),
+])
+def test_negotiate_honours_q_values(header, expected):
+    assert negotiate(header, ["br", "gzip"]) == expected
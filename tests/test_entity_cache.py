@@ -0,0 +1,122 @@
+import fakeredis
+import pytest
+import pytest_asyncio
+from sqlalchemy import Boolean, Integer, String, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.pool import StaticPool
+
+from app.core.entity_cache import entity_cache
+from app.core.profiling import install_query_profiler
+from app.repositories.base import BaseRepo
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Item(Base):
+    __tablename__ = "test_entity_items"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(32))
+    active: Mapped[bool] = mapped_column(Boolean, default=True)
+
+
+class ItemRepo(BaseRepo[Item]):
+    model = Item
+    cache_ttl = 60
+
+
+repo = ItemRepo()
+
+
+@pytest_asyncio.fixture
+async def redis():
+    redis = fakeredis.FakeAsyncRedis()
+    entity_cache.start(redis)
+    yield redis
+    await entity_cache.stop()
+
+
+@pytest_asyncio.fixture
+async def session_factory(redis):
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    install_query_profiler(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as db:
+        db.add_all([Item(id=1, name="a"), Item(id=2, name="b")])
+        await db.commit()
+    yield factory
+    await engine.dispose()
+
+
+async def cached_item(redis, pk):
+    raw = await redis.get(entity_cache.key(Item, pk))
+    return entity_cache.loads(Item, raw) if raw and not raw.startswith(b"\xc1") else None
+
+
+async def set_active(factory, pk, active):
+    async with factory() as db:
+        item = await db.get(Item, pk)
+        item.active = active
+        await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_read_through(session_factory, redis, max_queries):
+    async with session_factory() as db:
+        assert [i.name for i in await repo.get_by_pks(db, [1, 2])] == ["a", "b"]
+    assert (await cached_item(redis, 1)).name == "a"
+
+    with max_queries(0):
+        async with session_factory() as db:
+            assert (await repo.get_by_pk(db, 2)).name == "b"
+    with pytest.raises(AssertionError):
+        with max_queries(0):
+            async with session_factory() as db:
+                await repo.get_by_pk(db, 3, raise_not_found=False)
+
+
+@pytest.mark.asyncio
+async def test_commit_evicts(session_factory, redis):
+    async with session_factory() as db:
+        await repo.get_by_pk(db, 1)
+    await set_active(session_factory, 1, False)
+    assert await cached_item(redis, 1) is None
+
+    # 墓碑不妨碍之后的读取重新缓存
+    async with session_factory() as db:
+        assert (await repo.get_by_pk(db, 1)).active is False
+    assert (await cached_item(redis, 1)).active is False
+
+
+@pytest.mark.asyncio
+async def test_eviction_during_read_blocks_stale_write_back(session_factory, redis):
+    async with session_factory() as db:
+        lookup = await entity_cache.get_many(db, Item, [1])
+        assert lookup.misses == {1: b""}
+        stale = await db.get(Item, 1)
+
+        # 读取之后、回写之前，另一事务停用了该行
+        await set_active(session_factory, 1, False)
+        await entity_cache.set_many(Item, [stale], 60, lookup)
+    assert await cached_item(redis, 1) is None
+
+    async with session_factory() as db:
+        assert (await repo.get_by_pk(db, 1)).active is False
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_blocks_stale_write_back(session_factory, redis):
+    async with session_factory() as db:
+        lookup = await entity_cache.get_many(db, Item, [2])
+        stale = await db.get(Item, 2)
+
+        async with session_factory() as writer:
+            await writer.execute(update(Item).values(active=False))
+            await writer.commit()
+        await entity_cache.set_many(Item, [stale], 60, lookup)
+    assert await cached_item(redis, 2) is None
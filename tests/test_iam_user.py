@@ -0,0 +1,54 @@
+import fakeredis
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+import app.api.v1  # noqa: F401  按应用的导入顺序加载，避开 services 与 api 的循环导入
+import app.models  # noqa: F401  注册全部映射，解析关系
+from app.core.cache import MISSING, default_cache
+from app.core.db import Base
+from app.models import Role, User
+from app.services.iam.user import UserService
+
+
+@pytest_asyncio.fixture
+async def db():
+    default_cache.start(fakeredis.FakeAsyncRedis())
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+        db.add_all([Role(id=1, name="admin", display_name="Admin"), Role(id=2, name="user", display_name="User")])
+        db.add(User(id=1, username="alice", password="x"))
+        await db.commit()
+        yield db
+    await engine.dispose()
+    await default_cache.stop()
+
+
+async def cached_role_names(service, user_id):
+    return [r.name for r in await service.list_roles_for_user(user_id)]
+
+
+@pytest.mark.asyncio
+async def test_assign_roles_invalidates_after_commit(db):
+    service = UserService(db)
+    assert await cached_role_names(service, 1) == []
+
+    await service.assign_roles(1, [2])
+    assert await cached_role_names(service, 1) == ["user"]
+
+
+@pytest.mark.asyncio
+async def test_uncommitted_assignment_leaves_cache_to_caller(db):
+    service = UserService(db)
+    assert await cached_role_names(service, 1) == []
+
+    await service.assign_roles(1, [1, 2], commit=False)
+    # 未提交前缓存保持不变，不会被提前失效后回填
+    assert await default_cache.get(service.list_roles_for_user.key_for(1)) is not MISSING
+
+    await db.commit()
+    await service.list_roles_for_user.invalidate(1)
+    assert sorted(await cached_role_names(service, 1)) == ["admin", "user"]
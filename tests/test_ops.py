@@ -0,0 +1,47 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.ops.deps import admin_required
+from app.api.ops.routes import metrics_router, root_router, router
+from app.core.exception_handlers import register_exception_handlers
+from app.core.settings import settings
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    register_exception_handlers(app)
+    for r in (router, root_router, metrics_router):
+        app.include_router(r)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return TestClient(app)
+
+
+def test_liveness_is_open(client):
+    assert client.get("/healthz").status_code == 200
+
+
+@pytest.mark.parametrize("path", ["/ops/upstream", "/ops/redis", "/metrics"])
+def test_requires_token(client, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer garbage"}).status_code == 401
+
+
+def test_admin_sees_ops(app, client):
+    app.dependency_overrides[admin_required] = lambda: None
+    response = client.get("/ops/redis")
+    assert response.status_code == 200
+    assert isinstance(response.json()["data"], dict)
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_token", "scrape-token")
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert client.get("/metrics", headers={"Authorization": "Bearer other"}).status_code == 401
@@ -0,0 +1,45 @@
+import pytest
+import yaml
+
+from app.core.permissions import PermissionRegistry, decode_mask
+
+CATALOG = {
+    "permissions": ["user:create", "user:retrieve", "dataset:retrieve"],
+    "roles": {
+        "admin": {"permissions": ["user:create", "user:retrieve", "dataset:retrieve"]},
+        "user": {"permissions": ["dataset:retrieve"]},
+    },
+}
+
+
+def load(tmp_path, catalog) -> PermissionRegistry:
+    path = tmp_path / "permissions.yaml"
+    path.write_text(yaml.safe_dump(catalog))
+    return PermissionRegistry.from_yaml(path)
+
+
+def test_claims_round_trip(tmp_path):
+    registry = load(tmp_path, CATALOG)
+    claims = registry.claims(["user:retrieve"], ["user"])
+    assert registry.is_current(claims)
+    assert decode_mask(claims["perm"]) == registry.permission_bits["user:retrieve"]
+    assert decode_mask(claims["roles"]) == registry.role_bits["user"]
+
+
+@pytest.mark.parametrize("change", [
+    lambda c: c["permissions"].append("dataset:delete"),
+    lambda c: c["roles"].update(guest={"permissions": []}),
+    # 只调整角色授予的权限，列表顺序不变
+    lambda c: c["roles"]["user"]["permissions"].append("user:retrieve"),
+])
+def test_catalog_changes_bump_version(tmp_path, change):
+    claims = load(tmp_path, CATALOG).claims(["dataset:retrieve"], ["user"])
+    catalog = yaml.safe_load(yaml.safe_dump(CATALOG))
+    change(catalog)
+    assert not load(tmp_path, catalog).is_current(claims)
+
+
+def test_grant_order_does_not_matter(tmp_path):
+    catalog = yaml.safe_load(yaml.safe_dump(CATALOG))
+    catalog["roles"]["admin"]["permissions"].reverse()
+    assert load(tmp_path, catalog).version == load(tmp_path, CATALOG).version
@@ -0,0 +1,70 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.middleware.profiling import QueryProfilerMiddleware
+from app.core.profiling import install_query_profiler, statement_shape
+
+
+@pytest.fixture
+def engine():
+    # NullPool：每个请求在 TestClient 自己的事件循环里新建连接
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=NullPool)
+    install_query_profiler(engine)
+    return engine
+
+
+@pytest.fixture
+def client(engine):
+    app = FastAPI()
+    app.add_middleware(QueryProfilerMiddleware, debug_headers=True)
+
+    @app.get("/items")
+    async def list_items(n: int = 1):
+        # 逐条查询，模拟 N+1
+        async with engine.connect() as conn:
+            for i in range(n):
+                await conn.execute(text("SELECT :id"), {"id": i})
+        return {"n": n}
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_statement_shape_collapses_placeholders():
+    assert statement_shape("SELECT *  FROM t\n WHERE id IN ($1, $2, $3)") == "SELECT * FROM t WHERE id IN (?)"
+    assert statement_shape("SELECT * FROM t WHERE id IN (?)") == statement_shape("SELECT * FROM t WHERE id IN (?, ?)")
+
+
+def test_max_queries_counts_request_statements(client, max_queries):
+    with max_queries(3) as profiles:
+        client.get("/items", params={"n": 3})
+    assert [p.statements for p in profiles] == [3]
+
+
+def test_max_queries_fails_over_budget(client, max_queries):
+    with pytest.raises(AssertionError, match=r"at most 2 queries, got 4:\n  4x SELECT \?"):
+        with max_queries(2):
+            client.get("/items", params={"n": 4})
+
+
+@pytest.mark.asyncio
+async def test_max_queries_counts_direct_calls(engine, max_queries):
+    with pytest.raises(AssertionError, match="got 2"):
+        with max_queries(1):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                await conn.execute(text("SELECT 2"))
+
+
+def test_n_plus_one_detection(client, caplog):
+    response = client.get("/items", params={"n": 6})
+    assert response.headers["X-DB-Statements"] == "6"
+    assert response.headers["X-DB-Repeated-Shapes"] == "1"
+    assert "Possible N+1 in GET /items: 6x SELECT ?" in caplog.text
+
+    response = client.get("/items", params={"n": 5})
+    assert response.headers["X-DB-Repeated-Shapes"] == "0"
@@ -0,0 +1,99 @@
+import fakeredis
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+import app.models  # noqa: F401  注册全部映射，解析关系
+from app.core.cache import default_cache
+from app.core.db import Base
+from app.models.ragflow import RagflowDataset, RagflowDatasetUser, RagflowDocument, RagflowDocumentUser
+from app.services.ragflow.access import RagflowAccessService
+from app.services.ragflow.mirror import RagflowMirrorService
+
+TABLES = [m.__table__ for m in (RagflowDataset, RagflowDocument, RagflowDatasetUser, RagflowDocumentUser)]
+
+
+@pytest_asyncio.fixture
+async def db():
+    default_cache.start(fakeredis.FakeAsyncRedis())
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=TABLES)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+        db.add_all([RagflowDataset(id=f"ds{i}", name=f"dataset {i}", create_time=i) for i in range(3)])
+        db.add_all([
+            RagflowDocument(id=f"doc{i}", dataset_id="ds0", name=f"Report_{i}.pdf", suffix="pdf", create_time=i)
+            for i in range(10)
+        ])
+        db.add(RagflowDocument(id="other", dataset_id="ds1", name="report.pdf", suffix="pdf", create_time=0))
+        db.add_all([RagflowDatasetUser(user_id=1, dataset_id=i) for i in ("ds2", "ds0")])
+        db.add_all([
+            RagflowDocumentUser(user_id=user_id, dataset_id=dataset_id, document_id=document_id)
+            for user_id, dataset_id, document_id in (
+                (1, "ds0", "doc2"), (1, "ds0", "doc7"), (1, "ds0", "doc5"), (1, "ds1", "other"), (2, "ds0", "doc5"),
+            )
+        ])
+        await db.commit()
+        yield db
+    await engine.dispose()
+    await default_cache.stop()
+
+
+@pytest.fixture
+def mirror(db, ragflow):
+    return RagflowMirrorService(db, client=ragflow)
+
+
+@pytest.mark.asyncio
+async def test_restricted_datasets_from_mirror(mirror, fake_ragflow, max_queries):
+    with max_queries(2):
+        items, total = await mirror.list_datasets(owner_id=1)
+    assert (total, [d.id for d in items]) == (2, ["ds2", "ds0"])
+
+    items, total = await mirror.list_datasets(owner_id=1, page=2, page_size=1, desc=False)
+    assert (total, [d.id for d in items]) == (2, ["ds2"])
+    assert await mirror.list_datasets(owner_id=1, dataset_id="ds1") == ([], 0)
+    assert sum(fake_ragflow.stats.values()) == 0
+
+
+@pytest.mark.asyncio
+async def test_restricted_documents_paged_with_exact_total(mirror, fake_ragflow):
+    items, total = await mirror.list_documents("ds0", owner_id=1, page=1, page_size=2)
+    assert (total, [d.id for d in items]) == (3, ["doc7", "doc5"])
+
+    items, _ = await mirror.list_documents("ds0", owner_id=1, page=2, page_size=2)
+    assert [d.id for d in items] == ["doc2"]
+
+    # 过滤条件不会让受限列表去翻上游
+    items, total = await mirror.list_documents("ds0", owner_id=1, keywords="report_7")
+    assert (total, [d.id for d in items]) == (1, ["doc7"])
+    assert await mirror.list_documents("ds0", owner_id=1, suffix="docx") == ([], 0)
+    assert sum(fake_ragflow.stats.values()) == 0
+
+
+@pytest.mark.asyncio
+async def test_keywords_match_literally_ignoring_case(mirror):
+    items, total = await mirror.list_documents("ds0", keywords="REPORT_7")
+    assert (total, [d.id for d in items]) == (1, ["doc7"])
+    # 通配符按字面匹配
+    assert await mirror.list_documents("ds0", keywords="%") == ([], 0)
+    assert await mirror.list_documents("ds0", keywords="Repor__") == ([], 0)
+
+
+@pytest.mark.asyncio
+async def test_forget_documents_prunes_ownership_and_mirror(db, mirror, monkeypatch):
+    invalidated = []
+
+    async def invalidate(self, user_id):
+        invalidated.append(user_id)
+
+    monkeypatch.setattr(RagflowAccessService, "invalidate", invalidate)
+    await RagflowAccessService(db).forget_documents("ds0", ["doc5", "doc7", "missing"])
+
+    assert invalidated == [1, 2]
+    owned = (await db.execute(select(RagflowDocumentUser.document_id))).scalars().all()
+    assert sorted(owned) == ["doc2", "other"]
+    items, total = await mirror.list_documents("ds0", owner_id=1)
+    assert (total, [d.id for d in items]) == (1, ["doc2"])
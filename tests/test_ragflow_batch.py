@@ -0,0 +1,76 @@
+import pytest
+from ragflow_async_sdk.exceptions import RAGFlowAPIError
+
+from app.services.ragflow.batch import (
+    BatchExecutor, delete_chunk_ids_op, delete_document_chunks_op, delete_documents_op, is_already_gone,
+)
+
+
+@pytest.fixture
+def dataset_id(fake_ragflow):
+    return next(iter(fake_ragflow.datasets))
+
+
+@pytest.fixture
+def document_ids(fake_ragflow, dataset_id):
+    return list(fake_ragflow.documents[dataset_id])[:3]
+
+
+@pytest.mark.parametrize("message, gone", [
+    ("Documents not found: ['d1']", True),
+    ("You don't own the document d1.", True),
+    ("You don't own the document.", True),
+    ("rm_chunk deleted chunks 0, expect 1", True),
+    ("rm_chunk deleted chunks mismatch", True),
+    ("You don't own the dataset ds1.", False),
+    ("Dataset not found", False),
+    ("The dataset doesn't exist", False),
+    ("rm_chunk deleted chunks 1, expect 2", False),
+    ("Injected API error", False),
+])
+def test_is_already_gone(message, gone):
+    assert is_already_gone(RAGFlowAPIError(message, code="102")) is gone
+
+
+def test_non_api_errors_are_not_gone():
+    assert not is_already_gone(RuntimeError("Documents not found"))
+
+
+@pytest.mark.asyncio
+async def test_delete_documents_is_idempotent(ragflow, fake_ragflow, dataset_id, document_ids):
+    executor = BatchExecutor(batch_size=10)
+    op = delete_documents_op(dataset_id, ragflow)
+    first = await executor.run(document_ids[:2], op)
+    assert [o["reason"] for o in first] == [None, None]
+
+    outcomes = await executor.run(document_ids, op)
+    assert [o["success"] for o in outcomes] == [True, True, True]
+    assert [o["reason"] for o in outcomes] == ["already deleted", "already deleted", None]
+    assert not set(document_ids) & set(fake_ragflow.documents[dataset_id])
+
+
+@pytest.mark.asyncio
+async def test_unknown_dataset_fails(ragflow, document_ids):
+    executor = BatchExecutor(batch_size=10)
+    for op in (delete_documents_op("missing", ragflow), delete_document_chunks_op("missing", ragflow)):
+        outcomes = await executor.run(document_ids, op)
+        assert not any(o["success"] for o in outcomes)
+        assert {o["reason"] for o in outcomes} == {"You don't own the dataset missing."}
+
+
+@pytest.mark.asyncio
+async def test_deleted_document_chunks_count_as_gone(ragflow, fake_ragflow, dataset_id, document_ids):
+    del fake_ragflow.documents[dataset_id][document_ids[0]]
+    outcomes = await BatchExecutor(batch_size=1).run(document_ids, delete_document_chunks_op(dataset_id, ragflow))
+    assert [o["success"] for o in outcomes] == [True, True, True]
+    assert outcomes[0]["reason"] == "already deleted"
+
+    outcomes = await BatchExecutor().run(["c1", "c2"], delete_chunk_ids_op(dataset_id, document_ids[0], ragflow))
+    assert {o["reason"] for o in outcomes} == {"already deleted"}
+
+
+@pytest.mark.asyncio
+async def test_other_api_errors_fail(ragflow, fake_ragflow, dataset_id, document_ids):
+    fake_ragflow.config.set_faults({"documents.delete": {"api_error_rate": 1.0}})
+    outcomes = await BatchExecutor(batch_size=10).run(document_ids, delete_documents_op(dataset_id, ragflow))
+    assert {(o["success"], o["reason"]) for o in outcomes} == {(False, "Injected API error")}
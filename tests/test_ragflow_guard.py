@@ -0,0 +1,194 @@
+import asyncio
+
+import pytest
+from ragflow_async_sdk.exceptions import RAGFlowAPIError
+
+from app.core.exceptions import UpstreamUnavailableError
+from app.core.resilience import AIMDLimiter, BreakerState, CircuitBreaker, RetryBudget
+from app.core.settings import settings
+
+OPERATION = "datasets.list_datasets"
+
+
+@pytest.fixture
+def conf(monkeypatch):
+    conf = settings.ragflow
+    monkeypatch.setattr(conf, "breaker_failure_threshold", 2)
+    monkeypatch.setattr(conf, "breaker_reset_seconds", 0.05)
+    monkeypatch.setattr(conf, "retry_max_attempts", 1)
+    monkeypatch.setattr(conf, "retry_backoff_base_seconds", 0.001)
+    monkeypatch.setattr(conf, "retry_backoff_cap_seconds", 0.001)
+    return conf
+
+
+@pytest.fixture
+def fake(fake_ragflow):
+    return fake_ragflow
+
+
+@pytest.fixture
+def client(conf, ragflow):
+    return ragflow
+
+
+async def list_datasets(client):
+    return await client.datasets.list_datasets(page=1, page_size=10)
+
+
+@pytest.mark.asyncio
+async def test_calls_pass_through(client, fake):
+    datasets, total = await list_datasets(client)
+    assert total == 3
+    assert fake.stats["datasets.list"] == 1
+    assert client.guard.breaker(OPERATION).state is BreakerState.closed
+    assert client.guard.limiter.inflight == 0
+
+
+@pytest.mark.asyncio
+async def test_idempotent_reads_are_retried(client, fake, conf, monkeypatch):
+    monkeypatch.setattr(conf, "retry_max_attempts", 3)
+    monkeypatch.setattr(conf, "breaker_failure_threshold", 10)
+    fake.config.set_faults({"datasets.list": {"error_rate": 1.0}})
+    with pytest.raises(Exception):
+        await list_datasets(client)
+    assert fake.stats["datasets.list"] == 3
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_sheds_fast(client, fake):
+    fake.config.set_faults({"datasets.list": {"error_rate": 1.0}})
+    for _ in range(2):
+        with pytest.raises(Exception):
+            await list_datasets(client)
+    assert client.guard.breaker(OPERATION).state is BreakerState.open
+
+    with pytest.raises(UpstreamUnavailableError) as exc_info:
+        await list_datasets(client)
+    assert exc_info.value.status_code == 503
+    assert fake.stats["datasets.list"] == 2
+    assert client.guard.limiter.inflight == 0
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_closes_breaker(client, fake):
+    fake.config.set_faults({"datasets.list": {"error_rate": 1.0}})
+    for _ in range(2):
+        with pytest.raises(Exception):
+            await list_datasets(client)
+
+    fake.config.set_faults({"datasets.list": {}})
+    await asyncio.sleep(0.06)
+    await list_datasets(client)
+    assert client.guard.breaker(OPERATION).state is BreakerState.closed
+
+
+@pytest.mark.asyncio
+async def test_api_errors_do_not_open_breaker(client, fake):
+    fake.config.set_faults({"datasets.list": {"api_error_rate": 1.0}})
+    for _ in range(3):
+        with pytest.raises(RAGFlowAPIError):
+            await list_datasets(client)
+    assert client.guard.breaker(OPERATION).state is BreakerState.closed
+    assert fake.stats["datasets.list"] == 3
+
+
+@pytest.mark.asyncio
+async def test_limiter_sheds_over_limit(client, fake, monkeypatch):
+    limiter = client.guard.limiter
+    monkeypatch.setattr(limiter, "_limit", 1.0)
+    monkeypatch.setattr(limiter, "acquire_timeout", 0)
+    fake.config.set_faults({"datasets.list": {"latency_ms": 50}})
+
+    results = await asyncio.gather(list_datasets(client), list_datasets(client), return_exceptions=True)
+    shed = [r for r in results if isinstance(r, UpstreamUnavailableError)]
+    assert len(shed) == 1
+    assert limiter.shed == 1
+    assert fake.stats["datasets.list"] == 1
+
+
+@pytest.mark.asyncio
+async def test_shed_call_does_not_take_probe_slot(client, fake, monkeypatch):
+    breaker = client.guard.breaker(OPERATION)
+    fake.config.set_faults({"datasets.list": {"error_rate": 1.0}})
+    for _ in range(2):
+        with pytest.raises(Exception):
+            await list_datasets(client)
+    await asyncio.sleep(0.06)
+
+    # 半开时并发槽位已满：调用被丢弃，但不应占用探测名额
+    limiter = client.guard.limiter
+    monkeypatch.setattr(limiter, "acquire_timeout", 0)
+    monkeypatch.setattr(limiter, "inflight", limiter.limit)
+    with pytest.raises(UpstreamUnavailableError):
+        await list_datasets(client)
+    limiter.inflight = 0
+
+    fake.config.set_faults({"datasets.list": {}})
+    await list_datasets(client)
+    assert breaker.state is BreakerState.closed
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_releases_slot(client, fake):
+    breaker = client.guard.breaker(OPERATION)
+    fake.config.set_faults({"datasets.list": {"error_rate": 1.0}})
+    for _ in range(2):
+        with pytest.raises(Exception):
+            await list_datasets(client)
+    await asyncio.sleep(0.06)
+
+    fake.config.set_faults({"datasets.list": {"timeout_rate": 1.0, "hang_seconds": 10}})
+    probe = asyncio.create_task(list_datasets(client))
+    await asyncio.sleep(0.02)
+    assert breaker.state is BreakerState.half_open
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    assert client.guard.limiter.inflight == 0
+
+    fake.config.set_faults({"datasets.list": {}})
+    await list_datasets(client)
+    assert breaker.state is BreakerState.closed
+
+
+def test_snapshot(client):
+    client.guard.breaker(OPERATION)
+    snapshot = client.guard.snapshot()
+    assert snapshot["upstream"] == "ragflow"
+    assert snapshot["breakers"][OPERATION]["state"] == "closed"
+    assert set(snapshot["limiter"]) == {"limit", "inflight", "shed"}
+
+
+def test_breaker_release_probe():
+    breaker = CircuitBreaker("op", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_aimd_limit():
+    limiter = AIMDLimiter(initial=4, min_limit=2, max_limit=5, latency_threshold=1.0)
+    for _ in range(4):
+        assert await limiter.acquire()
+    assert not await limiter.acquire()
+
+    await limiter.release(0.1, failed=True)
+    assert limiter.limit == 3
+    await limiter.release(2.0)
+    assert limiter.limit == 3
+    await limiter.discard()
+    assert limiter.limit == 3
+    assert limiter.inflight == 1
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, min_per_second=0)
+    assert not budget.try_withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.try_withdraw()
+    assert not budget.try_withdraw()
+    assert budget.exhausted == 2
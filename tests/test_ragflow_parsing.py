@@ -0,0 +1,144 @@
+import fakeredis
+import pytest
+
+from app.core.settings import settings
+from app.services.ragflow.jobs import ItemStatus, JobStatus, JobStore
+from app.services.ragflow.parsing import PARSE_JOB_KIND, ParseJobRunner
+from app.services.ragflow.quota import QuotaCounters, dataset_subject, parses_key, user_subject, utc_today
+
+
+@pytest.fixture
+def store():
+    return JobStore(fakeredis.FakeAsyncRedis(decode_responses=True))
+
+
+@pytest.fixture
+def runner(store, ragflow, monkeypatch):
+    conf = settings.ragflow
+    monkeypatch.setattr(conf, "parse_batch_interval_seconds", 0)
+    monkeypatch.setattr(conf, "parse_poll_interval_seconds", 0)
+    monkeypatch.setattr(conf, "parse_poll_page_size", 10)
+    return ParseJobRunner(store, client=ragflow)
+
+
+@pytest.fixture
+def dataset_id(fake_ragflow):
+    return next(iter(fake_ragflow.datasets))
+
+
+@pytest.fixture
+def document_ids(fake_ragflow, dataset_id):
+    return list(fake_ragflow.documents[dataset_id])[:3]
+
+
+@pytest.mark.asyncio
+async def test_progress_polled_once_per_dataset(runner, store, fake_ragflow, dataset_id, document_ids):
+    job_id = await store.create(PARSE_JOB_KIND, 1, dataset_id, document_ids)
+    await runner.run(job_id)
+
+    job = await store.get(job_id)
+    assert job["status"] == JobStatus.succeeded.value
+    assert {i["status"] for i in job["items"].values()} == {ItemStatus.done.value}
+    assert fake_ragflow.stats["documents.parse"] == 1
+    # 25 个文档按每页 10 条列出：一轮轮询最多 3 次调用，与任务中的文档数无关
+    assert fake_ragflow.stats["documents.list"] <= 3
+
+
+@pytest.mark.asyncio
+async def test_document_missing_from_listing_fails(runner, store, fake_ragflow, dataset_id, document_ids):
+    job_id = await store.create(PARSE_JOB_KIND, 1, dataset_id, document_ids)
+    await runner._submit(job_id, dataset_id, document_ids)
+    # 提交后文档在上游被删除
+    del fake_ragflow.documents[dataset_id][document_ids[0]]
+
+    finished = await runner._poll(job_id, dataset_id, document_ids)
+    assert finished[document_ids[0]] == {"status": ItemStatus.failed.value, "message": "Document not found"}
+    assert {finished[i]["status"] for i in document_ids[1:]} == {ItemStatus.done.value}
+
+
+@pytest.mark.asyncio
+async def test_document_skipped_by_listing_is_looked_up(runner, store, ragflow, fake_ragflow, dataset_id,
+                                                        document_ids, monkeypatch):
+    job_id = await store.create(PARSE_JOB_KIND, 1, dataset_id, document_ids)
+    await runner._submit(job_id, dataset_id, document_ids)
+    list_documents = ragflow.documents.list_documents
+    lookups = []
+
+    async def shifting(dataset_id, **kwargs):
+        docs, total = await list_documents(dataset_id, **kwargs)
+        if kwargs.get("document_id"):
+            lookups.append(kwargs["document_id"])
+        else:
+            # 翻页期间文档移到了已读过的页，整个列表都没有看到它
+            docs = [d for d in docs if d.id != document_ids[0]]
+        return docs, total
+
+    monkeypatch.setattr(ragflow.documents, "list_documents", shifting)
+    finished = await runner._poll(job_id, dataset_id, document_ids)
+    assert {v["status"] for v in finished.values()} == {ItemStatus.done.value}
+    assert document_ids[0] in lookups
+
+
+@pytest.mark.asyncio
+async def test_failed_poll_is_retried(runner, store, fake_ragflow, dataset_id, document_ids, monkeypatch):
+    job_id = await store.create(PARSE_JOB_KIND, 1, dataset_id, document_ids)
+    await runner._submit(job_id, dataset_id, document_ids)
+
+    calls = 0
+    fetch_progress = runner._fetch_progress
+
+    async def flaky(*args):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError("upstream hiccup")
+        return await fetch_progress(*args)
+
+    monkeypatch.setattr(runner, "_fetch_progress", flaky)
+    finished = await runner._poll(job_id, dataset_id, document_ids)
+    assert calls == 2
+    assert {v["status"] for v in finished.values()} == {ItemStatus.done.value}
+
+
+async def used_parses(store, dataset_id):
+    today = utc_today()
+    return [
+        int(await store.redis.hget(parses_key(subject, today), "parses") or 0)
+        for subject in (user_subject(1), dataset_subject(dataset_id))
+    ]
+
+
+async def enqueue(store, dataset_id, document_ids):
+    await QuotaCounters(store.redis).reserve_parses(1, dataset_id, len(document_ids))
+    return await store.create(PARSE_JOB_KIND, 1, dataset_id, document_ids)
+
+
+@pytest.mark.asyncio
+async def test_rejected_batch_gives_back_parse_quota(runner, store, fake_ragflow, dataset_id, document_ids,
+                                                     monkeypatch):
+    monkeypatch.setattr(runner, "batch_size", 2)
+    # 第二批含不存在的文档，整批被上游拒绝
+    job_id = await enqueue(store, dataset_id, document_ids + ["missing"])
+    assert await used_parses(store, dataset_id) == [4, 4]
+
+    await runner.run(job_id)
+    job = await store.get(job_id)
+    assert (job["done"], job["failed"]) == (2, 2)
+    assert await used_parses(store, dataset_id) == [2, 2]
+
+
+@pytest.mark.asyncio
+async def test_crashed_submit_gives_back_unsubmitted(runner, store, fake_ragflow, dataset_id, document_ids,
+                                                     monkeypatch):
+    monkeypatch.setattr(runner, "batch_size", 1)
+    job_id = await enqueue(store, dataset_id, document_ids)
+    update_items = store.update_items
+
+    async def crash_after_first(job_id, items):
+        await update_items(job_id, items)
+        raise RuntimeError("redis went away")
+
+    monkeypatch.setattr(store, "update_items", crash_after_first)
+    await runner.run(job_id)
+    assert (await store.get(job_id))["status"] == JobStatus.failed.value
+    assert await used_parses(store, dataset_id) == [1, 1]
@@ -0,0 +1,48 @@
+import fakeredis
+import pytest
+
+from app.core.exceptions import RateLimitedError
+from app.core.logging import new_log_context
+from app.core.ratelimit import Rate, limit_operation, rate_limiter
+from app.core.settings import settings
+
+OPERATION = "documents.list_documents"
+
+
+@pytest.fixture(autouse=True)
+def redis(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(rate_limiter, "_redis", redis)
+    monkeypatch.setattr(rate_limiter, "_blocked", type(rate_limiter._blocked)())
+    monkeypatch.setattr(settings.ratelimit, "operations", {OPERATION: "2/minute"})
+    return redis
+
+
+@pytest.mark.asyncio
+async def test_gcra_allows_burst_then_limits():
+    rate = Rate.parse("2/minute")
+    decisions = [await rate_limiter.hit("test", "user:1", rate) for _ in range(3)]
+    assert [d.allowed for d in decisions] == [True, True, False]
+    assert decisions[-1].retry_after > 0
+
+
+@pytest.mark.asyncio
+async def test_operation_charged_once_per_request():
+    # 一个网关请求内的多次上游调用（分页、扇出）只计一次
+    new_log_context(request_id="r1", user_id=1)
+    for _ in range(5):
+        await limit_operation(OPERATION)
+
+    new_log_context(request_id="r2", user_id=1)
+    await limit_operation(OPERATION)
+
+    new_log_context(request_id="r3", user_id=1)
+    with pytest.raises(RateLimitedError):
+        await limit_operation(OPERATION)
+
+
+@pytest.mark.asyncio
+async def test_operation_not_limited_without_user():
+    new_log_context(request_id="job")
+    for _ in range(5):
+        await limit_operation(OPERATION)
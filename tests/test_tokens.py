@@ -0,0 +1,104 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from app.core.exceptions import TokenInvalidError
+from app.core.jwt import create_access_token
+from app.core.revocation import REVOKED_KEY, RevocationList, revocation_list
+from app.core.security import authenticate
+from app.services.auth.tokens import RefreshTokenReuseError, TokenFamilyStore
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture(autouse=True)
+def clean_revocations(monkeypatch):
+    # 进程级布隆过滤器每个用例重新开始
+    monkeypatch.setattr(revocation_list, "bloom", RevocationList._new_bloom(0))
+    monkeypatch.setattr(revocation_list, "version", None)
+
+
+@pytest.fixture
+def families(redis):
+    return TokenFamilyStore(redis)
+
+
+def request_for(redis):
+    return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(redis=redis)))
+
+
+@pytest.mark.asyncio
+async def test_rotation_chain(families, redis):
+    family, jti = await families.start(1)
+    second = await families.rotate(family, jti)
+    third = await families.rotate(family, second)
+    assert len({jti, second, third}) == 3
+    assert await redis.hget(f"auth:family:{family}", "current") == third
+    assert await families.rotate("unknown", jti) is None
+
+
+@pytest.mark.asyncio
+async def test_reuse_revokes_whole_family(families, redis):
+    family, jti = await families.start(1)
+    latest = await families.rotate(family, jti)
+
+    with pytest.raises(RefreshTokenReuseError) as exc_info:
+        await families.rotate(family, jti)
+    assert exc_info.value.user_id == "1"
+    # 被盗用方与合法用户手中的最新令牌一起失效
+    assert await families.rotate(family, latest) is None
+    assert await revocation_list.is_revoked(redis, None, family)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_rotation_of_one_token(families):
+    family, jti = await families.start(1)
+    results = await asyncio.gather(*(families.rotate(family, jti) for _ in range(2)), return_exceptions=True)
+    assert sum(isinstance(r, str) for r in results) == 1
+    assert sum(isinstance(r, RefreshTokenReuseError) for r in results) == 1
+
+
+@pytest.mark.asyncio
+async def test_revoked_family_rejects_access_tokens(families, redis):
+    family, _ = await families.start(1)
+    token = create_access_token(1, family=family)
+    other = create_access_token(1, family=(await families.start(1))[0])
+    assert (await authenticate(request_for(redis), token))["fam"] == family
+
+    await families.revoke(family)
+    with pytest.raises(TokenInvalidError):
+        await authenticate(request_for(redis), token)
+    assert (await authenticate(request_for(redis), other))["sub"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_bloom_hit_is_confirmed_in_redis(redis):
+    # 布隆过滤器误判：Redis 中没有记录即放行
+    revocation_list.bloom.add("innocent")
+    assert not await revocation_list.is_revoked(redis, "innocent")
+
+    await redis.zadd(REVOKED_KEY, {"expired": time.time() - 1})
+    revocation_list.bloom.add("expired")
+    assert not await revocation_list.is_revoked(redis, "expired")
+
+    # 无法确认时按已吊销处理
+    assert await revocation_list.is_revoked(None, "innocent")
+    assert not await revocation_list.is_revoked(None, "unseen")
+
+
+@pytest.mark.asyncio
+async def test_sync_picks_up_other_processes(redis):
+    other = RevocationList()
+    await other.revoke(redis, "jti-1", ttl=60)
+    await redis.zadd(REVOKED_KEY, {"expired": time.time() - 1})
+    assert not await revocation_list.is_revoked(redis, "jti-1")
+
+    await revocation_list.sync(redis)
+    assert await revocation_list.is_revoked(redis, "jti-1")
+    assert await redis.zscore(REVOKED_KEY, "expired") is None
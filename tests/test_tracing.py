@@ -0,0 +1,106 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.middleware.tracing import TracingMiddleware
+from app.core.tracing import (
+    CLIENT, SERVER, current_span, inject_traceparent, parse_traceparent, trace_engine, traced, tracer,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+TRACEPARENT = f"00-{TRACE_ID}-{PARENT_ID}-01"
+
+
+@pytest.fixture
+def client():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=NullPool)
+    trace_engine(engine)
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, server_timing=True)
+
+    @traced("auth.check", stage="auth")
+    async def authenticate():
+        return current_span().span_id
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        await authenticate()
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT :id"), {"id": item_id})
+        # 上游调用携带当前 span 的 traceparent
+        request = httpx.Request("GET", "http://ragflow/api/v1/datasets")
+        with tracer.start_span("ragflow datasets.list", kind=CLIENT, stage="ragflow"):
+            await inject_traceparent(request)
+        return {"traceparent": request.headers["traceparent"]}
+
+    with TestClient(app) as client:
+        yield client
+
+
+def _by_name(spans):
+    return {span.name: span for span in spans}
+
+
+def test_parse_traceparent():
+    context = parse_traceparent(TRACEPARENT)
+    assert (context.trace_id, context.span_id, context.sampled) == (TRACE_ID, PARENT_ID, True)
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00").sampled is False
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert parse_traceparent("garbage") is None
+
+
+def test_incoming_traceparent_is_continued(client, span_exporter):
+    response = client.get("/items/1", headers={"traceparent": TRACEPARENT})
+    assert response.status_code == 200
+
+    spans = _by_name(span_exporter.get_finished_spans())
+    server = spans["GET /items/{item_id}"]
+    assert server.kind == SERVER
+    assert server.trace_id == TRACE_ID
+    assert server.parent_span_id == PARENT_ID
+    assert server.attributes["http.response.status_code"] == 200
+
+    # 子 span 同属一条链路，父节点为服务端 span
+    for name in ("auth.check", "db.query", "ragflow datasets.list"):
+        assert spans[name].trace_id == TRACE_ID
+        assert spans[name].parent_span_id == server.span_id
+
+    # 发往上游的 traceparent 指向 RAGFlow 客户端 span
+    upstream = parse_traceparent(response.json()["traceparent"])
+    assert upstream.trace_id == TRACE_ID
+    assert upstream.span_id == spans["ragflow datasets.list"].span_id
+
+
+def test_new_trace_without_traceparent(client, span_exporter):
+    client.get("/items/1")
+    server = _by_name(span_exporter.get_finished_spans())["GET /items/{item_id}"]
+    assert server.parent_span_id is None
+    assert server.trace_id != TRACE_ID
+
+
+def test_stage_totals(client, span_exporter):
+    response = client.get("/items/1")
+    server = _by_name(span_exporter.get_finished_spans())["GET /items/{item_id}"]
+    for stage in ("auth", "db", "ragflow"):
+        assert f"gateway.stage.{stage}_ms" in server.attributes
+        assert f"{stage};dur=" in response.headers["Server-Timing"]
+    assert "total;dur=" in response.headers["Server-Timing"]
+
+
+def test_nested_spans_of_one_stage_count_once(span_exporter):
+    with tracer.start_span("root") as root:
+        with tracer.start_span("outer", stage="db"):
+            with tracer.start_span("inner", stage="db"):
+                pass
+    outer = _by_name(span_exporter.get_finished_spans())["outer"]
+    assert root.stages == {"db": outer.duration}
+
+
+def test_unsampled_trace_is_not_exported(client, span_exporter):
+    client.get("/items/1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    assert span_exporter.get_finished_spans() == []